@@ -0,0 +1,8 @@
+{% macro external_files_exist(glob_path) %}
+    {#- Whether a scraper landed any file at `glob_path` yet, for sources that may not exist on a fresh deployment -#}
+    {%- if not execute -%}
+        {{ return(false) }}
+    {%- endif -%}
+    {%- set result = run_query("SELECT count(*) FROM glob('" ~ glob_path ~ "')") -%}
+    {{ return(result.columns[0].values()[0] > 0) }}
+{% endmacro %}
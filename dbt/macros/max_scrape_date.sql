@@ -0,0 +1,10 @@
+{% macro max_scrape_date(relation) %}
+    {#- The latest `scrape_date` already loaded into `relation`, as a DATE literal. A subquery leaves pruning to the
+        optimizer at run time; a literal lets the Parquet scan skip `scrape_date=` partitions at bind time -#}
+    {%- if not execute -%}
+        {{ return("DATE '1970-01-01'") }}
+    {%- endif -%}
+    {%- set result = run_query("SELECT MAX(scrape_date) FROM " ~ relation) -%}
+    {%- set max_date = result.columns[0].values()[0] -%}
+    {{ return("DATE '" ~ (max_date if max_date is not none else '1970-01-01') ~ "'") }}
+{% endmacro %}
@@ -0,0 +1,11 @@
+{% macro training_months(column, lookback_months=0) %}
+    {#- Filter on `column` for the months a `tag:training` run builds: `current_month`, or with `backfill_start` and
+        `backfill_end` every month between them at once, plus `lookback_months` before the first one for the models
+        read a month back. Each month lands in its own partition either way -#}
+    {%- if var('backfill_start', none) is not none -%}
+        {{ column }} BETWEEN DATE '{{ var('backfill_start') }}' - INTERVAL {{ lookback_months }} MONTH
+            AND DATE '{{ var('backfill_end') }}'
+    {%- else -%}
+        {{ column }} = DATE '{{ var('current_month') }}'
+    {%- endif -%}
+{% endmacro %}
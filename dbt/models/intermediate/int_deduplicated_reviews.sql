@@ -8,7 +8,8 @@ WITH new_reviews AS (  -- scraping guarantees no duplicate reviews accross batch
     SELECT *
     FROM {{ ref('int_reviews_with_canonical_id') }} r
     {% if is_incremental() %}
-    WHERE r.scrape_date > (SELECT MAX(scrape_date) FROM {{ this }})
+    -- Pushed through the view chain down to the `raw_reviews` scan: only the new partitions are read
+    WHERE r.scrape_date > {{ max_scrape_date(this) }}
     {% endif %}
 )
 SELECT *
@@ -21,5 +21,5 @@ FROM {{ ref('int_deduplicated_reviews') }} r
          JOIN {{ ref('dim_users') }} u
               ON r.user_id = u.user_id
 {% if is_incremental() %}
-WHERE r.scrape_date > (SELECT MAX(scrape_date) FROM {{ this }})
+WHERE r.scrape_date > {{ max_scrape_date(this) }}
 {% endif %}
@@ -5,10 +5,9 @@
     options={"partition_by": "game_review_month", "overwrite_or_ignore": true},
     tags=['training']
 ) }}
-{% set current_month = var('current_month', none) %}
 WITH game_metrics AS (SELECT *
                       FROM {{ ref('monthly_game_metrics') }}
-                      WHERE game_review_month = DATE '{{ current_month }}')
+                      WHERE {{ training_months('game_review_month') }})
 SELECT g.*,
        CAST(gm.game_review_month AS DATE)  AS game_review_month,
        gm.game_num_reviews,
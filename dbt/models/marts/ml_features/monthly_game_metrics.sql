@@ -1,51 +1,111 @@
 -- models/marts/ml_features/monthly_game_metrics.sql
 {{ config(
-    materialized='view'
+    materialized='incremental',
+    unique_key=['game_id', 'game_review_month'],
+    on_schema_change='append_new_columns'
 ) }}
-WITH monthly AS (
+WITH reviews AS (
+    SELECT game_id,
+           date_trunc('month', timestamp_created) AS review_month,
+           voted_up,
+           weighted_vote_score,
+           scrape_date
+    FROM {{ ref('fact_reviews') }}
+),
+{% if is_incremental() %}
+-- Months with reviews scraped since the last run. A review landed again replaces its row in fact_reviews with a
+-- newer scrape_date, so these months are aggregated again from all their reviews instead of adding to their sums
+touched AS (
+    SELECT DISTINCT game_id, review_month
+    FROM reviews
+    WHERE scrape_date > {{ max_scrape_date(this) }}
+),
+{% endif %}
+new_monthly AS (
     SELECT
-        game_id,
-        date_trunc('month', timestamp_created) AS review_month,
+        r.game_id,
+        r.review_month,
         COUNT(*) AS num_reviews,
-        SUM(voted_up::int) AS num_positive_reviews,
-        SUM((NOT voted_up)::int) AS num_negative_reviews,
-        SUM(voted_up::int * weighted_vote_score) AS month_weighted_votes,
-        SUM(weighted_vote_score) AS month_weights
-    FROM {{ ref('fact_reviews') }}
-    GROUP BY game_id, review_month
+        SUM(r.voted_up::int) AS num_positive_reviews,
+        SUM((NOT r.voted_up)::int) AS num_negative_reviews,
+        SUM(r.voted_up::int * r.weighted_vote_score) AS month_weighted_votes,
+        SUM(r.weighted_vote_score) AS month_weights,
+        MAX(r.scrape_date) AS scrape_date
+    FROM reviews r
+    {% if is_incremental() %}
+    JOIN touched t ON r.game_id = t.game_id AND r.review_month = t.review_month
+    {% endif %}
+    GROUP BY r.game_id, r.review_month
+),
+{% if is_incremental() %}
+-- The first scrape of a game brings its whole history: rows are rewritten from its earliest month with new reviews
+affected AS (
+    SELECT game_id, MIN(review_month) AS from_month
+    FROM new_monthly
+    GROUP BY game_id
+),
+previous_state AS (  -- cumulative sums of the last month before the rewritten ones
+    SELECT m.game_id,
+           m.game_cum_num_reviews AS cum_num_reviews,
+           m.game_cum_num_positive_reviews AS cum_num_positive_reviews,
+           m.game_cum_num_negative_reviews AS cum_num_negative_reviews,
+           m.game_cum_weighted_votes AS cum_weighted_votes,
+           m.game_cum_weights AS cum_weights
+    FROM {{ this }} m
+    JOIN affected a ON m.game_id = a.game_id AND m.game_review_month < a.from_month
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY m.game_id ORDER BY m.game_review_month DESC) = 1
+),
+monthly AS (  -- later months keep their own sums, only their cumulative sums move
+    SELECT m.game_id,
+           m.game_review_month AS review_month,
+           m.game_num_reviews AS num_reviews,
+           m.game_num_positive_reviews AS num_positive_reviews,
+           m.game_num_negative_reviews AS num_negative_reviews,
+           m.game_month_weighted_votes AS month_weighted_votes,
+           m.game_month_weights AS month_weights,
+           m.scrape_date
+    FROM {{ this }} m
+    JOIN affected a ON m.game_id = a.game_id AND m.game_review_month >= a.from_month
+    ANTI JOIN new_monthly n ON m.game_id = n.game_id AND m.game_review_month = n.review_month
+    UNION ALL BY NAME
+    SELECT * FROM new_monthly
+),
+{% else %}
+previous_state AS (
+    SELECT game_id,
+           0 AS cum_num_reviews,
+           0 AS cum_num_positive_reviews,
+           0 AS cum_num_negative_reviews,
+           0.0 AS cum_weighted_votes,
+           0.0 AS cum_weights
+    FROM new_monthly
+    WHERE FALSE
+),
+monthly AS (
+    SELECT * FROM new_monthly
 ),
+{% endif %}
 cumulative AS (
     SELECT
-       game_id,
-       review_month,
-       num_reviews,
-       num_positive_reviews,
-       num_negative_reviews,
-       SUM(num_reviews) OVER (
-             PARTITION BY game_id ORDER BY review_month
-             ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-       ) AS cum_num_reviews,
-       SUM(num_positive_reviews) OVER (
-             PARTITION BY game_id ORDER BY review_month
-             ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-       )
-       AS cum_num_positive_reviews,
-       SUM(num_negative_reviews) OVER (
-             PARTITION BY game_id ORDER BY review_month
-             ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-       )
-       AS cum_num_negative_reviews,
-       SUM(month_weighted_votes) OVER (
-            PARTITION BY game_id ORDER BY review_month
-            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-       )
-       AS cum_weighted_votes,
-       SUM(month_weights) OVER (
-            PARTITION BY game_id ORDER BY review_month
-            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
-       )
-       AS cum_weights
-FROM monthly
+       m.game_id,
+       m.review_month,
+       m.num_reviews,
+       m.num_positive_reviews,
+       m.num_negative_reviews,
+       m.month_weighted_votes,
+       m.month_weights,
+       m.scrape_date,
+       COALESCE(p.cum_num_reviews, 0) + SUM(m.num_reviews) OVER months AS cum_num_reviews,
+       COALESCE(p.cum_num_positive_reviews, 0) + SUM(m.num_positive_reviews) OVER months AS cum_num_positive_reviews,
+       COALESCE(p.cum_num_negative_reviews, 0) + SUM(m.num_negative_reviews) OVER months AS cum_num_negative_reviews,
+       COALESCE(p.cum_weighted_votes, 0) + SUM(m.month_weighted_votes) OVER months AS cum_weighted_votes,
+       COALESCE(p.cum_weights, 0) + SUM(m.month_weights) OVER months AS cum_weights
+    FROM monthly m
+    LEFT JOIN previous_state p ON m.game_id = p.game_id
+    WINDOW months AS (
+        PARTITION BY m.game_id ORDER BY m.review_month
+        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    )
 )
 SELECT
     game_id,
@@ -56,5 +116,11 @@ SELECT
     cum_num_reviews AS game_cum_num_reviews,
     cum_num_positive_reviews AS game_cum_num_positive_reviews,
     cum_num_negative_reviews AS game_cum_num_negative_reviews,
-    CASE WHEN cum_weights = 0 THEN NULL ELSE cum_weighted_votes / cum_weights END AS game_weighted_score
+    CASE WHEN cum_weights = 0 THEN NULL ELSE cum_weighted_votes / cum_weights END AS game_weighted_score,
+    -- State carried to the next run, to extend the cumulative sums without reading older reviews
+    month_weighted_votes AS game_month_weighted_votes,
+    month_weights AS game_month_weights,
+    cum_weighted_votes AS game_cum_weighted_votes,
+    cum_weights AS game_cum_weights,
+    scrape_date
 FROM cumulative
@@ -5,14 +5,13 @@
     options={"partition_by": "current_month", "overwrite_or_ignore": true},
     tags=['training']
 ) }}
-{% set current_month = var('current_month', none) %}
 WITH source_rows AS (
     SELECT
         r.*,
         DATE_TRUNC('month', r.timestamp_created) AS current_month,
         DATE_TRUNC('month', r.timestamp_created) - INTERVAL 1 MONTH AS prev_month
     FROM {{ ref('fact_reviews') }} r
-    WHERE DATE_TRUNC('month', r.timestamp_created) = '{{ current_month }}'
+    WHERE {{ training_months("DATE_TRUNC('month', r.timestamp_created)") }}
 ),
 features AS (
     SELECT
@@ -27,15 +26,20 @@ features AS (
         COALESCE(gm.game_cum_num_positive_reviews, 0) AS game_cum_num_positive_reviews,
         COALESCE(gm.game_cum_num_negative_reviews, 0) AS game_cum_num_negative_reviews,
         gm.game_weighted_score,
-        uf.past_game_ids
+        COALESCE(uf_prev.past_game_ids, uf_cur.past_game_ids) AS past_game_ids
     FROM source_rows s
     ASOF LEFT JOIN {{ ref('monthly_game_metrics') }} gm
     ON s.game_id = gm.game_id
     AND gm.game_review_month <= s.prev_month
     LEFT JOIN {{ ref('dim_games') }} dg
     ON s.game_id = dg.game_id
-    ASOF LEFT JOIN {{ ref('user_features') }} uf
-    ON s.user_id = uf.user_id
-    AND s.prev_month <= uf.current_month
+    -- The user's features of the previous month, else of this one: never of a later month, which a month built
+    -- alongside later ones in a backfill would otherwise see
+    LEFT JOIN {{ ref('user_features') }} uf_prev
+    ON s.user_id = uf_prev.user_id
+    AND uf_prev.current_month = s.prev_month
+    LEFT JOIN {{ ref('user_features') }} uf_cur
+    ON s.user_id = uf_cur.user_id
+    AND uf_cur.current_month = s.current_month
 )
 SELECT * FROM features
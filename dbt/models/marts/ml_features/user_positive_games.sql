@@ -0,0 +1,37 @@
+-- models/marts/ml_features/user_positive_games.sql
+{{ config(
+    materialized='incremental',
+    unique_key='user_id',
+    on_schema_change='append_new_columns'
+) }}
+-- Per user state behind `user_features`: the games they voted up, sorted by the month of the vote.
+-- Each run only rewrites the users with reviews scraped since the last one
+WITH reviews AS (
+    SELECT user_id,
+           game_id,
+           DATE_TRUNC('month', timestamp_created)::DATE AS vote_month,
+           voted_up,
+           scrape_date
+    FROM {{ ref('fact_reviews') }}
+    {% if is_incremental() %}
+    -- Any vote: a review landed again replaces its fact_reviews row, maybe with its vote flipped, so these users are
+    -- rebuilt from all their current reviews rather than merged with their stored games
+    WHERE user_id IN (SELECT user_id FROM {{ ref('fact_reviews') }} WHERE scrape_date > {{ max_scrape_date(this) }})
+    {% else %}
+    WHERE voted_up = true
+    {% endif %}
+),
+votes AS (
+    -- Sorting one list of structs per user: ordered aggregates keep a sort state per user, which runs out of memory
+    SELECT user_id,
+           list_sort(list({'vote_month': vote_month, 'game_id': game_id}) FILTER (WHERE voted_up)) AS votes,
+           MAX(scrape_date) AS scrape_date
+    FROM reviews
+    GROUP BY user_id
+)
+-- A user left with no game voted up keeps a row with empty lists, which replaces the stored one
+SELECT user_id,
+       COALESCE(list_transform(votes, v -> v.game_id), []) AS game_ids,
+       COALESCE(list_transform(votes, v -> v.vote_month), []) AS vote_months,
+       scrape_date
+FROM votes
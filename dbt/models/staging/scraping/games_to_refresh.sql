@@ -0,0 +1,43 @@
+{{
+    config(
+        materialized='table',
+        tags=['scraping']
+    )
+}}
+-- depends_on: {{ source('raw', 'raw_game_payloads') }}
+-- Known games to scrape again this run: the longest unchecked first, popular games sooner
+WITH games AS (SELECT game_id,
+                      game_scrape_date,
+                      game_recommendations
+               FROM {{ ref('stg_games') }}),
+{% if external_files_exist('s3://raw/games_payloads/steam_games_payloads_*.parquet') %}
+     -- Fetches that found no change land no `raw_games` row, but still count as a refresh
+     last_fetched AS (SELECT appid,
+                             MAX(scrape_date) AS last_fetched_date
+                      FROM {{ source('raw', 'raw_game_payloads') }}
+                      GROUP BY appid),
+     checked AS (SELECT g.game_id,
+                        GREATEST(g.game_scrape_date, COALESCE(p.last_fetched_date, g.game_scrape_date))
+                                                AS last_checked_date,
+                        g.game_recommendations
+                 FROM games g
+                          LEFT JOIN last_fetched p ON p.appid = g.game_id),
+{% else %}
+     checked AS (SELECT game_id,
+                        game_scrape_date AS last_checked_date,
+                        game_recommendations
+                 FROM games),
+{% endif %}
+     prioritized AS (SELECT game_id,
+                            last_checked_date,
+                            DATE_DIFF('day', last_checked_date, CURRENT_DATE)
+                                * LN(2 + COALESCE(game_recommendations, 0)) AS refresh_priority
+                     FROM checked
+                     WHERE last_checked_date
+                               <= CURRENT_DATE - INTERVAL ({{ var('games_refresh_min_age_days', 30) }}) DAY)
+SELECT game_id AS appid,
+       last_checked_date,
+       refresh_priority
+FROM prioritized
+ORDER BY refresh_priority DESC, appid
+LIMIT {{ var('games_refresh_limit', 2000) }}
@@ -1,25 +1,50 @@
 -- models/staging/stg_games.sql
+-- depends_on: {{ source('raw', 'raw_game_review_summaries') }}
 {{ config(materialized='view') }}
 
-WITH filtered AS (SELECT *
-                  FROM {{ source('raw', 'raw_games') }}
+{% set has_review_summaries = external_files_exist(
+    's3://raw/game_review_summaries/steam_game_review_summaries_*.parquet') %}
+
+WITH latest AS (SELECT *
+                FROM {{ source('raw', 'raw_games') }}
+                -- Games are scraped again when their store data changes: the latest row is the current one
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY appid ORDER BY scrape_date DESC) = 1),
+     filtered AS (SELECT *
+                  FROM latest
                   WHERE type = 'game'
                     AND coming_soon = FALSE)
-SELECT appid                          AS game_id,
-       name                           AS game_name,
-       is_free                        AS game_is_free,
-       developers                     AS game_developers, -- list
-       publishers                     AS game_publishers, -- list
-       categories                     AS game_categories, -- list
-       genres                         AS game_genres,     -- list
+{% if has_review_summaries %}
+   , latest_review_summaries AS (SELECT appid, review_score, review_score_desc, scrape_date
+                                 FROM {{ source('raw', 'raw_game_review_summaries') }}
+                                 QUALIFY ROW_NUMBER() OVER (PARTITION BY appid ORDER BY scrape_date DESC) = 1)
+{% endif %}
+SELECT f.appid                        AS game_id,
+       f.name                         AS game_name,
+       f.is_free                      AS game_is_free,
+       f.developers                   AS game_developers, -- list
+       f.publishers                   AS game_publishers, -- list
+       f.categories                   AS game_categories, -- list
+       f.genres                       AS game_genres,     -- list
        COALESCE(
-               TRY_STRPTIME(release_date, '%b %d, %Y'),
-               TRY_STRPTIME(release_date, '%d %b, %Y')
+               TRY_STRPTIME(f.release_date, '%b %d, %Y'),
+               TRY_STRPTIME(f.release_date, '%d %b, %Y')
        )::TIMESTAMP                   AS game_release_date,
-       about_the_game                 AS game_about,
-       short_description              AS game_short_description,
-       detailed_description           AS game_detailed_description,
-       review_score                   AS game_review_score,
-       review_score_desc              AS game_review_score_description,
-       scrape_date                    AS game_scrape_date
-FROM filtered
+       f.about_the_game               AS game_about,
+       f.short_description            AS game_short_description,
+       f.detailed_description         AS game_detailed_description,
+       f.recommendations              AS game_recommendations,
+{% if has_review_summaries %}
+       -- Scores refreshed by `steam_games.review_summaries` since the game was scraped
+       CASE WHEN s.scrape_date > f.scrape_date THEN s.review_score ELSE f.review_score END
+                                      AS game_review_score,
+       CASE WHEN s.scrape_date > f.scrape_date THEN s.review_score_desc ELSE f.review_score_desc END
+                                      AS game_review_score_description,
+{% else %}
+       f.review_score                 AS game_review_score,
+       f.review_score_desc            AS game_review_score_description,
+{% endif %}
+       f.scrape_date                  AS game_scrape_date
+FROM filtered f
+{% if has_review_summaries %}
+         LEFT JOIN latest_review_summaries s USING (appid)
+{% endif %}
@@ -45,6 +45,17 @@ CREATE TABLE IF NOT EXISTS game_chunk_embeddings (
     PRIMARY KEY (game_id, chunk_id)
 );
 
+-- query embeddings cached by the RAG app, by model and normalized query text
+CREATE TABLE IF NOT EXISTS query_embedding_cache (
+    model TEXT NOT NULL,
+    query_text TEXT NOT NULL,
+    embedding REAL[] NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (model, query_text)
+);
+-- for expiring and pruning the cache by age
+CREATE INDEX IF NOT EXISTS idx_query_embedding_cache_created_at ON query_embedding_cache (created_at);
+
 -- add indexes for ANN search
 CREATE INDEX IF NOT EXISTS idx_profile_embedding
     ON game_profile_embeddings USING ivfflat (embedding vector_cosine_ops)
@@ -37,6 +37,14 @@ def games_etl_pipeline():
     def start_game_scraping():
         return "uv run python -m steam_games.game_data"
 
+    @task.bash(cwd='/opt/airflow/scraping', env={"MINIO_ENDPOINT_URL": "http://minio:9000"})
+    def refresh_review_summaries():
+        return "uv run python -m steam_games.review_summaries"
+
+    @task.bash(cwd='/opt/airflow/scraping', env={"MINIO_ENDPOINT_URL": "http://minio:9000"})
+    def compact_raw_games():
+        return "uv run python -m steam_games.compact"
+
     @task.skip_if(partial(table_not_exists, "raw_reviews"))
     @task.bash(cwd='/opt/airflow/dbt', env={"MINIO_ENDPOINT": "minio:9000"})
     def run_dbt_models():
@@ -45,9 +53,12 @@ def games_etl_pipeline():
     get_all_candidate_ids = get_all_candidate_ids()
     run_dbt_antijoin = run_dbt_antijoin()
     start_game_scraping = start_game_scraping()
+    refresh_review_summaries = refresh_review_summaries()
+    compact_raw_games = compact_raw_games()
     run_dbt_models = run_dbt_models()
 
-    get_all_candidate_ids >> run_dbt_antijoin >> start_game_scraping >> run_dbt_models
+    (get_all_candidate_ids >> run_dbt_antijoin >> start_game_scraping >> refresh_review_summaries
+     >> compact_raw_games >> run_dbt_models)
 
 
 dag_instance = games_etl_pipeline()
@@ -12,6 +12,16 @@ default_args = {
     'retry_delay': timedelta(minutes=1)
 }
 
+SCRAPING_ENV = {
+    "MINIO_ENDPOINT_URL": "http://minio:9000",
+    "POSTGRES_HOST": "postgres",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "POSTGRES_PORT": "5432"
+}
+# Parallel scraping workers. Apps are split by a stable hash of their id, the request quota is split evenly
+SHARD_COUNT = 4
+
 
 @dag(dag_id='reviews_etl_pipeline',
      default_args=default_args,
@@ -21,27 +31,24 @@ default_args = {
 def reviews_etl_pipeline():
 
     @task.skip_if(partial(table_not_exists, "raw_games"))
-    @task.bash(
-        cwd='/opt/airflow/scraping',
-        env={
-            "MINIO_ENDPOINT_URL": "http://minio:9000",
-            "POSTGRES_HOST": "postgres",
-            "POSTGRES_USER": "postgres",
-            "POSTGRES_PASSWORD": "postgres",
-            "POSTGRES_PORT": "5432"
-        }
-    )
-    def start_reviews_scraping():
-        return "uv run python -m steam_reviews.steam_reviews"
+    @task.bash(cwd='/opt/airflow/scraping', env=SCRAPING_ENV)
+    def start_reviews_scraping(shard_index: int):
+        return (f"uv run python -m steam_reviews.steam_reviews "
+                f"--shard-index {shard_index} --shard-count {SHARD_COUNT}")
+
+    @task.bash(cwd='/opt/airflow/scraping', env=SCRAPING_ENV)
+    def compact_raw_reviews():
+        return "uv run python -m steam_reviews.compact"
 
     @task.bash(cwd='/opt/airflow/dbt', env={"MINIO_ENDPOINT": "minio:9000"})
     def run_dbt_models():
         return "uv run dbt run --exclude tag:scraping"
 
-    start_game_scraping = start_reviews_scraping()
+    start_review_scraping = start_reviews_scraping.expand(shard_index=list(range(SHARD_COUNT)))
+    compact_raw_reviews = compact_raw_reviews()
     run_dbt_models = run_dbt_models()
 
-    start_game_scraping >> run_dbt_models
+    start_review_scraping >> compact_raw_reviews >> run_dbt_models
 
 
 dag_instance = reviews_etl_pipeline()
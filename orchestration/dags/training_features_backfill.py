@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta, timezone
+
+from airflow.sdk import Param, dag, task
+
+
+default_args = {
+    'owner': 'etl',
+    'retries': 1,
+    'retry_delay': timedelta(minutes=5)
+}
+
+# Months built by each dbt run. A run computes all of its months in one set-based pass and writes their
+# `current_month=` partitions at once, so ~190 months of history take a handful of runs
+MONTHS_PER_RUN = 48
+
+
+def add_months(month: date, months: int) -> date:
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def month_ranges(start_month: date, end_month: date, months_per_run: int) -> list[dict[str, str]]:
+    """Consecutive `backfill_start`/`backfill_end` dbt vars covering the months from `start_month` to `end_month`"""
+    ranges = []
+    month = start_month.replace(day=1)
+    while month <= end_month:
+        last_month = min(add_months(month, months_per_run - 1), end_month.replace(day=1))
+        ranges.append({"backfill_start": month.isoformat(), "backfill_end": last_month.isoformat()})
+        month = add_months(last_month, 1)
+    return ranges
+
+
+@dag(dag_id='training_features_backfill',
+     default_args=default_args,
+     start_date=datetime(2025, 8, 10, tzinfo=timezone.utc),
+     schedule=None,
+     max_active_runs=1,
+     catchup=False,
+     params={
+         "start_month": Param("2010-10-01", type="string", format="date"),
+         "end_month": Param(None, type=["null", "string"], format="date",
+                            description="Last month to build, by default the one the monthly pipeline ran last"),
+         "months_per_run": Param(MONTHS_PER_RUN, type="integer", minimum=1),
+     })
+def training_features_backfill():
+
+    @task
+    def plan_month_ranges(params=None) -> list[dict[str, str]]:
+        end_month = (date.fromisoformat(params["end_month"]) if params["end_month"]
+                     else add_months(datetime.now(timezone.utc).date().replace(day=1), -1))
+        return month_ranges(date.fromisoformat(params["start_month"]), end_month, params["months_per_run"])
+
+    # Ranges do not depend on each other, but one dbt run at a time holds the DuckDB file
+    @task.bash(cwd='/opt/airflow/dbt', env={
+        "HOME": "/opt/airflow",
+        "MINIO_ENDPOINT": "minio:9000"
+    }, max_active_tis_per_dagrun=1)
+    def run_dbt_models(month_range: dict[str, str]):
+        return (f"uv run dbt run --select tag:training --vars '{{backfill_start: \"{month_range['backfill_start']}\", "
+                f"backfill_end: \"{month_range['backfill_end']}\"}}'")
+
+    run_dbt_models.expand(month_range=plan_month_ranges())
+
+
+dag_instance = training_features_backfill()
@@ -10,12 +10,13 @@ default_args = {
 }
 
 
+# History is built by `training_features_backfill`; this pipeline adds the month just closed
 @dag(dag_id='training_features_etl_pipeline',
      default_args=default_args,
      start_date=datetime(2010, 10, 1, tzinfo=timezone.utc),
      schedule="@monthly",
      max_active_runs=1,
-     catchup=True)
+     catchup=False)
 def training_features_etl_pipeline():
 
     @task.bash(cwd='/opt/airflow/dbt', env={
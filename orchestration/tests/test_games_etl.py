@@ -18,7 +18,7 @@ def test_catchup():
 
 
 def test_task_count():
-    assert len(dag_instance.task_ids) == 4
+    assert len(dag_instance.task_ids) == 6
 
 
 def test_task_ids():
@@ -26,6 +26,8 @@ def test_task_ids():
         "get_all_candidate_ids",
         "run_dbt_antijoin",
         "start_game_scraping",
+        "refresh_review_summaries",
+        "compact_raw_games",
         "run_dbt_models",
     }
 
@@ -34,7 +36,11 @@ def test_task_order():
     get_all_candidate_ids = dag_instance.get_task("get_all_candidate_ids")
     run_dbt_antijoin = dag_instance.get_task("run_dbt_antijoin")
     start_game_scraping = dag_instance.get_task("start_game_scraping")
+    refresh_review_summaries = dag_instance.get_task("refresh_review_summaries")
+    compact_raw_games = dag_instance.get_task("compact_raw_games")
 
     assert "run_dbt_antijoin" in get_all_candidate_ids.downstream_task_ids
     assert "start_game_scraping" in run_dbt_antijoin.downstream_task_ids
-    assert "run_dbt_models" in start_game_scraping.downstream_task_ids
+    assert "refresh_review_summaries" in start_game_scraping.downstream_task_ids
+    assert "compact_raw_games" in refresh_review_summaries.downstream_task_ids
+    assert "run_dbt_models" in compact_raw_games.downstream_task_ids
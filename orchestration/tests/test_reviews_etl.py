@@ -1,4 +1,4 @@
-from reviews_etl import dag_instance
+from reviews_etl import dag_instance, SHARD_COUNT
 
 
 def test_dag_loaded():
@@ -18,13 +18,20 @@ def test_catchup():
 
 
 def test_task_count():
-    assert len(dag_instance.task_ids) == 2
+    assert len(dag_instance.task_ids) == 3
 
 
 def test_task_ids():
-    assert set(dag_instance.task_ids) == {"start_reviews_scraping", "run_dbt_models"}
+    assert set(dag_instance.task_ids) == {"start_reviews_scraping", "compact_raw_reviews", "run_dbt_models"}
 
 
 def test_task_order():
     start_reviews_scraping = dag_instance.get_task("start_reviews_scraping")
-    assert "run_dbt_models" in start_reviews_scraping.downstream_task_ids
+    compact_raw_reviews = dag_instance.get_task("compact_raw_reviews")
+    assert "compact_raw_reviews" in start_reviews_scraping.downstream_task_ids
+    assert "run_dbt_models" in compact_raw_reviews.downstream_task_ids
+
+
+def test_scraping_is_sharded():
+    start_reviews_scraping = dag_instance.get_task("start_reviews_scraping")
+    assert start_reviews_scraping.op_kwargs_expand_input.value["shard_index"] == list(range(SHARD_COUNT))
@@ -0,0 +1,46 @@
+from datetime import date
+
+from training_features_backfill import add_months, dag_instance, month_ranges
+
+
+def test_dag_loaded():
+    assert dag_instance is not None
+
+
+def test_dag_id():
+    assert dag_instance.dag_id == "training_features_backfill"
+
+
+def test_schedule():
+    assert dag_instance.schedule is None
+
+
+def test_max_active_runs():
+    assert dag_instance.max_active_runs == 1
+
+
+def test_task_ids():
+    assert set(dag_instance.task_ids) == {"plan_month_ranges", "run_dbt_models"}
+
+
+def test_dbt_runs_are_serialized():
+    assert dag_instance.get_task("run_dbt_models").max_active_tis_per_dagrun == 1
+
+
+def test_month_ranges_cover_every_month_once():
+    ranges = month_ranges(date(2010, 10, 1), date(2026, 8, 1), 48)
+
+    assert ranges[0] == {"backfill_start": "2010-10-01", "backfill_end": "2014-09-01"}
+    assert ranges[-1] == {"backfill_start": "2022-10-01", "backfill_end": "2026-08-01"}
+    assert len(ranges) == 4
+    for previous, following in zip(ranges, ranges[1:]):
+        assert add_months(date.fromisoformat(previous["backfill_end"]), 1).isoformat() == following["backfill_start"]
+
+
+def test_month_ranges_single_month():
+    assert month_ranges(date(2024, 2, 1), date(2024, 2, 1), 12) == [
+        {"backfill_start": "2024-02-01", "backfill_end": "2024-02-01"}]
+
+
+def test_month_ranges_empty_when_end_before_start():
+    assert month_ranges(date(2024, 2, 1), date(2024, 1, 1), 12) == []
@@ -14,7 +14,7 @@ def test_schedule():
 
 
 def test_catchup():
-    assert dag_instance.catchup is True
+    assert dag_instance.catchup is False
 
 
 def test_max_active_runs():
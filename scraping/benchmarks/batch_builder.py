@@ -0,0 +1,62 @@
+"""Compares per-app `pl.concat` accumulation against RecordBatchBuilder: rows/sec and peak RSS"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+
+import polars as pl
+
+from benchmarks.stub_steam_server import make_review
+from steam_reviews.steam_reviews import ReviewProcessor
+from utils.batch_builder import RecordBatchBuilder
+
+
+def app_batches(num_rows: int, reviews_per_app: int) -> list[list[dict]]:
+    processor = ReviewProcessor(db_client=None, client=None)
+    now = int(time.time())
+    reviews = [processor.create_review_record(make_review(appid=i // reviews_per_app, index=i, now=now),
+                                              appid=str(i // reviews_per_app)) for i in range(num_rows)]
+    return [reviews[i:i + reviews_per_app] for i in range(0, num_rows, reviews_per_app)]
+
+
+def accumulate_concat(batches: list[list[dict]], schema: dict) -> pl.DataFrame:
+    reviews = pl.DataFrame(infer_schema_length=None, schema=schema)
+    for app_reviews in batches:
+        reviews = pl.concat([reviews, pl.DataFrame(app_reviews, infer_schema_length=None)], how='vertical')
+    return reviews
+
+
+def accumulate_builder(batches: list[list[dict]], schema: dict) -> pl.DataFrame:
+    reviews = RecordBatchBuilder(schema)
+    for app_reviews in batches:
+        reviews.extend(app_reviews)
+    return reviews.flush()
+
+
+def run_mode(mode: str, num_rows: int, reviews_per_app: int) -> None:
+    batches = app_batches(num_rows, reviews_per_app)
+    schema = ReviewProcessor(db_client=None, client=None).schema
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    accumulate = accumulate_concat if mode == "concat" else accumulate_builder
+    start = time.perf_counter()
+    df = accumulate(batches, schema)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    print(f"{mode:>8}: {len(df)} rows in {elapsed:.2f}s ({len(df) / elapsed:,.0f} rows/s), "
+          f"peak RSS {peak_rss / 1024:.0f} MiB (+{(peak_rss - baseline_rss) / 1024:.0f} MiB over input records)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--reviews-per-app", type=int, default=20)
+    parser.add_argument("--mode", choices=["concat", "builder"], default=None,
+                        help="Run a single mode in this process. By default both run in separate processes")
+    args = parser.parse_args()
+    if args.mode:
+        run_mode(args.mode, args.rows, args.reviews_per_app)
+    else:
+        for mode in ("concat", "builder"):
+            subprocess.run([sys.executable, "-m", "benchmarks.batch_builder", "--mode", mode,
+                            "--rows", str(args.rows), "--reviews-per-app", str(args.reviews_per_app)], check=True)
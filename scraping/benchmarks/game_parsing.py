@@ -0,0 +1,158 @@
+"""Checks the Polars payload parser against the previous per-record parser, and measures apps/sec"""
+import argparse
+import json
+import random
+import re
+import time
+from datetime import date
+
+import polars as pl
+
+from benchmarks.text_cleaning import steam_description
+from steam_games.parsing import APP_PAYLOADS_SCHEMA, APPS_FEATURES_SCHEMA, parse_app_payloads, payload_hash
+from utils.text_cleaning import clean_and_extract_text
+
+LANGUAGES = ["English<strong>*</strong>", "French", "German<strong>*</strong>", "Spanish - Spain",
+             "Japanese", "Simplified Chinese"]
+LANGUAGES_NOTE = "<br><strong>*</strong>languages with full audio support"
+CATEGORIES = ["Single-player", "Multi-player", "Steam Achievements", "Full controller support", "Steam Cloud"]
+GENRES = ["Action", "Adventure", "Indie", "RPG", "Strategy", "Simulation", "Casual"]
+
+
+def legacy_parse(appid: int, data: dict, game_reviews_data: dict, scrape_date: date) -> dict | None:
+    """The per-record parser `parse_app_payloads` replaced, None where it skipped the app"""
+    if not (data.get(str(appid), {}).get("success") and game_reviews_data.get("reviews") is not None):
+        return None
+    app_info = data[str(appid)]["data"]
+    if app_info["short_description"] == '' or not app_info.get("supported_languages") or not \
+            app_info["pc_requirements"] or not app_info.get("genres") or not app_info.get("categories"):
+        return None
+    languages = re.sub(r"<.*?>", "", app_info["supported_languages"]).replace(", ", ",").split(",")
+    for j, lang in enumerate(languages):
+        languages[j] = re.sub(r"\*(.*)?", "", lang)
+    price = app_info["price_overview"]["initial"] / 100 if app_info.get("price_overview") else None
+    recommendations = int(app_info["recommendations"]["total"]) if app_info.get("recommendations") else None
+    recommended = app_info["pc_requirements"].get("recommended")
+    minimum = app_info["pc_requirements"].get("minimum")
+    req_age = re.findall(r"\d+", str(app_info["required_age"]))
+    return {
+        "appid": appid,
+        "name": app_info["name"],
+        "type": app_info["type"],
+        "required_age": int(req_age[0]) if req_age else None,
+        "is_free": app_info["is_free"],
+        "minimum_pc_requirements": re.sub(r"<.*?>", "", minimum) if minimum else None,
+        "recommended_pc_requirements": re.sub(r"<.*?>", "", recommended) if recommended else None,
+        "controller_support": app_info.get("controller_support", None),
+        "detailed_description": clean_and_extract_text(app_info["detailed_description"]),
+        "about_the_game": clean_and_extract_text(app_info["about_the_game"]),
+        "short_description": app_info["short_description"],
+        "supported_languages": languages,
+        "header_image": app_info.get("header_image", None),
+        "developers": app_info.get("developers", []),
+        "publishers": app_info.get("publishers", []),
+        "price": price,
+        "categories": [v["description"] for v in app_info["categories"]],
+        "genres": [v["description"] for v in app_info["genres"]],
+        "windows_support": app_info["platforms"]["windows"],
+        "mac_support": app_info["platforms"]["mac"],
+        "linux_support": app_info["platforms"]["linux"],
+        "release_date": app_info["release_date"]["date"],
+        "coming_soon": app_info["release_date"]["coming_soon"],
+        "recommendations": recommendations,
+        "dlc": app_info.get("dlc", []),
+        "review_score": game_reviews_data["query_summary"].get("review_score", None),
+        "review_score_desc": game_reviews_data["query_summary"].get("review_score_desc", None),
+        "scrape_date": scrape_date,
+    }
+
+
+def app_response(rng: random.Random, appid: int, plain_descriptions: bool = False) -> tuple[dict, dict]:
+    """An /api/appdetails and /appreviews response pair, with the quirks seen in real payloads"""
+    if rng.random() < 0.05:
+        return {str(appid): {"success": False}}, {"success": 1, "query_summary": {"num_reviews": 0}, "reviews": []}
+    description = f"About game {appid}" if plain_descriptions else steam_description(rng)
+    app_info = {
+        "type": rng.choice(["game", "game", "game", "dlc", "demo"]),
+        "name": f"Game {appid}",
+        "steam_appid": appid,
+        "required_age": rng.choice([0, 17, "18", "18+", "", "PEGI 16"]),
+        "is_free": rng.random() < 0.2,
+        "detailed_description": description,
+        "about_the_game": description,
+        "short_description": rng.choice(["", "A short description &amp; more", "Explore the world"]),
+        "supported_languages": ", ".join(rng.sample(LANGUAGES, rng.randint(1, 4))) + rng.choice(["", LANGUAGES_NOTE]),
+        "header_image": f"https://cdn.akamai.steamstatic.com/steam/apps/{appid}/header.jpg",
+        "pc_requirements": rng.choice([
+            [],
+            {"minimum": "<strong>Minimum:</strong><br><ul class=\"bb_ul\"><li>OS: Windows 10</li></ul>"},
+            {"minimum": "<strong>Minimum:</strong> 4 GB RAM", "recommended": "<strong>Recommended:</strong> 8 GB"},
+            {"minimum": "", "recommended": "<br>"},
+        ]),
+        "platforms": {"windows": True, "mac": rng.random() < 0.3, "linux": rng.random() < 0.2},
+        "categories": [{"id": i, "description": c} for i, c in enumerate(rng.sample(CATEGORIES, rng.randint(0, 3)))],
+        "genres": [{"id": str(i), "description": g} for i, g in enumerate(rng.sample(GENRES, rng.randint(0, 3)))],
+        "release_date": {"coming_soon": rng.random() < 0.1, "date": "14 Oct, 2024"},
+    }
+    for key, value in [("controller_support", "full"), ("developers", ["Studio"]), ("publishers", ["Publisher"]),
+                       ("price_overview", {"currency": "USD", "initial": rng.randint(99, 5999), "final": 99}),
+                       ("recommendations", {"total": rng.randint(0, 100_000)}),
+                       ("dlc", [appid + 1, appid + 2])]:
+        if rng.random() < 0.7:
+            app_info[key] = value
+    reviews = {"success": 1, "query_summary": {"num_reviews": 20, "review_score": rng.randint(0, 9),
+                                               "review_score_desc": "Very Positive"}, "reviews": []}
+    if rng.random() < 0.05:
+        del reviews["reviews"]
+    return {str(appid): {"success": True, "data": app_info}}, reviews
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=10_000)
+    parser.add_argument("--plain-descriptions", action="store_true",
+                        help="Descriptions without markup, to measure the parsing of the other fields alone")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    scrape_date = date(2024, 10, 14)
+    responses = [(appid, *app_response(rng, appid, args.plain_descriptions)) for appid in range(10, 10 + args.apps)]
+    payloads = pl.DataFrame([{
+        "appid": appid,
+        "appdetails": json.dumps(data.get(str(appid)), sort_keys=True),
+        "reviews_summary": json.dumps(reviews["query_summary"], sort_keys=True)
+        if reviews.get("reviews") is not None else None,
+        "scrape_date": scrape_date,
+    } for appid, data, reviews in responses], schema=APP_PAYLOADS_SCHEMA)
+    payloads = payloads.with_columns(payload_hash=pl.Series([
+        payload_hash(appdetails, summary) for appdetails, summary in zip(payloads["appdetails"],
+                                                                         payloads["reviews_summary"])]))
+
+    # Both start from the landed payloads, as when parsing historical payloads again
+    start = time.perf_counter()
+    records = [legacy_parse(appid, {str(appid): json.loads(appdetails)},
+                            {"query_summary": json.loads(summary), "reviews": []} if summary is not None else {},
+                            scrape_date)
+               for appid, appdetails, summary in payloads.select("appid", "appdetails", "reviews_summary").iter_rows()]
+    legacy = pl.DataFrame([r for r in records if r is not None], schema=APPS_FEATURES_SCHEMA)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed = parse_app_payloads(payloads)
+    polars_seconds = time.perf_counter() - start
+
+    parsed = parsed.drop("payload_hash")  # not something the per-record parser had
+    legacy = legacy.drop("payload_hash")
+    identical = parsed.equals(legacy, null_equal=True)
+    print(f"{len(parsed)}/{len(payloads)} apps parsed, {'identical to' if identical else 'DIFFERENT from'} "
+          f"the per-record parser ({len(legacy)} apps)")
+    print(f"{'per-record parser':<24} {len(payloads) / legacy_seconds:8.0f} apps/s")
+    print(f"{'parse_app_payloads':<24} {len(payloads) / polars_seconds:8.0f} apps/s")
+    if not identical:
+        for column in legacy.columns:
+            if len(parsed) == len(legacy) and not parsed[column].equals(legacy[column], null_equal=True):
+                print(f"  column {column} differs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Measures the bytes and files the weekly `int_deduplicated_reviews` increment reads, by raw layout and predicate"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import duckdb
+import polars as pl
+
+from steam_reviews.steam_reviews import REVIEWS_SCHEMA
+from utils.parquet_sink import ParquetSink, PartitionedParquetSink
+
+WORDS = ["explore", "vast", "open", "world", "craft", "weapons", "epic", "battles", "with", "friends", "co-op",
+         "great", "story", "boring", "grind", "bugs", "masterpiece", "refund", "hours", "worth", "price", "sale"]
+
+# The compiled view chain under `int_deduplicated_reviews`, over a stand-in for `int_deduplicated_games`
+VIEW_CHAIN = """
+CREATE OR REPLACE VIEW stg_reviews AS
+SELECT rec_id AS review_id, author_id AS user_id, appid AS game_id, review,
+       TO_TIMESTAMP(timestamp_created)::TIMESTAMP AS timestamp_created, scrape_date, written_during_early_access,
+       voted_up, weighted_vote_score, votes_up, comment_count
+FROM read_parquet('{glob}'{options});
+CREATE OR REPLACE VIEW int_canonical_game_ids AS
+SELECT g.game_id AS original_game_id, c.game_id AS canonical_game_id
+FROM int_deduplicated_games c JOIN int_deduplicated_games g ON g.game_name = c.game_name;
+CREATE OR REPLACE VIEW int_reviews_with_canonical_id AS
+SELECT r.review_id, r.user_id, COALESCE(m.canonical_game_id, r.game_id) AS game_id, r.review, r.timestamp_created,
+       r.scrape_date, r.written_during_early_access, r.voted_up, r.weighted_vote_score, r.votes_up, r.comment_count
+FROM stg_reviews r
+LEFT JOIN int_canonical_game_ids m ON r.game_id = m.original_game_id
+WHERE COALESCE(m.canonical_game_id, r.game_id) IN (SELECT game_id FROM int_deduplicated_games);
+"""
+INCREMENT = """
+SELECT * FROM int_reviews_with_canonical_id r WHERE r.scrape_date > {since}
+QUALIFY ROW_NUMBER() OVER (PARTITION BY review_id ORDER BY game_id DESC) = 1
+"""
+
+
+def weekly_reviews(rng: random.Random, week: int, scrape_date: date, reviews: int, games: int) -> pl.DataFrame:
+    df = pl.DataFrame({
+        "rec_id": range(week * reviews, (week + 1) * reviews),
+        "author_id": [rng.randrange(reviews) for _ in range(reviews)],
+        "appid": [rng.randrange(games) * 10 for _ in range(reviews)],
+        "review": [" ".join(rng.choices(WORDS, k=rng.randint(5, 80))) for _ in range(reviews)],
+        "timestamp_created": [1_700_000_000 + week * 604_800 + i for i in range(reviews)],
+        "written_during_early_access": [rng.random() < 0.1 for _ in range(reviews)],
+        "voted_up": [rng.random() < 0.8 for _ in range(reviews)],
+        "weighted_vote_score": [rng.random() for _ in range(reviews)],
+        "votes_up": [rng.randrange(50) for _ in range(reviews)],
+        "comment_count": [rng.randrange(5) for _ in range(reviews)],
+        "scrape_date": [scrape_date] * reviews,
+    })
+    return df.with_columns(pl.lit(None, dtype=dtype).alias(column)
+                           for column, dtype in REVIEWS_SCHEMA.items() if column not in df.columns)
+
+
+def files_read(operator: dict) -> int:
+    files = int(operator.get("extra_info", {}).get("Total Files Read", 0))
+    return files + sum(files_read(child) for child in operator.get("children", []))
+
+
+def bytes_read_by_process() -> int:
+    # Every read syscall, Parquet footers and column chunks alike (Linux only)
+    with open("/proc/self/io") as f:
+        return int(next(line for line in f if line.startswith("rchar:")).split()[1])
+
+
+def measure(conn: duckdb.DuckDBPyConnection, query: str, profile_path: str) -> tuple[int, int, int, float]:
+    """(rows, files read, bytes read, seconds) of `query`"""
+    conn.sql("PRAGMA enable_profiling = 'json'")
+    conn.sql(f"PRAGMA profiling_output = '{profile_path}'")
+    bytes_before, start = bytes_read_by_process(), time.perf_counter()
+    rows = len(conn.sql(query).fetchall())
+    seconds, bytes_read = time.perf_counter() - start, bytes_read_by_process() - bytes_before
+    conn.sql("PRAGMA disable_profiling")
+    with open(profile_path) as f:
+        return rows, files_read(json.load(f)), bytes_read, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weeks", type=int, default=26)
+    parser.add_argument("--reviews-per-week", type=int, default=20_000)
+    parser.add_argument("--games", type=int, default=2_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    first_week = date(2025, 1, 5)
+    with tempfile.TemporaryDirectory() as lake:
+        for week in range(args.weeks):
+            scrape_date = first_week + timedelta(weeks=week)
+            reviews = weekly_reviews(rng, week, scrape_date, args.reviews_per_week, args.games)
+            # As written before partitioning, and as partitioned then compacted: one file per partition
+            with ParquetSink(f"{lake}/flat", f"steam_reviews_{scrape_date}", REVIEWS_SCHEMA,
+                             max_rows_per_file=1_000_000) as sink:
+                sink.write(reviews)
+            with PartitionedParquetSink(f"{lake}/partitioned", f"steam_reviews_{scrape_date}", REVIEWS_SCHEMA,
+                                        max_rows_per_file=1_000_000) as sink:
+                sink.write(reviews)
+        last_loaded = first_week + timedelta(weeks=args.weeks - 2)
+
+        conn = duckdb.connect()
+        conn.sql("SET enable_external_file_cache = false")  # every run reads from disk, as a fresh dbt run would
+        conn.sql(f"CREATE TABLE int_deduplicated_games AS SELECT range * 10 AS game_id, 'Game ' || range AS game_name "
+                 f"FROM range({args.games})")
+        conn.sql(f"CREATE TABLE loaded AS SELECT DATE '{last_loaded}' AS scrape_date")
+        layouts = {
+            "flat": (f"{lake}/flat/steam_reviews_*.parquet", ""),
+            "partitioned": (f"{lake}/partitioned/scrape_date=*/appid_bucket=*/*.parquet", ", hive_partitioning=true"),
+        }
+        runs = [
+            ("full history (refresh)", "partitioned", "DATE '1970-01-01'"),
+            ("flat files, subquery", "flat", "(SELECT MAX(scrape_date) FROM loaded)"),
+            ("partitions, subquery", "partitioned", "(SELECT MAX(scrape_date) FROM loaded)"),
+            ("partitions, literal", "partitioned", f"DATE '{last_loaded}'"),
+        ]
+        total_bytes = sum(os.path.getsize(os.path.join(root, name))
+                          for root, _, names in os.walk(f"{lake}/partitioned") for name in names)
+        print(f"{args.weeks} weeks of {args.reviews_per_week} reviews, {total_bytes / 1e6:.1f} MB partitioned; "
+              f"the weekly run reads the reviews scraped after {last_loaded}")
+        print(f"{'layout, predicate':<24} {'rows':>8} {'files':>6} {'MB read':>8} {'seconds':>8}")
+        for label, layout, since in runs:
+            glob, options = layouts[layout]
+            conn.sql(VIEW_CHAIN.format(glob=glob, options=options))
+            rows, files, bytes_read, seconds = measure(conn, INCREMENT.format(since=since),
+                                                       os.path.join(lake, "profile.json"))
+            print(f"{label:<24} {rows:>8} {files:>6} {bytes_read / 1e6:>8.2f} {seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measures achieved requests/sec of the concurrent review scraper against the local stub server"""
+import argparse
+import asyncio
+import logging
+import time
+from collections.abc import Collection
+from datetime import datetime
+
+from benchmarks.stub_steam_server import num_reviews_for_app, start_stub_server
+from steam_reviews.steam_reviews import App, ReviewProcessor
+from utils.db import DbClient
+from utils.response_archive import ArchiveReplay, ResponseArchive
+from utils.steam_api import AsyncSteamClient, HttpConfig, ReplaySteamClient
+
+
+class InMemoryDbClient(DbClient):
+    def __init__(self):
+        self.timestamps: dict[str, datetime] = {}
+
+    def load_latest_timestamps(self, appids: Collection[str] | None = None) -> dict[str, datetime]:
+        return {k: v for k, v in self.timestamps.items() if appids is None or k in appids}
+
+    def update_latest_timestamps(self, updates: dict[str, datetime]) -> None:
+        self.timestamps.update(updates)
+
+
+async def run_benchmark(num_apps: int, concurrency: int, requests_per_second: float, base_url: str | None,
+                        archive: ResponseArchive | None = None, replay: ArchiveReplay | None = None) -> None:
+    apps = [App(app_id=str(appid), name=f"stub-{appid}") for appid in range(1, num_apps + 1)]
+    expected_reviews = sum(num_reviews_for_app(appid) for appid in range(1, num_apps + 1))
+    if replay is not None:
+        client = ReplaySteamClient(replay)
+    else:
+        client = AsyncSteamClient(requests_per_second=requests_per_second, config=HttpConfig(pool_size=concurrency),
+                                  base_url=base_url, archive=archive)
+    async with client:
+        processor = ReviewProcessor(InMemoryDbClient(), client)
+        start = time.perf_counter()
+        total_reviews = 0
+        async for _, result in processor.fetch_reviews_concurrently(apps, concurrency):
+            total_reviews += len(result.reviews)
+        elapsed = time.perf_counter() - start
+        for limiter in client.limiters():
+            print(limiter.stats())
+        print(f"HTTP: {client.stats()}")
+    print(f"{num_apps} apps, {total_reviews}/{expected_reviews} reviews in {elapsed:.2f}s "
+          f"with concurrency={concurrency}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apps", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-second", type=float, default=50.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-probability", type=float, default=0.0)
+    parser.add_argument("--archive", default=None, metavar="PATH",
+                        help="Archive the stub server responses at PATH, to replay them later")
+    parser.add_argument("--replay", default=None, metavar="PATH",
+                        help="Replay the responses archived at PATH instead of starting the stub server")
+    args = parser.parse_args()
+    if args.replay:
+        replay = ArchiveReplay(args.replay, endpoints=("appreviews",))
+        asyncio.run(run_benchmark(args.apps, args.concurrency, args.requests_per_second, None, replay=replay))
+    else:
+        server, url = start_stub_server(latency=args.latency, throttle_probability=args.throttle_probability)
+        archive = ResponseArchive(args.archive, scope="benchmark") if args.archive else None
+        try:
+            asyncio.run(run_benchmark(args.apps, args.concurrency, args.requests_per_second, url, archive=archive))
+        finally:
+            server.shutdown()
+            if archive is not None:
+                archive.close()
@@ -0,0 +1,110 @@
+"""Local stand-in for the Steam store API, used to benchmark the scrapers without hitting the real quota"""
+import argparse
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PAGE_SIZE = 100
+
+
+def num_reviews_for_app(appid: int) -> int:
+    return (appid * 37) % 450  # deterministic spread of 0..449 reviews (up to 5 pages)
+
+
+def make_review(appid: int, index: int, now: int) -> dict:
+    return {
+        "recommendationid": str(appid * 1_000_000 + index),
+        "author": {"steamid": str(76561197960265728 + index), "num_games_owned": 10, "num_reviews": 2,
+                   "playtime_forever": 120, "playtime_last_two_weeks": 0, "playtime_at_review": 60,
+                   "last_played": now - index * 3600},
+        "language": "english",
+        "review": f"Stub review {index} for app {appid}",
+        "timestamp_created": now - index * 3600,  # newest first, like filter=recent
+        "timestamp_updated": now - index * 3600,
+        "voted_up": index % 3 != 0,
+        "votes_up": index % 7,
+        "votes_funny": 0,
+        "weighted_vote_score": "0.5",
+        "comment_count": 0,
+        "steam_purchase": True,
+        "received_for_free": False,
+        "written_during_early_access": False,
+        "primarily_steam_deck": False,
+    }
+
+
+class StubSteamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real store
+    latency: float = 0.05
+    throttle_probability: float = 0.0
+    now: int = int(time.time())
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if random.random() < self.throttle_probability:
+            return self._send_json(429, {}, headers={"Retry-After": "1"})
+        if url.path.startswith("/appreviews/"):
+            return self._send_json(200, self._reviews_page(int(url.path.rsplit("/", 1)[-1]), params))
+        if url.path == "/api/appdetails":
+            appid = params["appids"]
+            return self._send_json(200, {appid: {"success": False}})
+        return self._send_json(404, {})
+
+    def _reviews_page(self, appid: int, params: dict) -> dict:
+        total = num_reviews_for_app(appid)
+        offset = 0 if params.get("cursor", "*") == "*" else int(params["cursor"])
+        page_size = int(params.get("num_per_page", PAGE_SIZE))
+        end = min(total, offset + page_size)
+        return {
+            "success": 1,
+            "query_summary": {"num_reviews": end - offset, "review_score": 8, "review_score_desc": "Very Positive",
+                              "total_reviews": total},
+            "reviews": [make_review(appid, i, self.now) for i in range(offset, end)],
+            "cursor": str(end) if end < total else None,
+        }
+
+
+def start_stub_server(port: int = 0, latency: float = 0.05,
+                      throttle_probability: float = 0.0) -> tuple[ThreadingHTTPServer, str]:
+    """Start the stub in a daemon thread. Returns the server and its base url"""
+    handler = type("ConfiguredStubSteamHandler", (StubSteamHandler,),
+                   {"latency": latency, "throttle_probability": throttle_probability})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Serve a stub Steam store API on localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated latency per request")
+    parser.add_argument("--throttle-probability", type=float, default=0.0, help="Fraction of requests answered 429")
+    args = parser.parse_args()
+    stub, base_url = start_stub_server(args.port, args.latency, args.throttle_probability)
+    logging.info(f"Stub Steam store listening on {base_url} (export STEAM_STORE_URL={base_url})")
+    threading.Event().wait()
@@ -0,0 +1,119 @@
+"""Checks the streaming cleaner against the BeautifulSoup implementation on a golden corpus, and measures docs/sec"""
+import argparse
+import random
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from utils.text_cleaning import clean_and_extract_text, clean_many
+
+WORDS = ["explore", "a", "vast", "open", "world", "&amp;", "craft", "weapons", "&quot;epic&quot;", "battles", "&#39;",
+         "with", "friends", "&nbsp;", "co-op", "™", "ü", "日本語", "&eacute;", "&#x2014;", "&#8212;", "&lt;3",
+         "&copy", "&notanentity;", "&#150;", "&#xD800;", "&#0;", "\n", "\t", "\xa0", "  "]
+BLOCKS = ["p", "li", "strong", "span", "h2", "ul", "i", "h1", "u", "div", "th", "td", "tr", "table", "ol",
+          "blockquote", "b", "h6", "em", "h3", "code", "center", "a", "sup", "picture", "video", "style", "script",
+          "template", "rt", "textarea", "pre"]
+VOIDS = ["br", "img", "hr", "source", "wbr", "input"]
+ODDITIES = ["<!-- comment -->", "<![CDATA[cdata text]]>", "<!DOCTYPE html>", "<?php echo 1 ?>", "</br>", "</p>",
+            "</div>", "<br/>", "<div/>", "<img src=x />", "<a href='https://store.steampowered.com'>link</a>",
+            "<span class=\"bb_tag\">", "< not a tag", "a < b > c", "&#", "&#x;", "<!bogus>", "</img>"]
+
+
+def reference_clean(html_content: str | None) -> str:
+    """The BeautifulSoup implementation `clean_and_extract_text` replaced"""
+    if not isinstance(html_content, str):
+        return ""
+    soup = BeautifulSoup(html_content, "html.parser")
+    tags_to_delete = ["source", "img", "video", "picture", "a", "sup", "hr", "br", "style"]
+    tags_to_unwrap = ["p", "li", "strong", "span", "h2", "ul", "i", "h1", "u", "div", "th", "td", "tr", "table", "ol",
+                      "blockquote", "b", "h6"]
+    for tag_name in tags_to_delete:
+        for tag in soup.find_all(tag_name):
+            tag.decompose()
+    for tag_name in tags_to_unwrap:
+        for tag in soup.find_all(tag_name):
+            tag.unwrap()
+    text = soup.get_text(separator=' ', strip=False)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def steam_description(rng: random.Random) -> str:
+    """Shaped like `detailed_description`: headings, banners, lists and paragraphs of bbcode-generated HTML"""
+    parts = []
+    for _ in range(rng.randint(3, 12)):
+        kind = rng.random()
+        text = " ".join(rng.choices(WORDS, k=rng.randint(5, 60)))
+        if kind < 0.2:
+            parts.append(f'<h2 class="bb_tag">{text[:40]}</h2>')
+        elif kind < 0.4:
+            parts.append('<img src="https://cdn.akamai.steamstatic.com/steam/apps/1/extras/banner.gif?t=1" /><br>')
+        elif kind < 0.55:
+            items = "".join(f"<li>{' '.join(rng.choices(WORDS, k=8))}</li>" for _ in range(rng.randint(2, 6)))
+            parts.append(f'<ul class="bb_ul">{items}</ul>')
+        elif kind < 0.65:
+            parts.append('<span class="bb_img_ctn"><video class="bb_img" autoplay muted loop playsinline>'
+                         '<source src="https://cdn/x.webm" type="video/webm"></video></span>')
+        else:
+            parts.append(f"<p><strong>{text[:20]}</strong> {text}<br><br><i>{text[:30]}</i></p>")
+    return "".join(parts)
+
+
+def malformed_markup(rng: random.Random) -> str:
+    """Random nesting, unclosed and stray tags: exercises the tree-building rules rather than typical input"""
+    parts = []
+    for _ in range(rng.randint(5, 60)):
+        kind = rng.random()
+        if kind < 0.3:
+            parts.append(f"<{rng.choice(BLOCKS)}>")
+        elif kind < 0.5:
+            parts.append(f"</{rng.choice(BLOCKS)}>")
+        elif kind < 0.6:
+            parts.append(f"<{rng.choice(VOIDS)}>")
+        elif kind < 0.7:
+            parts.append(rng.choice(ODDITIES))
+        else:
+            parts.append(" ".join(rng.choices(WORDS, k=rng.randint(1, 6))))
+    return "".join(parts)
+
+
+def golden_corpus(size: int, seed: int = 42) -> list[str | None]:
+    rng = random.Random(seed)
+    corpus: list[str | None] = [None, "", "plain text", "<p>Hello<b>World</b></p>"]
+    corpus += [steam_description(rng) for _ in range(size // 2)]
+    corpus += [malformed_markup(rng) for _ in range(size - size // 2)]
+    return corpus
+
+
+def docs_per_second(fn, corpus) -> float:
+    start = time.perf_counter()
+    fn(corpus)
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    corpus = golden_corpus(args.docs)
+    mismatches = [doc for doc in corpus if clean_and_extract_text(doc) != reference_clean(doc)]
+    print(f"{len(corpus) - len(mismatches)}/{len(corpus)} documents identical to the BeautifulSoup output")
+    for doc in mismatches[:5]:
+        print(f"  mismatch: {doc!r}")
+
+    descriptions = corpus[4:4 + args.docs // 2]
+    print(f"{len(descriptions)} Steam-like descriptions, "
+          f"{sum(map(len, descriptions)) / len(descriptions) / 1024:.1f} KiB on average")
+    runs = {
+        "BeautifulSoup": lambda docs: [reference_clean(doc) for doc in docs],
+        "clean_and_extract_text": lambda docs: [clean_and_extract_text(doc) for doc in docs],
+        f"clean_many (processes={args.processes or 'all cpus'})": lambda docs: clean_many(docs, args.processes),
+    }
+    for label, fn in runs.items():
+        print(f"{label:<36} {docs_per_second(fn, descriptions):8.0f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import logging
+import posixpath
+from datetime import datetime, UTC
+
+import duckdb
+
+from steam_games.parsing import APPS_FEATURES_SCHEMA, GAMES_URI, RAW_GAMES_GLOB, mark_parsed
+from utils.compaction import compact_dataset
+from utils.parquet_sink import list_parquet_files, make_filesystem
+from utils.views import create_view_if_not_exists
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description="Merge the small `raw_games` files of a day's partitions, "
+                                                 "one per payload file and bucket, into target-sized files")
+    parser.add_argument("--scrape-date", default=str(datetime.now(UTC).date()))
+    parser.add_argument("--all-dates", action="store_true", help="Compact every partition, not only --scrape-date")
+    parser.add_argument("--target-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Parsing takes a flat games file from before partitioning as the sign its payloads were parsed:
+    # mark them before the file is moved into partitions, or parsing would write their rows a second time
+    filesystem, games_base_path = make_filesystem(GAMES_URI)
+    for path in list_parquet_files(filesystem, games_base_path, name_prefix="steam_games_"):
+        mark_parsed(filesystem, posixpath.basename(path).replace("steam_games_", "steam_games_payloads_"),
+                    games_base_path)
+    compact_dataset(GAMES_URI, "steam_games", APPS_FEATURES_SCHEMA, None if args.all_dates else args.scrape_date,
+                    target_rows=args.target_rows)
+
+    # Replaces the view over the flat files from before partitioning
+    with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
+        create_view_if_not_exists(duckdb_conn, "raw_games", RAW_GAMES_GLOB, union_by_name=True,
+                                  hive_partitioning=True, replace=True)
+
+
+if __name__ == "__main__":
+    main()
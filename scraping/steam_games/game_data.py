@@ -1,183 +1,162 @@
+import argparse
+import json
 import logging
-
 import os
-
-import re
+import signal
+import sys
 import time
 from datetime import datetime, UTC
 
 import duckdb
 import polars as pl
 
-from utils.text_cleaning import clean_and_extract_text
-from utils.steam_api import get_app_data, get_app_reviews, download_all_steam_games
+from steam_games.parsing import (APP_PAYLOADS_SCHEMA, PAYLOADS_URI, RAW_GAMES_GLOB, load_payload_hashes,
+                                  parse_landed_payloads, payload_hash)
+from utils.batch_builder import RecordBatchBuilder
+from utils.journal import ScrapeJournal, Status
+from utils.parquet_sink import ParquetSink, make_filesystem
+from utils.response_archive import ArchiveReplay, ResponseArchive, ResponseNotArchived
+from utils.steam_api import (get_app_data, get_review_summary, download_all_steam_games, http_stats,
+                             use_response_archive)
 from utils.views import create_view_if_not_exists
 
 
-def create_apps_features_df() -> pl.DataFrame:
-    return pl.DataFrame(infer_schema_length=None, schema={
-        "appid": pl.Int64,
-        "name": pl.Utf8,
-        "type": pl.String,
-        "required_age": pl.Int64,
-        "is_free": pl.Boolean,
-        "minimum_pc_requirements": pl.Utf8,
-        "recommended_pc_requirements": pl.Utf8,
-        "controller_support": pl.String,
-        "detailed_description": pl.Utf8,
-        "about_the_game": pl.Utf8,
-        "short_description": pl.Utf8,
-        "supported_languages": pl.List(pl.String),
-        "header_image": pl.String,
-        "developers": pl.List(pl.String),
-        "publishers": pl.List(pl.String),
-        "price": pl.Float64,
-        "categories": pl.List(pl.String),
-        "genres": pl.List(pl.String),
-        "windows_support": pl.Boolean,
-        "mac_support": pl.Boolean,
-        "linux_support": pl.Boolean,
-        "release_date": pl.String,
-        "coming_soon": pl.Boolean,
-        "recommendations": pl.Int64,
-        "dlc": pl.List(pl.Int64),
-        "review_score": pl.Int64,
-        "review_score_desc": pl.String,
-        "scrape_date": pl.Date,
-    })
-
-
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    batch_size = 10_000
-    processed_count = 0
-    batch_num = 0
-    with duckdb.connect('../data/steam.duckdb', read_only=True) as duckdb_conn:
-        try:
-            df = duckdb_conn.sql("SELECT appid FROM new_ids_to_scrape").pl()
-        except duckdb.CatalogException:
-            # First run. Download all existing appids data
-            logging.warning("`new_ids_to_scrape` table not found. Downloading all existing appids data.")
-            df = download_all_steam_games()
+    parser = argparse.ArgumentParser(description="Scrape the store data of every app in `new_ids_to_scrape`, "
+                                                 "and of the known games in `games_to_refresh`")
+    parser.add_argument("--archive-responses", action="store_true",
+                        default=os.environ.get("ARCHIVE_RESPONSES", "") == "1",
+                        help="Keep the raw API responses in the zstd archive at RESPONSE_ARCHIVE_PATH")
+    parser.add_argument("--replay", nargs="?", const="all", default=None, metavar="SCRAPE_DATE",
+                        help="Land the archived responses of every archived app instead of calling Steam, "
+                             "only those archived on SCRAPE_DATE if given")
+    args = parser.parse_args()
+    # Airflow stops tasks with SIGTERM: exit through `finally` so the open Parquet file gets committed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    batch_size = 10_000  # rows per file
+    row_group_size = 1_000
+    archive, replay = None, None
+    if args.replay is not None:
+        replay = ArchiveReplay.from_env(("appdetails", "appreviews"), None if args.replay == "all" else args.replay)
+        df = pl.DataFrame({"appid": [int(appid) for appid in replay.appids("appdetails")]}, schema={"appid": pl.Int64})
+    else:
+        if args.archive_responses:
+            archive = ResponseArchive.from_env(scope="game_data")
+        with duckdb.connect('../data/steam.duckdb', read_only=True) as duckdb_conn:
+            try:
+                df = duckdb_conn.sql("SELECT appid FROM new_ids_to_scrape").pl()
+            except duckdb.CatalogException:
+                # First run. Download all existing appids data
+                logging.warning("`new_ids_to_scrape` table not found. Downloading all existing appids data.")
+                df = download_all_steam_games()
+            try:
+                # A bounded slice of known games, the stalest first: only the changed ones land a new row
+                refresh = duckdb_conn.sql("SELECT appid FROM games_to_refresh").pl()
+            except duckdb.CatalogException:
+                refresh = pl.DataFrame(schema={"appid": pl.Int64})
+        logging.info(f"{len(df)} new ids and {len(refresh)} known games to refresh")
+        df = pl.concat([df.select(pl.col("appid").cast(pl.Int64)), refresh.select(pl.col("appid").cast(pl.Int64))])
+    use_response_archive(archive, replay)
+
+    # Resume an interrupted run: ids already written or skipped are not requested again
+    journal = ScrapeJournal.from_env(job="game_data" if replay is None else "game_data_replay")
+    journal.start_run()
+    done_ids = journal.done()
+    if done_ids:
+        df = df.filter(~pl.col("appid").cast(pl.String).is_in(list(done_ids)))
+        logging.info(f"Skipping {len(done_ids)} ids already processed by run {journal.run_id}")
     total_apps = len(df)
-    apps_features_df = create_apps_features_df()
+    known_hashes = load_payload_hashes(*make_filesystem(PAYLOADS_URI))
+    unchanged = 0
+
+    scrape_date = datetime.now(UTC).date()
+    payloads = RecordBatchBuilder(APP_PAYLOADS_SCHEMA)
+    buffered_ids: list[str] = []  # rows in the builder
+    handed_off_ids: list[str] = []  # rows in the sink's open file
+
+    def mark_written(path: str) -> None:
+        journal.mark_many(handed_off_ids, Status.WRITTEN)
+        handed_off_ids.clear()
+
+    def write_row_group() -> None:
+        handed_off_ids.extend(buffered_ids)
+        buffered_ids.clear()
+        sink.write(payloads.flush())
+
+    sink = ParquetSink(PAYLOADS_URI, f"steam_games_payloads_{scrape_date}", APP_PAYLOADS_SCHEMA,
+                       max_rows_per_file=batch_size, on_commit=mark_written)
+    completed = False
     try:
         for i, row in enumerate(df.iter_rows()):
             appid = row[0]
             data = None
             game_reviews_data = None
+            error = None
             for tries in range(10):
                 try:
-                    time.sleep(1.6)
+                    if replay is None:
+                        time.sleep(1.6)
                     data = get_app_data(appid)
-                    game_reviews_data = get_app_reviews(appid=appid, filt="recent")
-                except Exception:
+                    game_reviews_data = get_review_summary(appid)
+                except ResponseNotArchived as e:
+                    error = str(e)
+                    data = None
+                    break
+                except Exception as e:
                     logging.warning(f"Quota limit reached for executor. {appid}. Left in row {i}")
+                    error = str(e)
+                    data = None
                     time.sleep(10)
                 else:
                     break
 
-            if data and data.get(str(appid), {}).get("success") and game_reviews_data and game_reviews_data.get(
-                    "reviews") is not None:
-                app_info = data[str(appid)]["data"]
-                if app_info["short_description"] == '' or not app_info.get("supported_languages") or not \
-                        app_info["pc_requirements"] or not app_info.get("genres") or not app_info.get("categories"):
-                    continue
-                languages = re.sub(r"<.*?>", "", app_info["supported_languages"]).replace(", ", ",").split(",")
-                for j, lang in enumerate(languages):
-                    languages[j] = re.sub(r"\*(.*)?", "", lang)
-
-                if app_info.get("price_overview"):
-                    price = app_info["price_overview"]["initial"] / 100  # price without discount
-                else:
-                    price = None
-                if app_info.get("recommendations"):
-                    recommendations = int(app_info["recommendations"]["total"])
-                else:
-                    recommendations = None
-
-                if app_info["pc_requirements"].get("recommended"):
-                    recommended_pc_requirements = re.sub(r"<.*?>", "", app_info["pc_requirements"]["recommended"])
-                else:
-                    recommended_pc_requirements = None
-
-                if app_info["pc_requirements"].get("minimum"):
-                    minimum_pc_requirements = re.sub(r"<.*?>", "", app_info["pc_requirements"]["minimum"])
-                else:
-                    minimum_pc_requirements = None
-
-                req_age = re.findall(r"\d+", str(app_info["required_age"]))
-                if not req_age:
-                    req_age = None
-                else:
-                    req_age = int(req_age[0])
-
-                record = {
-                    "appid": appid,
-                    "name": app_info["name"],
-                    "type": app_info["type"],
-                    "required_age": req_age,
-                    "is_free": app_info["is_free"],
-                    "minimum_pc_requirements": minimum_pc_requirements,
-                    "recommended_pc_requirements": recommended_pc_requirements,
-                    "controller_support": app_info.get("controller_support", None),
-                    "detailed_description": clean_and_extract_text(app_info["detailed_description"]),
-                    "about_the_game": clean_and_extract_text(app_info["about_the_game"]),
-                    "short_description": app_info["short_description"],
-                    "supported_languages": languages,
-                    "header_image": app_info.get("header_image", None),
-                    "developers": app_info.get("developers", []),
-                    "publishers": app_info.get("publishers", []),
-                    "price": price,
-                    "categories": [v["description"] for v in app_info["categories"]],
-                    "genres": [v["description"] for v in app_info["genres"]],
-                    "windows_support": app_info["platforms"]["windows"],
-                    "mac_support": app_info["platforms"]["mac"],
-                    "linux_support": app_info["platforms"]["linux"],
-                    "release_date": app_info["release_date"]["date"],
-                    "coming_soon": app_info["release_date"]["coming_soon"],
-                    "recommendations": recommendations,
-                    "dlc": app_info.get("dlc", []),
-                    "review_score": game_reviews_data["query_summary"].get("review_score", None),
-                    "review_score_desc": game_reviews_data["query_summary"].get("review_score_desc", None),
-                    "scrape_date": datetime.now(UTC).date()
-
-                }
-
-                logging.info(f"Finished processing element #{appid} in iteration #{i} / {total_apps}")
-                processed_count += 1
-                apps_features_df = pl.concat([
-                    apps_features_df,
-                    pl.DataFrame([record])
-                ], how='vertical')
-                if processed_count >= batch_size:
-                    logging.info(f"Writing batch {batch_num}")
-                    apps_features_df.write_parquet(
-                        f"s3://raw/games/steam_games_{datetime.now(UTC).date()}_{batch_num}.parquet",
-                        storage_options={"aws_access_key_id": 'minioadmin',
-                                         "aws_secret_access_key": 'minioadmin',
-                                         "aws_region": "us-east-1",
-                                         "aws_endpoint_url": os.environ.get(
-                                             "MINIO_ENDPOINT_URL", "http://localhost:9000")})
-                    # Reset for next batch
-                    apps_features_df = create_apps_features_df()
-                    batch_num += 1
-                    processed_count = 0
+            if data is None or game_reviews_data is None:
+                journal.mark(str(appid), Status.FAILED, error)
+                continue
+
+            # Landed as is: which apps make it into `raw_games`, and how, is decided by `steam_games.parsing`
+            appdetails = json.dumps(data.get(str(appid)), sort_keys=True)
+            reviews_summary = json.dumps(game_reviews_data.get("query_summary"), sort_keys=True) \
+                if game_reviews_data.get("success") == 1 else None
+            content_hash = payload_hash(appdetails, reviews_summary)
+            if known_hashes.get(appid) == content_hash:
+                # Only a trace of the fetch, which `games_to_refresh` counts as a refresh
+                unchanged += 1
+                appdetails, reviews_summary = None, None
+            payloads.append({
+                "appid": appid,
+                "appdetails": appdetails,
+                "reviews_summary": reviews_summary,
+                "payload_hash": content_hash,
+                "scrape_date": scrape_date,
+            })
+            logging.info(f"Fetched element #{appid} in iteration #{i} / {total_apps}")
+            buffered_ids.append(str(appid))
+            journal.mark(str(appid), Status.FETCHED)
+            if len(payloads) >= row_group_size:
+                write_row_group()
+        completed = True
     except Exception as e:
         logging.error(e)
     finally:
-        if len(apps_features_df) > 0:
-            logging.info(f"Writing final batch {batch_num}")
-            apps_features_df.write_parquet(f"s3://raw/games/steam_games_{datetime.now(UTC).date()}_{batch_num}.parquet",
-                                           storage_options={"aws_access_key_id": 'minioadmin',
-                                                            "aws_secret_access_key": 'minioadmin',
-                                                            "aws_region": "us-east-1",
-                                                            "aws_endpoint_url": os.environ.get("MINIO_ENDPOINT_URL",
-                                                                                               "http://localhost:9000")})
-        # Create raw_games view if it doesn't exist
+        if len(payloads) > 0:
+            logging.info(f"Writing final row group with {len(payloads)} games")
+            write_row_group()
+        sink.close()
+        if archive is not None:
+            archive.close()
+        logging.info(f"Journal {journal}: {journal.summary()}, {unchanged} apps unchanged since they were landed")
+        if completed:
+            journal.finish_run()
+        journal.close()
+        logging.info(f"HTTP stats: {http_stats()}")
+        # Parse every landed file not parsed yet, including those of earlier interrupted runs
+        parse_landed_payloads()
         with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
-            create_view_if_not_exists(duckdb_conn, "raw_games", "s3://raw/games/steam_games_*.parquet")
+            create_view_if_not_exists(duckdb_conn, "raw_games", RAW_GAMES_GLOB, union_by_name=True,
+                                      hive_partitioning=True, replace=True)
@@ -0,0 +1,314 @@
+import argparse
+import hashlib
+import json
+import logging
+import posixpath
+import re
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from utils.parquet_sink import PartitionedParquetSink, list_parquet_files, make_filesystem
+from utils.text_cleaning import clean_many
+from utils.views import create_view_if_not_exists
+
+PAYLOADS_URI = "s3://raw/games_payloads"
+GAMES_URI = "s3://raw/games"
+RAW_GAMES_GLOB = f"{GAMES_URI}/scrape_date=*/appid_bucket=*/*.parquet"
+# One empty object per payload file parsed: compaction renames the games files, so they cannot tell
+PARSED_MARKERS_DIR = "_parsed"
+
+# Raw responses as landed by `steam_games.game_data`, parsed later so they can be parsed again with new rules
+APP_PAYLOADS_SCHEMA = {
+    "appid": pl.Int64,
+    # `{"success": ..., "data": {...}}` of the app in /api/appdetails, null when unchanged since last landed
+    "appdetails": pl.Utf8,
+    "reviews_summary": pl.Utf8,  # `query_summary` of /appreviews, null when the app has no reviews listing
+    "payload_hash": pl.Utf8,  # see `payload_hash`
+    "scrape_date": pl.Date,
+}
+# Change on every fetch of a popular app: not worth a new `raw_games` row on their own
+VOLATILE_APPDETAILS_FIELDS = frozenset({"recommendations", "achievements"})
+
+APPS_FEATURES_SCHEMA = {
+    "appid": pl.Int64,
+    "name": pl.Utf8,
+    "type": pl.String,
+    "required_age": pl.Int64,
+    "is_free": pl.Boolean,
+    "minimum_pc_requirements": pl.Utf8,
+    "recommended_pc_requirements": pl.Utf8,
+    "controller_support": pl.String,
+    "detailed_description": pl.Utf8,
+    "about_the_game": pl.Utf8,
+    "short_description": pl.Utf8,
+    "supported_languages": pl.List(pl.String),
+    "header_image": pl.String,
+    "developers": pl.List(pl.String),
+    "publishers": pl.List(pl.String),
+    "price": pl.Float64,
+    "categories": pl.List(pl.String),
+    "genres": pl.List(pl.String),
+    "windows_support": pl.Boolean,
+    "mac_support": pl.Boolean,
+    "linux_support": pl.Boolean,
+    "release_date": pl.String,
+    "coming_soon": pl.Boolean,
+    "recommendations": pl.Int64,
+    "dlc": pl.List(pl.Int64),
+    "review_score": pl.Int64,
+    "review_score_desc": pl.String,
+    "payload_hash": pl.Utf8,
+    "scrape_date": pl.Date,
+}
+
+_DESCRIPTIONS = pl.List(pl.Struct({"description": pl.String}))
+# Only the fields that are parsed
+APPDETAILS_DTYPE = pl.Struct({
+    "success": pl.Boolean,
+    "data": pl.Struct({
+        "type": pl.String,
+        "name": pl.String,
+        "required_age": pl.String,  # sometimes a number, sometimes a string like "18+"
+        "is_free": pl.Boolean,
+        "controller_support": pl.String,
+        "detailed_description": pl.String,
+        "about_the_game": pl.String,
+        "short_description": pl.String,
+        "supported_languages": pl.String,
+        "pc_requirements": pl.Struct({"minimum": pl.String, "recommended": pl.String}),
+        "header_image": pl.String,
+        "developers": pl.List(pl.String),
+        "publishers": pl.List(pl.String),
+        "price_overview": pl.Struct({"initial": pl.Int64}),
+        "categories": _DESCRIPTIONS,
+        "genres": _DESCRIPTIONS,
+        "platforms": pl.Struct({"windows": pl.Boolean, "mac": pl.Boolean, "linux": pl.Boolean}),
+        "release_date": pl.Struct({"coming_soon": pl.Boolean, "date": pl.String}),
+        "recommendations": pl.Struct({"total": pl.Int64}),
+        "dlc": pl.List(pl.Int64),
+    }),
+})
+REVIEWS_SUMMARY_DTYPE = pl.Struct({"review_score": pl.Int64, "review_score_desc": pl.String})
+# Steam sends `[]` instead of an empty object when an app has no requirements
+_EMPTY_PC_REQUIREMENTS = r'"pc_requirements":\s*\[\]'
+
+
+def payload_hash(appdetails: str, reviews_summary: str | None) -> str:
+    """
+    Hash of what the landed payloads of an app say about it, leaving out counters and discounts:
+    the same hash means the same `raw_games` row, up to `recommendations`
+    """
+    details = json.loads(appdetails) or {}
+    data = details.get("data")
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key not in VOLATILE_APPDETAILS_FIELDS}
+        if isinstance(data.get("price_overview"), dict):  # the price without discount
+            data["price_overview"] = data["price_overview"].get("initial")
+        details = {**details, "data": data}
+    summary = json.loads(reviews_summary) if reviews_summary is not None else {}
+    content = json.dumps([details, summary.get("review_score"), summary.get("review_score_desc")], sort_keys=True)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def load_payload_hashes(filesystem: fs.FileSystem, payloads_base_path: str) -> dict[int, str]:
+    """Hash of the latest landed payloads of every app"""
+    paths = list_parquet_files(filesystem, payloads_base_path, name_prefix="steam_games_payloads_")
+    if not paths:
+        return {}
+    schema = pa.schema([("appid", pa.int64()), ("payload_hash", pa.string()), ("scrape_date", pa.date32())])
+    # Only the two columns, and files landed before hashing was added just have no hashes
+    table = ds.dataset(paths, schema=schema, format="parquet", filesystem=filesystem).to_table()
+    latest = (pl.from_arrow(table).filter(pl.col("payload_hash").is_not_null())
+              .sort("scrape_date", maintain_order=True).unique("appid", keep="last"))
+    return dict(zip(latest["appid"], latest["payload_hash"]))
+
+
+def _json_decode(payloads: pl.Series, dtype: pl.DataType) -> pl.Series:
+    """Decode the whole column at once. A payload of unexpected shape only nulls its own row"""
+    try:
+        return payloads.str.json_decode(dtype)
+    except pl.exceptions.ComputeError:
+        decoded = []
+        for payload in payloads:
+            try:
+                decoded.append(pl.Series([payload]).str.json_decode(dtype)[0])
+            except pl.exceptions.ComputeError as e:
+                logging.warning(f"Unparseable payload, skipping it: {str(e).splitlines()[0]}")
+                decoded.append(None)
+        return pl.Series(payloads.name, decoded, dtype=dtype)
+
+
+def _strip_tags(expr: pl.Expr) -> pl.Expr:
+    return expr.str.replace_all(r"<.*?>", "")
+
+
+def _non_empty(expr: pl.Expr) -> pl.Expr:
+    return pl.when(expr.str.len_chars() > 0).then(expr)
+
+
+def parse_app_payloads(payloads: pl.DataFrame) -> pl.DataFrame:
+    """Parse landed payloads into `APPS_FEATURES_SCHEMA` rows, dropping non-apps and apps missing key fields"""
+    appdetails = payloads["appdetails"].str.replace(_EMPTY_PC_REQUIREMENTS, '"pc_requirements": {}')
+    df = payloads.with_columns(
+        details=_json_decode(appdetails, APPDETAILS_DTYPE),
+        summary=_json_decode(payloads["reviews_summary"], REVIEWS_SUMMARY_DTYPE),
+    )
+    data = pl.col("details").struct.field("data")
+    pc_requirements = data.struct.field("pc_requirements")
+    df = df.filter(
+        pl.col("details").struct.field("success").fill_null(False),
+        pl.col("reviews_summary").is_not_null(),
+        data.struct.field("short_description").fill_null("") != "",
+        data.struct.field("supported_languages").fill_null("") != "",
+        pc_requirements.struct.field("minimum").is_not_null()
+        | pc_requirements.struct.field("recommended").is_not_null(),
+        data.struct.field("genres").list.len().fill_null(0) > 0,
+        data.struct.field("categories").list.len().fill_null(0) > 0,
+    ).with_columns(data.alias("data")).unnest("data")
+
+    empty_list = pl.lit([], dtype=pl.List(pl.String))
+    parsed = df.select(
+        "appid",
+        "name",
+        "type",
+        required_age=pl.col("required_age").str.extract(r"(\d+)", 1).cast(pl.Int64, strict=False),
+        is_free="is_free",
+        minimum_pc_requirements=_strip_tags(_non_empty(pl.col("pc_requirements").struct.field("minimum"))),
+        recommended_pc_requirements=_strip_tags(_non_empty(pl.col("pc_requirements").struct.field("recommended"))),
+        controller_support="controller_support",
+        detailed_description="detailed_description",
+        about_the_game="about_the_game",
+        short_description="short_description",
+        supported_languages=_strip_tags(pl.col("supported_languages"))
+        .str.replace_all(", ", ",", literal=True)
+        .str.split(",")
+        .list.eval(pl.element().str.replace_all(r"\*(.*)?", "")),
+        header_image="header_image",
+        developers=pl.col("developers").fill_null(empty_list),
+        publishers=pl.col("publishers").fill_null(empty_list),
+        # price without discount. Rounded to cents, as a division by a scalar is done as a multiplication by 0.01
+        price=(pl.col("price_overview").struct.field("initial") / 100).round(2),
+        categories=pl.col("categories").list.eval(pl.element().struct.field("description")),
+        genres=pl.col("genres").list.eval(pl.element().struct.field("description")),
+        windows_support=pl.col("platforms").struct.field("windows"),
+        mac_support=pl.col("platforms").struct.field("mac"),
+        linux_support=pl.col("platforms").struct.field("linux"),
+        release_date=pl.col("release_date").struct.field("date"),
+        coming_soon=pl.col("release_date").struct.field("coming_soon"),
+        recommendations=pl.col("recommendations").struct.field("total"),
+        dlc=pl.col("dlc").fill_null(pl.lit([], dtype=pl.List(pl.Int64))),
+        review_score=pl.col("summary").struct.field("review_score"),
+        review_score_desc=pl.col("summary").struct.field("review_score_desc"),
+        payload_hash="payload_hash",
+        scrape_date="scrape_date",
+    )
+    # The one step that is not columnar: HTML cleaning, batched over a process pool
+    parsed = parsed.with_columns(
+        detailed_description=pl.Series(clean_many(parsed["detailed_description"].to_list()), dtype=pl.String),
+        about_the_game=pl.Series(clean_many(parsed["about_the_game"].to_list()), dtype=pl.String),
+    )
+    return parsed.cast(APPS_FEATURES_SCHEMA)
+
+
+def parsed_marker_for(payloads_name: str, games_base_path: str) -> str:
+    return f"{games_base_path}/{PARSED_MARKERS_DIR}/{posixpath.basename(payloads_name).removesuffix('.parquet')}"
+
+
+def is_parsed(filesystem: fs.FileSystem, payloads_path: str, games_base_path: str) -> bool:
+    # Files parsed before partitioning have a flat games file of the same name instead, until compaction moves it
+    flat_games_name = posixpath.basename(payloads_path).replace("steam_games_payloads_", "steam_games_")
+    flat_games_path = f"{games_base_path}/{flat_games_name}"
+    return any(filesystem.get_file_info(path).type != fs.FileType.NotFound
+               for path in (parsed_marker_for(payloads_path, games_base_path), flat_games_path))
+
+
+def mark_parsed(filesystem: fs.FileSystem, payloads_name: str, games_base_path: str) -> None:
+    if isinstance(filesystem, fs.LocalFileSystem):
+        filesystem.create_dir(f"{games_base_path}/{PARSED_MARKERS_DIR}", recursive=True)
+    with filesystem.open_output_stream(parsed_marker_for(payloads_name, games_base_path)):
+        pass
+
+
+def _drop_parsed_dates(filesystem: fs.FileSystem, payload_paths: list[str], games_base_path: str) -> None:
+    """Delete the games files and parsed markers of the dates `payload_paths` were landed on"""
+    dates = {match.group(1) for path in payload_paths
+             if (match := re.match(r"steam_games_payloads_(\d{4}-\d{2}-\d{2})_", posixpath.basename(path)))}
+    for date in sorted(dates):
+        partition = f"{games_base_path}/scrape_date={date}"
+        if filesystem.get_file_info(partition).type == fs.FileType.Directory:
+            filesystem.delete_dir(partition)
+        for flat_games_path in list_parquet_files(filesystem, games_base_path, name_prefix=f"steam_games_{date}_"):
+            filesystem.delete_file(flat_games_path)
+        markers = fs.FileSelector(f"{games_base_path}/{PARSED_MARKERS_DIR}", allow_not_found=True)
+        for info in filesystem.get_file_info(markers):
+            if info.base_name.startswith(f"steam_games_payloads_{date}_"):
+                filesystem.delete_file(info.path)
+
+
+def parse_payload_files(filesystem: fs.FileSystem, payload_paths: list[str], games_base_path: str,
+                        replace: bool = False) -> list[str]:
+    """
+    Parse each payload file into the `raw_games` partitions, then mark it parsed. Files already parsed are skipped
+    unless `replace`, which first drops the partitions of their dates (e.g. after a parsing rule changed), so
+    `payload_paths` should then hold every payload file of those dates.
+    """
+    if replace:
+        _drop_parsed_dates(filesystem, payload_paths, games_base_path)
+    written = []
+    for path in payload_paths:
+        if is_parsed(filesystem, path, games_base_path):
+            continue
+        with filesystem.open_input_file(path) as f:
+            payloads = pl.from_arrow(pq.read_table(f))
+        if "payload_hash" not in payloads.columns:  # landed before hashing was added, every payload is there
+            payloads = payloads.with_columns(payload_hash=pl.Series([
+                payload_hash(appdetails, reviews_summary)
+                for appdetails, reviews_summary in zip(payloads["appdetails"], payloads["reviews_summary"])]))
+        payloads = payloads.select(APP_PAYLOADS_SCHEMA.keys()).cast(APP_PAYLOADS_SCHEMA)
+        games = parse_app_payloads(payloads)
+        file_prefix = posixpath.basename(path).removesuffix(".parquet").replace("steam_games_payloads_", "steam_games_")
+        # A crash before the marker parses the file again: `stg_games` keeps one row per app anyway
+        with PartitionedParquetSink(games_base_path, file_prefix, APPS_FEATURES_SCHEMA, filesystem=filesystem) as sink:
+            sink.write(games)
+        mark_parsed(filesystem, path, games_base_path)
+        logging.info(f"Parsed {len(games)}/{len(payloads)} apps from {path} into {len(sink.committed_files)} files")
+        written.extend(sink.committed_files)
+    return written
+
+
+def parse_landed_payloads(scrape_date: str | None = None, replace: bool = False) -> list[str]:
+    """Parse the landed payload files, all of them or those of `scrape_date`"""
+    filesystem, payloads_base_path = make_filesystem(PAYLOADS_URI)
+    _, games_base_path = make_filesystem(GAMES_URI)
+    name_prefix = f"steam_games_payloads_{scrape_date}_" if scrape_date else "steam_games_payloads_"
+    payload_paths = list_parquet_files(filesystem, payloads_base_path, name_prefix=name_prefix)
+    written = parse_payload_files(filesystem, payload_paths, games_base_path, replace=replace)
+    logging.info(f"Wrote {len(written)} games files from {len(payload_paths)} payload files")
+    return written
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description="Parse landed appdetails payloads into `raw_games` files")
+    parser.add_argument("--scrape-date", default=None, help="Only parse the payloads landed on this date")
+    parser.add_argument("--replace", action="store_true",
+                        help="Parse again payloads that were already parsed, e.g. after a parsing rule changed")
+    args = parser.parse_args()
+    parse_landed_payloads(args.scrape_date, replace=args.replace)
+
+    with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
+        create_view_if_not_exists(duckdb_conn, "raw_games", RAW_GAMES_GLOB, union_by_name=True,
+                                  hive_partitioning=True, replace=True)
+
+
+if __name__ == "__main__":
+    main()
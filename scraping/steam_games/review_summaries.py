@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import replace
+from datetime import datetime, UTC
+
+import duckdb
+import polars as pl
+
+from utils.batch_builder import RecordBatchBuilder
+from utils.concurrency import map_concurrently
+from utils.parquet_sink import ParquetSink, list_parquet_files, make_filesystem
+from utils.response_archive import ArchiveReplay, ResponseArchive
+from utils.steam_api import AsyncSteamClient, HttpConfig, ReplaySteamClient
+from utils.views import create_view_if_not_exists
+
+REVIEW_SUMMARIES_URI = "s3://raw/game_review_summaries"
+# Only the review scores that changed since `stg_games` last saw them
+REVIEW_SUMMARIES_SCHEMA = {
+    "appid": pl.Int64,
+    "review_score": pl.Int64,
+    "review_score_desc": pl.String,
+    "total_reviews": pl.Int64,
+    "scrape_date": pl.Date,
+}
+
+
+async def fetch_review_summaries(client: AsyncSteamClient | ReplaySteamClient, appids: Iterable[str],
+                                 concurrency: int) -> AsyncIterator[tuple[str, dict]]:
+    """Yield (appid, query_summary) as responses arrive. Apps still failing after the client's retries are left out"""
+    async for appid, data in map_concurrently(client.get_review_summary, appids, concurrency,
+                                              description="fetching the review summary of app"):
+        if data.get("success") == 1:
+            yield appid, data["query_summary"]
+
+
+def load_known_scores() -> dict[str, tuple[int | None, str | None]]:
+    with duckdb.connect('../data/steam.duckdb', read_only=True) as duckdb_conn:
+        try:
+            rows = duckdb_conn.sql("""SELECT game_id,
+                                             arg_max(game_review_score, game_scrape_date),
+                                             arg_max(game_review_score_description, game_scrape_date)
+                                      FROM stg_games
+                                      GROUP BY game_id""").fetchall()
+        except duckdb.CatalogException:
+            logging.warning("`stg_games` table not found. No known games to refresh.")
+            return {}
+    return {str(game_id): (score, desc) for game_id, score, desc in rows}
+
+
+async def run(concurrency: int, requests_per_second: float, archive: ResponseArchive | None = None,
+              replay: ArchiveReplay | None = None) -> None:
+    # Airflow stops tasks with SIGTERM: cancel instead of dying so the open Parquet file gets committed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    known_scores = load_known_scores()
+    scrape_date = datetime.now(UTC).date()
+    summaries = RecordBatchBuilder(REVIEW_SUMMARIES_SCHEMA)
+    if replay is not None:
+        client = ReplaySteamClient(replay)
+    else:
+        client = AsyncSteamClient(requests_per_second=requests_per_second, archive=archive,
+                                  config=replace(HttpConfig.from_env(), pool_size=concurrency))
+    fetched, changed = 0, 0
+    async with client:
+        with ParquetSink(REVIEW_SUMMARIES_URI, f"steam_game_review_summaries_{scrape_date}",
+                         REVIEW_SUMMARIES_SCHEMA, max_rows_per_file=100_000) as sink:
+            async for appid, summary in fetch_review_summaries(client, known_scores, concurrency):
+                fetched += 1
+                score, desc = summary.get("review_score"), summary.get("review_score_desc")
+                if (score, desc) == known_scores[appid]:
+                    continue
+                changed += 1
+                summaries.append({"appid": int(appid), "review_score": score, "review_score_desc": desc,
+                                  "total_reviews": summary.get("total_reviews"), "scrape_date": scrape_date})
+                if len(summaries) >= 10_000:
+                    sink.write(summaries.flush())
+            sink.write(summaries.flush())
+        logging.info(f"{len(known_scores)} games, {fetched} review summaries fetched, {changed} scores changed")
+        logging.info(f"HTTP stats: {client.stats()}")
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description="Refresh the review score of every game in `stg_games`, "
+                                                 "without fetching its store data or its reviews")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("SCRAPER_CONCURRENCY", 8)))
+    parser.add_argument("--requests-per-second", type=float,
+                        default=float(os.environ.get("SCRAPER_REQUESTS_PER_SECOND", 4.0)))
+    parser.add_argument("--archive-responses", action="store_true",
+                        default=os.environ.get("ARCHIVE_RESPONSES", "") == "1",
+                        help="Keep the raw API responses in the zstd archive at RESPONSE_ARCHIVE_PATH")
+    parser.add_argument("--replay", nargs="?", const="all", default=None, metavar="SCRAPE_DATE",
+                        help="Serve the API responses from the archive instead of Steam")
+    args = parser.parse_args()
+    archive = ResponseArchive.from_env(scope="review_summaries") \
+        if args.archive_responses and args.replay is None else None
+    replay = ArchiveReplay.from_env(("appreviews",), None if args.replay == "all" else args.replay) \
+        if args.replay is not None else None
+    try:
+        asyncio.run(run(args.concurrency, args.requests_per_second, archive, replay))
+    finally:
+        if archive is not None:
+            archive.close()
+
+    # No file until a score changes, and a view over no files cannot be created
+    filesystem, base_path = make_filesystem(REVIEW_SUMMARIES_URI)
+    if not list_parquet_files(filesystem, base_path, name_prefix="steam_game_review_summaries_"):
+        return
+    with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
+        create_view_if_not_exists(duckdb_conn, "raw_game_review_summaries",
+                                  "s3://raw/game_review_summaries/steam_game_review_summaries_*.parquet")
+
+
+if __name__ == "__main__":
+    main()
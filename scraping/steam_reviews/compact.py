@@ -0,0 +1,33 @@
+import argparse
+import logging
+from datetime import datetime, UTC
+
+import duckdb
+
+from steam_reviews.steam_reviews import RAW_REVIEWS_GLOB, REVIEWS_SCHEMA, REVIEWS_URI
+from utils.compaction import compact_dataset
+from utils.views import create_view_if_not_exists
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description="Merge the small review files of a day's partitions, e.g. those "
+                                                 "written by parallel scraping shards, into target-sized files")
+    parser.add_argument("--scrape-date", default=str(datetime.now(UTC).date()))
+    parser.add_argument("--all-dates", action="store_true", help="Compact every partition, not only --scrape-date")
+    parser.add_argument("--target-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    compact_dataset(REVIEWS_URI, "steam_reviews", REVIEWS_SCHEMA, None if args.all_dates else args.scrape_date,
+                    target_rows=args.target_rows)
+
+    # Replaces the view over the flat files from before partitioning
+    with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
+        create_view_if_not_exists(duckdb_conn, "raw_reviews", RAW_REVIEWS_GLOB, hive_partitioning=True, replace=True)
+
+
+if __name__ == "__main__":
+    main()
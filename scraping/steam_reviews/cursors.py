@@ -0,0 +1,78 @@
+import logging
+import os
+import sqlite3
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import datetime, UTC
+
+
+@dataclass(frozen=True, slots=True)
+class CursorState:
+    newest_rec_id: int | None = None  # newest review seen by the last walk of the app
+    cursor: str | None = None  # where an interrupted walk resumes, None once it completed
+    cutoff: datetime | None = None  # watermark the interrupted walk paginates back to
+    target: datetime | None = None  # watermark to apply once the interrupted walk completes
+    pages_fetched: int = 0  # pages fetched by the last walk, resumed walks included
+
+    @property
+    def in_progress(self) -> bool:
+        return self.cursor is not None
+
+
+class ReviewCursorStore:
+    """Pagination state of every app, kept in the local scrape journal SQLite file (WAL mode)"""
+
+    def __init__(self, path: str):
+        self.logger = logging.getLogger(__name__ + ".ReviewCursorStore")
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS review_cursors (
+                appid TEXT PRIMARY KEY,
+                newest_rec_id INTEGER,
+                cursor TEXT,
+                cutoff TEXT,
+                target TEXT,
+                pages_fetched INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv("SCRAPE_JOURNAL_PATH", "../data/scrape_journal.sqlite"))
+
+    def __str__(self):
+        return f"ReviewCursorStore(path={self.path})"
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def load(self, appids: Collection[str] | None = None) -> dict[str, CursorState]:
+        rows = self._conn.execute("SELECT appid, newest_rec_id, cursor, cutoff, target, pages_fetched "
+                                  "FROM review_cursors").fetchall()
+        wanted = set(appids) if appids is not None else None
+        return {appid: CursorState(newest_rec_id=newest_rec_id, cursor=cursor,
+                                   cutoff=datetime.fromisoformat(cutoff) if cutoff else None,
+                                   target=datetime.fromisoformat(target) if target else None,
+                                   pages_fetched=pages_fetched)
+                for appid, newest_rec_id, cursor, cutoff, target, pages_fetched in rows
+                if wanted is None or appid in wanted}
+
+    def update(self, states: dict[str, CursorState]) -> None:
+        now = datetime.now(UTC).isoformat()
+        with self._conn:
+            self._conn.executemany("""
+                INSERT INTO review_cursors (appid, newest_rec_id, cursor, cutoff, target, pages_fetched, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (appid) DO UPDATE SET newest_rec_id = excluded.newest_rec_id, cursor = excluded.cursor,
+                    cutoff = excluded.cutoff, target = excluded.target, pages_fetched = excluded.pages_fetched,
+                    updated_at = excluded.updated_at
+            """, [(appid, state.newest_rec_id, state.cursor,
+                   state.cutoff.isoformat() if state.cutoff else None,
+                   state.target.isoformat() if state.target else None,
+                   state.pages_fetched, now)
+                  for appid, state in states.items()])
@@ -0,0 +1,146 @@
+import logging
+import math
+import os
+import sqlite3
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+
+import duckdb
+import polars as pl
+
+
+@dataclass(frozen=True, slots=True)
+class PollPolicy:
+    min_interval: timedelta = timedelta(days=1)
+    max_interval: timedelta = timedelta(days=60)
+    target_new_reviews: float = 5.0  # poll a game once this many new reviews are expected
+
+    @classmethod
+    def from_env(cls) -> "PollPolicy":
+        return cls(min_interval=timedelta(days=float(os.getenv("REVIEWS_MIN_POLL_INTERVAL_DAYS", "1"))),
+                   max_interval=timedelta(days=float(os.getenv("REVIEWS_MAX_POLL_INTERVAL_DAYS", "60"))),
+                   target_new_reviews=float(os.getenv("REVIEWS_POLL_TARGET_NEW_REVIEWS", "5")))
+
+    def interval(self, reviews_per_day: float) -> timedelta:
+        if reviews_per_day <= 0:
+            return self.max_interval
+        return min(max(timedelta(days=self.target_new_reviews / reviews_per_day), self.min_interval),
+                   self.max_interval)
+
+
+def load_review_activity(duckdb_conn: duckdb.DuckDBPyConnection, window_months: int = 3) -> dict[str, float]:
+    """Recent reviews per day of every game, from `monthly_game_metrics`. Empty until dbt has run once"""
+    try:
+        activity = duckdb_conn.sql(f"""
+            WITH window_start AS (
+                SELECT date_trunc('month', current_date) - INTERVAL {window_months} MONTH AS start_month
+            )
+            SELECT game_id,
+                   SUM(game_num_reviews) / GREATEST(date_diff('day', ANY_VALUE(start_month), current_date), 1)
+                       AS reviews_per_day
+            FROM monthly_game_metrics, window_start
+            WHERE game_review_month >= start_month
+            GROUP BY game_id
+        """).pl()
+    except duckdb.CatalogException:
+        logging.warning("monthly_game_metrics not found, scheduling from last seen reviews only")
+        return {}
+    return {str(game_id): rate for game_id, rate in activity.iter_rows()}
+
+
+class ReviewPollScheduler:
+    """
+    Decides which games are worth polling for new reviews, from their predicted review rate.
+    Skipping a game never loses reviews: once polled again, pagination walks back to its cached timestamp.
+    Poll history lives in a local SQLite file (WAL mode), next to the scrape journal.
+    """
+
+    def __init__(self, path: str, policy: PollPolicy | None = None):
+        self.logger = logging.getLogger(__name__ + ".ReviewPollScheduler")
+        self.path = path
+        self.policy = policy or PollPolicy.from_env()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS review_polls (
+                appid TEXT PRIMARY KEY,
+                last_polled_at TEXT NOT NULL,
+                new_reviews INTEGER NOT NULL,
+                observed_rate REAL NOT NULL
+            )
+        """)
+        self._polls: dict[str, tuple[datetime, float]] = {}
+        self._pending: dict[str, tuple[datetime, int]] = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=os.getenv("SCRAPE_JOURNAL_PATH", "../data/scrape_journal.sqlite"))
+
+    def __str__(self):
+        return f"ReviewPollScheduler(path={self.path}, policy={self.policy})"
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def load(self, appids: Collection[str] | None = None) -> None:
+        rows = self._conn.execute("SELECT appid, last_polled_at, observed_rate FROM review_polls").fetchall()
+        wanted = set(appids) if appids is not None else None
+        self._polls = {appid: (datetime.fromisoformat(polled_at), rate) for appid, polled_at, rate in rows
+                       if wanted is None or appid in wanted}
+        self.logger.info(f"Loaded poll history of {len(self._polls)} games")
+
+    def reviews_per_day(self, appid: str, recent_rate: float, last_review_at: datetime | None,
+                        now: datetime) -> float:
+        """Predicted review rate: the highest of recent metrics, the last observed poll, and the last review age"""
+        observed_rate = self._polls[appid][1] if appid in self._polls else 0.0
+        # A game whose last review is N days old gets about 1/N reviews a day, however popular it once was
+        age_rate = 1 / max((now - last_review_at) / timedelta(days=1), 1) if last_review_at else 0.0
+        return max(recent_rate, observed_rate, age_rate)
+
+    def plan(self, games: pl.DataFrame, activity: dict[str, float],
+             last_review_at: dict[str, datetime], now: datetime | None = None) -> pl.DataFrame:
+        """Games due for a poll, highest expected number of new reviews first"""
+        now = now or datetime.now(UTC)
+        expected = []
+        for game_id in games["game_id"]:
+            appid = str(game_id)
+            if appid not in self._polls:  # never polled: always due
+                expected.append(math.inf)
+                continue
+            rate = self.reviews_per_day(appid, activity.get(appid, 0.0), last_review_at.get(appid), now)
+            since_poll = now - self._polls[appid][0]
+            expected.append(rate * since_poll / timedelta(days=1)
+                            if since_poll >= self.policy.interval(rate) else None)
+        due = (games.with_columns(pl.Series("expected_new_reviews", expected, dtype=pl.Float64))
+               .filter(pl.col("expected_new_reviews").is_not_null())
+               .sort("expected_new_reviews", descending=True)
+               .drop("expected_new_reviews"))
+        self.logger.info(f"{len(due)} of {len(games)} games due for a poll, skipping {len(games) - len(due)}")
+        return due
+
+    def record_poll(self, appid: str, new_reviews: int, polled_at: datetime | None = None) -> None:
+        """Buffer a poll result. Flush it once the polled reviews are committed"""
+        self._pending[appid] = (polled_at or datetime.now(UTC), new_reviews)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        rows = []
+        for appid, (polled_at, new_reviews) in self._pending.items():
+            previous = self._polls.get(appid)
+            # The first poll of a game may return its whole history, which says nothing about its rate
+            observed_rate = (new_reviews / max((polled_at - previous[0]) / timedelta(days=1), 1)
+                             if previous else 0.0)
+            self._polls[appid] = (polled_at, observed_rate)
+            rows.append((appid, polled_at.isoformat(), new_reviews, observed_rate))
+        with self._conn:
+            self._conn.executemany("""
+                INSERT INTO review_polls (appid, last_polled_at, new_reviews, observed_rate) VALUES (?, ?, ?, ?)
+                ON CONFLICT (appid) DO UPDATE SET last_polled_at = excluded.last_polled_at,
+                    new_reviews = excluded.new_reviews, observed_rate = excluded.observed_rate
+            """, rows)
+        self.logger.info(f"Recorded {len(rows)} polls")
+        self._pending.clear()
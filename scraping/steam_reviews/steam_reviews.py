@@ -1,17 +1,57 @@
+import argparse
+import asyncio
 import logging
 import os
-import time
-from dataclasses import dataclass
+import signal
+import zlib
+from collections.abc import AsyncIterator, Callable, Collection, Iterable
+from dataclasses import dataclass, field, replace
 from datetime import datetime, UTC
 
 import duckdb
 import polars as pl
 
+from steam_reviews.cursors import CursorState, ReviewCursorStore
+from steam_reviews.scheduler import ReviewPollScheduler, load_review_activity
+from steam_reviews.watermarks import WatermarkLog
+from utils.batch_builder import RecordBatchBuilder
+from utils.concurrency import map_concurrently, run_on_loop
 from utils.db import DbClient, make_db_client
-from utils.steam_api import get_app_reviews
+from utils.parquet_sink import ParquetSink, PartitionedParquetSink
+from utils.response_archive import ArchiveReplay, ResponseArchive
+from utils.steam_api import AsyncSteamClient, HttpConfig, ReplaySteamClient
 from utils.views import create_view_if_not_exists
 
 
+REVIEWS_URI = "s3://raw/reviews"
+RAW_REVIEWS_GLOB = f"{REVIEWS_URI}/scrape_date=*/appid_bucket=*/*.parquet"
+REVIEWS_SCHEMA = {
+    "rec_id": pl.Int64,
+    "author_id": pl.Int64,
+    "appid": pl.Int64,
+    "playtime_forever": pl.Int64,
+    "playtime_last_two_weeks": pl.Int64,
+    "playtime_at_review": pl.Int64,
+    "num_games_owned": pl.Int64,
+    "num_reviews": pl.Int64,
+    "last_played": pl.Int64,
+    "language": pl.String,
+    "review": pl.Utf8,
+    "timestamp_created": pl.Int64,
+    "timestamp_updated": pl.Int64,
+    "voted_up": pl.Boolean,
+    "votes_up": pl.Int64,
+    "votes_funny": pl.Int64,
+    "weighted_vote_score": pl.Float64,
+    "comment_count": pl.Int64,
+    "steam_purchase": pl.Boolean,
+    "received_for_free": pl.Boolean,
+    "written_during_early_access": pl.Boolean,
+    "primarily_steam_deck": pl.Boolean,
+    "scrape_date": pl.Date,
+}
+
+
 @dataclass(frozen=True, slots=True)
 class App:
     app_id: str
@@ -31,59 +71,69 @@ class App:
         return f"App(app_id={self.app_id}, name={self.name})"
 
 
+@dataclass(slots=True)
+class FetchResult:
+    reviews: list[dict] = field(default_factory=list)
+    latest_timestamp: datetime | None = None  # new watermark, None when it must not move
+    cursor_state: CursorState | None = None  # None when unchanged
+    pages_fetched: int = 0
+
+
 class ReviewProcessor:
-    def __init__(self, db_client: DbClient, batch_size: int = 100_000):
+    def __init__(self, db_client: DbClient, client: AsyncSteamClient, batch_size: int = 100_000,
+                 cursor_store: ReviewCursorStore | None = None, watermark_log: WatermarkLog | None = None):
         self.logger = logging.getLogger(__name__ + ".ReviewProcessor")
         self.db = db_client
+        self.client = client
         self.batch_size = batch_size
-        self.schema = {
-            "rec_id": pl.Int64,
-            "author_id": pl.Int64,
-            "appid": pl.Int64,
-            "playtime_forever": pl.Int64,
-            "playtime_last_two_weeks": pl.Int64,
-            "playtime_at_review": pl.Int64,
-            "num_games_owned": pl.Int64,
-            "num_reviews": pl.Int64,
-            "last_played": pl.Int64,
-            "language": pl.String,
-            "review": pl.Utf8,
-            "timestamp_created": pl.Int64,
-            "timestamp_updated": pl.Int64,
-            "voted_up": pl.Boolean,
-            "votes_up": pl.Int64,
-            "votes_funny": pl.Int64,
-            "weighted_vote_score": pl.Float64,
-            "comment_count": pl.Int64,
-            "steam_purchase": pl.Boolean,
-            "received_for_free": pl.Boolean,
-            "written_during_early_access": pl.Boolean,
-            "primarily_steam_deck": pl.Boolean,
-            "scrape_date": pl.Date,
-        }
+        self.schema = REVIEWS_SCHEMA
+        self.cursor_store = cursor_store
+        self.watermark_log = watermark_log
+        self.pages_fetched: dict[str, int] = {}
 
         # Cache for latest timestamps - minimize reads
         self._timestamp_cache: dict[str, datetime] = {}
-        self._timestamp_updates: dict[str, datetime] = {}  # Pending updates
+        self._timestamp_updates: dict[str, datetime] = {}  # Pending updates, when there is no watermark log
+        self._cursor_cache: dict[str, CursorState] = {}
+        self._cursor_updates: dict[str, CursorState] = {}
 
-    def load_latest_timestamps_cache(self) -> None:
-        """Load all timestamps in a single batch operation"""
+    def load_latest_timestamps_cache(self, appids: Collection[str] | None = None) -> None:
+        """Load all timestamps (or those of `appids`) in a single batch operation"""
         #
         self.logger.info("Loading latest timestamps cache from db...")
-        self._timestamp_cache = self.db.load_latest_timestamps()
+        self._timestamp_cache = self.db.load_latest_timestamps(appids)
         self.logger.info(f"Loaded {len(self._timestamp_cache)} timestamps from cache")
 
     def get_latest_timestamp(self, appid: str) -> datetime | None:
         """Get latest timestamp from cache"""
         return self._timestamp_cache.get(appid)
 
+    def latest_timestamps(self) -> dict[str, datetime]:
+        return self._timestamp_cache
+
     def update_latest_timestamp(self, appid: str, timestamp: datetime) -> None:
         """Update timestamp in cache and mark for batch update"""
         self._timestamp_cache[appid] = timestamp
-        self._timestamp_updates[appid] = timestamp
-
-    def flush_timestamp_updates(self) -> None:
-        """Batch update all pending timestamp changes to db"""
+        if self.watermark_log is not None:
+            self.watermark_log.append(appid, timestamp)  # local and synchronous, no db round trip
+        else:
+            self._timestamp_updates[appid] = timestamp
+
+    def replay_watermarks(self) -> None:
+        """Sync the watermarks a previous run committed but could not flush to the db"""
+        if self.watermark_log is None:
+            return
+        updates = self.watermark_log.recover()
+        if updates:
+            self.logger.info(f"Replaying {len(updates)} committed timestamp updates from {self.watermark_log}")
+            self._sync_watermark_log(raise_errors=True)
+
+    def flush_timestamp_updates(self, committed_file: str = "") -> None:
+        """Batch update all pending timestamp changes to db, once the file holding their reviews is committed"""
+        if self.watermark_log is not None:
+            self.watermark_log.commit(committed_file)
+            self._sync_watermark_log()
+            return
         if not self._timestamp_updates:
             return
 
@@ -94,6 +144,49 @@ class ReviewProcessor:
         self._timestamp_updates.clear()
         self.logger.info("Timestamp updates flushed successfully")
 
+    def _sync_watermark_log(self, raise_errors: bool = False) -> None:
+        updates, up_to_seq = self.watermark_log.unsynced()
+        if not updates:
+            return
+        self.logger.info(f"Flushing {len(updates)} timestamp updates to {self.db}...")
+        try:
+            self.db.update_latest_timestamps(updates)
+        except Exception as e:
+            if raise_errors:
+                raise
+            # Committed watermarks stay in the local log: synced on the next commit, or replayed on the next run
+            self.logger.error(f"Error flushing timestamp updates to {self.db}, kept in {self.watermark_log}: {e}")
+            return
+        self.watermark_log.mark_synced(up_to_seq)
+        self.logger.info("Timestamp updates flushed successfully")
+
+    def load_cursor_cache(self, appids: Collection[str] | None = None) -> None:
+        if self.cursor_store is None:
+            return
+        self._cursor_cache = self.cursor_store.load(appids)
+        in_progress = sum(state.in_progress for state in self._cursor_cache.values())
+        self.logger.info(f"Loaded {len(self._cursor_cache)} cursor states, {in_progress} walks to resume")
+
+    def get_cursor_state(self, appid: str) -> CursorState:
+        return self._cursor_cache.get(appid, CursorState())
+
+    def update_cursor_state(self, appid: str, state: CursorState) -> None:
+        self._cursor_cache[appid] = state
+        self._cursor_updates[appid] = state
+
+    def flush_cursor_updates(self) -> None:
+        if not self._cursor_updates or self.cursor_store is None:
+            return
+        self.cursor_store.update(self._cursor_updates)
+        self.logger.info(f"Flushed {len(self._cursor_updates)} cursor states to {self.cursor_store}")
+        self._cursor_updates.clear()
+
+    def log_pagination_stats(self, top: int = 5) -> None:
+        total = sum(self.pages_fetched.values())
+        self.logger.info(f"Fetched {total} pages for {len(self.pages_fetched)} apps")
+        for appid, pages in sorted(self.pages_fetched.items(), key=lambda item: item[1], reverse=True)[:top]:
+            self.logger.info(f"App {appid}: {pages} pages")
+
     def create_review_record(self, review: dict, appid: str) -> dict:
         """Create a review record from Steam API response"""
         author = review["author"]
@@ -124,118 +217,259 @@ class ReviewProcessor:
             "scrape_date": datetime.now(UTC).date()
         }
 
-    def fetch_reviews_for_app(self, app: App) -> tuple[list[dict], bool]:
+    async def fetch_reviews_for_app(self, app: App) -> FetchResult:
         """
-        Fetch new reviews for a given app.
-        Returns (reviews_list, has_new_reviews)
+        Fetch new reviews for a given app. Pages of a single app are always fetched in cursor order.
+        Pagination stops at the first known review, and an interrupted walk resumes from its cursor on the next run.
+        The caller advances the watermark and cursor state once the reviews are handed to the sink.
         """
         appid = app.app_id
         cached_timestamp = self.get_latest_timestamp(appid)
-        user_reviews = []
+        state = self.get_cursor_state(appid)
 
         # Get first batch to check if there are new reviews
         try:
             self.logger.info(f"Fetching initial reviews for app {app}")
-            data = self._fetch_reviews_with_retry(app=app, cursor="*")
+            data = await self.client.get_app_reviews(appid=appid, filt="recent", cursor="*")
         except Exception as e:
             self.logger.error(f"Error fetching initial reviews for app {appid}: {e}")
-            return [], False
+            return FetchResult()
 
         if not data.get("reviews"):
             self.logger.warning(f"No reviews found for app {app}")
-            return [], False
+            return FetchResult(pages_fetched=1)
 
         latest_review_timestamp = datetime.fromtimestamp(data["reviews"][0]["timestamp_created"], UTC)
+        newest_rec_id = int(data["reviews"][0]["recommendationid"])
 
         # Check if we have new reviews
         if cached_timestamp and latest_review_timestamp <= cached_timestamp:
             self.logger.info(f"Skipping app {app} - no new reviews since {cached_timestamp}")
-            return [], False
+            return FetchResult(pages_fetched=1)
 
         self.logger.info(f"Processing new reviews for app {app}")
-
-        # Process reviews from first batch
-        new_reviews = self._process_reviews_batch(data["reviews"], appid, cached_timestamp)
-        user_reviews.extend(new_reviews)
-
-        # Update latest timestamp in cache (will be flushed later)
-        self.update_latest_timestamp(appid, latest_review_timestamp)
-
-        # Continue with pagination if needed
-        total_reviews = data.get("query_summary", {}).get("total_reviews", 0)
-        if total_reviews > 100:
-            cursor = data.get("cursor")
-            user_reviews.extend(self._fetch_remaining_reviews(app, cursor, cached_timestamp, total_reviews))
-
-        return user_reviews, True
-
-    def _process_reviews_batch(self, reviews: list[dict], appid: str, cutoff_timestamp: datetime | None) -> list[dict]:
-        """Process a batch of reviews, filtering by timestamp"""
-        processed_reviews = []
+        # Reviews newer than the last walk, whose watermark is still pending if that walk was interrupted
+        user_reviews, cursor, pages = await self._walk_reviews(
+            app, "*", state.target if state.in_progress else cached_timestamp, state.newest_rec_id, first_page=data)
+        if cursor is not None:
+            if state.in_progress:  # keep resuming the older walk, these newer pages are cheap to redo
+                return FetchResult(reviews=user_reviews, pages_fetched=pages)
+            return FetchResult(reviews=user_reviews, pages_fetched=pages,
+                               cursor_state=CursorState(newest_rec_id, cursor, cached_timestamp,
+                                                        latest_review_timestamp, pages))
+
+        if state.in_progress:
+            self.logger.info(f"Resuming interrupted walk of app {app} after {state.pages_fetched} pages")
+            older_reviews, cursor, older_pages = await self._walk_reviews(app, state.cursor, state.cutoff, None)
+            user_reviews.extend(older_reviews)
+            pages += older_pages
+            if cursor is not None:
+                return FetchResult(reviews=user_reviews, pages_fetched=pages,
+                                   cursor_state=CursorState(newest_rec_id, cursor, state.cutoff,
+                                                            latest_review_timestamp, state.pages_fetched + pages))
+
+        return FetchResult(reviews=user_reviews, latest_timestamp=latest_review_timestamp, pages_fetched=pages,
+                           cursor_state=CursorState(newest_rec_id, pages_fetched=pages))
+
+    async def fetch_reviews_concurrently(self, apps: Iterable[App], concurrency: int
+                                         ) -> AsyncIterator[tuple[App, FetchResult]]:
+        """
+        Fetch reviews for many apps at once, yielding (app, fetch_result) as apps complete.
+        At most `concurrency` apps are in flight, and the consumer applies backpressure.
+        An app failing unexpectedly is logged and left out: its watermark does not move, so the next run fetches it.
+        """
+        async for app, result in map_concurrently(self.fetch_reviews_for_app, apps, concurrency,
+                                                  description="fetching reviews for app"):
+            self.pages_fetched[app.app_id] = result.pages_fetched
+            yield app, result
+
+    async def _walk_reviews(self, app: App, cursor: str, cutoff_timestamp: datetime | None,
+                            known_rec_id: int | None, first_page: dict | None = None
+                            ) -> tuple[list[dict], str | None, int]:
+        """
+        Paginate from `cursor` until a known review, the cutoff, or the last page.
+        Returns (reviews_list, resume_cursor, pages_fetched), the cursor being None once the walk completed.
+        """
+        appid = app.app_id
         cutoff_ts = int(cutoff_timestamp.timestamp()) if cutoff_timestamp else 0
-
-        for review in reviews:
-            if review["timestamp_created"] <= cutoff_ts:
-                continue
-            processed_reviews.append(self.create_review_record(review, appid))
-
-        return processed_reviews
-
-    def _fetch_remaining_reviews(self, app: App, cursor: str,
-                                 cutoff_timestamp: datetime | None, total_reviews: int) -> list[dict]:
-        """Fetch remaining reviews using pagination"""
         user_reviews = []
-        appid = app.app_id
-        total_iter = total_reviews // 100 + (1 if total_reviews % 100 > 0 else 0)
+        seen_cursors, seen_rec_ids = set(), set()
+        page, pages = first_page, 0
+        while True:
+            if page is None:
+                try:
+                    self.logger.info(f"Fetching reviews for app {app} - page {pages + 1}")
+                    page = await self.client.get_app_reviews(appid=appid, filt="recent", cursor=cursor)
+                except Exception as e:
+                    # The client already retried transient errors, the next run resumes from this cursor
+                    self.logger.error(f"Error on page {pages + 1} for app {app}, stopping at cursor {cursor}: {e}")
+                    return user_reviews, cursor, pages
+            pages += 1
+            seen_cursors.add(cursor)
+
+            for review in page.get("reviews", []):
+                rec_id = int(review["recommendationid"])
+                # Reviews come newest first: everything past the cutoff is already scraped
+                if review["timestamp_created"] <= cutoff_ts or rec_id == known_rec_id:
+                    self.logger.info(f"Reached known reviews of app {app} after {pages} pages")
+                    return user_reviews, None, pages
+                if rec_id not in seen_rec_ids:  # pages may overlap when reviews are posted mid-walk
+                    seen_rec_ids.add(rec_id)
+                    user_reviews.append(self.create_review_record(review, appid))
+
+            cursor = page.get("cursor")
+            # Past the last page, Steam answers with no reviews and the same cursor again
+            if not page.get("reviews") or not cursor or cursor in seen_cursors:
+                return user_reviews, None, pages
+            page = None
+
+
+async def scrape_reviews(processor: ReviewProcessor, recommended_games: pl.DataFrame, concurrency: int,
+                         sink: ParquetSink | PartitionedParquetSink, row_group_size: int = 10_000,
+                         scheduler: ReviewPollScheduler | None = None) -> None:
+    reviews = RecordBatchBuilder(processor.schema)
+    processed_count = 0
+    apps = (App.from_dict(game) for game in recommended_games.iter_rows(named=True))
 
-        self.logger.info(f"Resolved {total_iter} iterations for app {app} (all history)")
-        for i in range(1, total_iter):
+    item = 0
+    writing: asyncio.Future | None = None
+    try:
+        async for app, result in processor.fetch_reviews_concurrently(apps, concurrency):
+            item += 1
             try:
-                self.logger.info(f"Fetching reviews for app {app} - iteration {i}/{total_iter}")
-                data = self._fetch_reviews_with_retry(app=app, cursor=cursor)
-            except Exception as e:
-                logging.error(f"Error on iteration {i} for app {app}: {e}")
-                time.sleep(10)
-                continue
-
-            if not data.get("reviews"):
-                break
-
-            # Check if we've gone past our cutoff
-            oldest_in_batch = datetime.fromtimestamp(data["reviews"][-1]["timestamp_created"], UTC)
-            if cutoff_timestamp and oldest_in_batch <= cutoff_timestamp:
-                self.logger.info(f"Stopping pagination for app {app}.")
-                # Process only the new reviews in this batch and stop
-                new_reviews = self._process_reviews_batch(data["reviews"], appid, cutoff_timestamp)
-                user_reviews.extend(new_reviews)
-                break
-
-            # All reviews in this batch are new
-            batch_reviews = [self.create_review_record(review, appid) for review in data["reviews"]]
-            user_reviews.extend(batch_reviews)
-            cursor = data.get("cursor")
+                logging.info(f"Processed app ({item}/{len(recommended_games)}) in {result.pages_fetched} pages")
+                if scheduler is not None and result.pages_fetched:
+                    # Flushed along with the timestamps, so a poll is only recorded once its reviews are durable
+                    scheduler.record_poll(app.app_id, len(result.reviews))
+
+                if result.reviews:
+                    reviews.extend(result.reviews)
+                    processed_count += len(result.reviews)
+                    logging.info(f"Added {len(result.reviews)} reviews for app {app.app_id} ({app.name}). "
+                                 f"Total: {processed_count}")
+                # Flushed to the db only once the file holding these reviews is committed
+                if result.latest_timestamp is not None:
+                    processor.update_latest_timestamp(app.app_id, result.latest_timestamp)
+                if result.cursor_state is not None:
+                    processor.update_cursor_state(app.app_id, result.cursor_state)
+
+                # Stream full row groups. The sink commits a file, flushing timestamps, every `max_rows_per_file`
+                if len(reviews) >= row_group_size:
+                    # Off the event loop, so in-flight apps keep fetching while the row group uploads.
+                    # No result is handled meanwhile: a file committed by this write holds every pending update
+                    writing = asyncio.ensure_future(asyncio.to_thread(sink.write, reviews.flush()))
+                    await asyncio.shield(writing)
 
-            if not cursor:
-                break
-
-        return user_reviews
-
-    @staticmethod
-    def _fetch_reviews_with_retry(app: App, cursor: str, max_retries: int = 3) -> dict | None:
-        """Fetch reviews with retry mechanism"""
-        for attempt in range(max_retries):
-            try:
-                return get_app_reviews(
-                    appid=app.app_id,
-                    filt="recent",
-                    cursor=cursor
-                )
             except Exception as e:
-                logging.warning(f"Error fetching reviews for app {app}: {e}. Retrying...")
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(10 * (attempt + 1))  # Exponential backoff
-        return dict()
+                logging.error(f"Error processing app {app.app_id} ({app.name}): {e}")
+                continue
+    finally:
+        # A thread cannot be cancelled: let a write in flight finish before touching the sink again
+        if writing is not None and not writing.done():
+            await asyncio.wait([writing])
+        # Also on failure or cancellation: every pending timestamp must have its reviews in the sink
+        if len(reviews) > 0:
+            logging.info(f"Writing final row group with {len(reviews)} reviews...")
+            sink.write(reviews.flush())
+
+
+def commit_callback(processor: ReviewProcessor, scheduler: ReviewPollScheduler) -> Callable[[str], None]:
+    """
+    Flushes the pending updates once a file holding their reviews is committed. A commit fired by a row group written
+    off the event loop still flushes on the loop thread, which owns the SQLite connections of the scrape journal.
+    """
+    @run_on_loop
+    def on_commit(committed_file: str) -> None:
+        processor.flush_timestamp_updates(committed_file)
+        processor.flush_cursor_updates()
+        scheduler.flush()
+    return on_commit
+
+
+def shard_for(appid: str, shard_count: int) -> int:
+    """Stable shard of an app, identical across processes and runs (unlike `hash()`)"""
+    return zlib.crc32(appid.encode()) % shard_count
+
+
+def shard_file_prefix(scrape_date, shard_index: int, shard_count: int) -> str:
+    if shard_count == 1:
+        return f"steam_reviews_{scrape_date}"
+    return f"steam_reviews_{scrape_date}_shard{shard_index}of{shard_count}"
+
+
+def make_client(concurrency: int, requests_per_second: float, archive: ResponseArchive | None,
+                replay: ArchiveReplay | None) -> AsyncSteamClient | ReplaySteamClient:
+    if replay is not None:
+        return ReplaySteamClient(replay)
+    http_config = replace(HttpConfig.from_env(), pool_size=concurrency)
+    return AsyncSteamClient(requests_per_second=requests_per_second, config=http_config, archive=archive)
+
+
+async def run(concurrency: int, requests_per_second: float, shard_index: int = 0, shard_count: int = 1,
+              poll_all: bool = False, archive: ResponseArchive | None = None,
+              replay: ArchiveReplay | None = None) -> None:
+    # Airflow stops tasks with SIGTERM: cancel instead of dying so the open Parquet file gets committed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    db = make_db_client()
+    async with make_client(concurrency, requests_per_second, archive, replay) as client:
+        processor = ReviewProcessor(db, client, batch_size=100_000, cursor_store=ReviewCursorStore.from_env(),
+                                    watermark_log=WatermarkLog.from_env(scope=f"shard{shard_index}of{shard_count}"))
+        processor.replay_watermarks()
+
+        with duckdb.connect('../data/steam.duckdb', read_only=True) as duckdb_conn:
+            duckdb_conn.sql(f"""SET s3_region='us-east-1';
+                            SET s3_url_style='path';
+                            SET s3_use_ssl=false;
+                            SET s3_endpoint='{os.environ.get("MINIO_ENDPOINT_URL", "localhost:9000")}';
+                            SET s3_access_key_id='';
+                            SET s3_secret_access_key='';""")
+            recommended_games = duckdb_conn.sql("SELECT game_id, game_name FROM stg_games").pl()
+            activity = load_review_activity(duckdb_conn)
+
+        if shard_count > 1:
+            in_shard = [shard_for(str(game_id), shard_count) == shard_index for game_id in recommended_games["game_id"]]
+            recommended_games = recommended_games.filter(pl.Series(in_shard, dtype=pl.Boolean))
+            logging.info(f"Shard {shard_index}/{shard_count}: {len(recommended_games)} games")
+            # Only this shard's slice of the watermarks, so shards never read or write each other's games
+            processor.load_latest_timestamps_cache(appids=[str(game_id) for game_id in recommended_games["game_id"]])
+            processor.load_cursor_cache(appids=[str(game_id) for game_id in recommended_games["game_id"]])
+        else:
+            processor.load_latest_timestamps_cache()  # Single read operation
+            processor.load_cursor_cache()
+
+        if replay is not None:
+            # Only the archived games, all of them: there is no API quota to save
+            recommended_games = recommended_games.filter(
+                pl.col("game_id").cast(pl.String).is_in(replay.appids("appreviews")))
+            poll_all = True
+            logging.info(f"Replaying {len(replay)} archived responses for {len(recommended_games)} games")
+
+        scheduler = ReviewPollScheduler.from_env()
+        scheduler.load(appids=[str(game_id) for game_id in recommended_games["game_id"]])
+        if not poll_all:
+            recommended_games = scheduler.plan(recommended_games, activity, processor.latest_timestamps())
+
+        on_commit = commit_callback(processor, scheduler)
+        scrape_date = datetime.now(UTC).date()
+        try:
+            with PartitionedParquetSink(REVIEWS_URI, shard_file_prefix(scrape_date, shard_index, shard_count),
+                                        processor.schema, max_rows_per_file=processor.batch_size,
+                                        on_commit=on_commit) as sink:
+                await scrape_reviews(processor, recommended_games, concurrency, sink, scheduler=scheduler)
+            # Closing the sink commits the last file, flushing the remaining updates.
+            # Updates without reviews (e.g. polls that found nothing new) never trigger a commit
+            on_commit("")
+        finally:
+            scheduler.close()
+            processor.cursor_store.close()
+            processor.watermark_log.close()
+            if archive is not None:
+                archive.close()
+        processor.log_pagination_stats()
+        for limiter in client.limiters():
+            logging.info(f"Rate limiter stats: {limiter.stats()}")
+        logging.info(f"HTTP stats: {client.stats()}")
+    logging.info("Processing completed successfully!")
 
 
 def main():
@@ -244,84 +478,42 @@ def main():
         format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-
-    scrape_date = datetime.now(UTC).date()
-    db = make_db_client()
-    processor = ReviewProcessor(db, batch_size=100_000)
-    processor.load_latest_timestamps_cache()  # Single read operation
-
-    with duckdb.connect('../data/steam.duckdb', read_only=True) as duckdb_conn:
-        duckdb_conn.sql(f"""SET s3_region='us-east-1';
-                        SET s3_url_style='path';
-                        SET s3_use_ssl=false;
-                        SET s3_endpoint='{os.environ.get("MINIO_ENDPOINT_URL", "localhost:9000")}';
-                        SET s3_access_key_id='';
-                        SET s3_secret_access_key='';""")
-        recommended_games = duckdb_conn.sql("SELECT game_id, game_name FROM stg_games").pl()
-    reviews = pl.DataFrame(infer_schema_length=None, schema=processor.schema)
-
-    batch_num = 0
-    processed_count = 0
-
-    for item, game in enumerate(recommended_games.iter_rows(named=True)):
-        app = App.from_dict(game)
-
-        try:
-            logging.info(f"Processing app ({item + 1}/{len(recommended_games)}) ...")
-            app_reviews, has_new_reviews = processor.fetch_reviews_for_app(app)
-
-            if not has_new_reviews:
-                continue
-
-            if app_reviews:
-                reviews = pl.concat([
-                    reviews,
-                    pl.DataFrame(app_reviews, infer_schema_length=None)
-                ], how='vertical')
-                processed_count += len(app_reviews)
-                logging.info(
-                    f"Added {len(app_reviews)} reviews for app {app.app_id} ({app.name}). Total: {processed_count}")
-
-            # Batch write reviews and flush timestamp updates
-            if len(reviews) >= processor.batch_size:
-                logging.info(f"Writing batch {batch_num} with {len(reviews)} reviews...")
-                scrape_date = datetime.now(UTC).date()
-                reviews.write_parquet(f"s3://raw/reviews/steam_reviews_{scrape_date}_{batch_num}.parquet",
-                                      storage_options={"aws_access_key_id": 'minioadmin',
-                                                       "aws_secret_access_key": 'minioadmin',
-                                                       "aws_region": "us-east-1",
-                                                       "aws_endpoint_url": os.environ.get("MINIO_ENDPOINT_URL",
-                                                                                          "http://localhost:9000")})
-                processor.flush_timestamp_updates()
-
-                # Reset for next batch
-                reviews = pl.DataFrame(infer_schema_length=None, schema=processor.schema)
-                batch_num += 1
-                processed_count = 0
-
-        except Exception as e:
-            logging.error(f"Error processing app {app.app_id} ({app.name}): {e}")
-            # Flush any pending updates before continuing
-            processor.flush_timestamp_updates()
-            continue
-
-    # Final write
-    if len(reviews) > 0:
-        logging.info(f"Writing final batch {batch_num} with {len(reviews)} reviews...")
-        reviews.write_parquet(f"s3://raw/reviews/steam_reviews_{scrape_date}_{batch_num}.parquet",
-                              storage_options={"aws_access_key_id": 'minioadmin',
-                                               "aws_secret_access_key": 'minioadmin',
-                                               "aws_region": "us-east-1",
-                                               "aws_endpoint_url": os.environ.get("MINIO_ENDPOINT_URL",
-                                                                                  "http://localhost:9000")})
-
-    # Final flush of any remaining timestamp updates
-    processor.flush_timestamp_updates()
-    logging.info("Processing completed successfully!")
+    parser = argparse.ArgumentParser(description="Scrape new Steam reviews for every game in `stg_games`")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("SCRAPER_CONCURRENCY", 8)),
+                        help="Number of apps fetched concurrently")
+    parser.add_argument("--requests-per-second", type=float,
+                        default=float(os.environ.get("SCRAPER_REQUESTS_PER_SECOND", 4.0)),
+                        help="Token bucket quota for the Steam store host, shared by all shards")
+    parser.add_argument("--shard-index", type=int, default=int(os.environ.get("SHARD_INDEX", 0)),
+                        help="Shard scraped by this process, in [0, shard-count)")
+    parser.add_argument("--shard-count", type=int, default=int(os.environ.get("SHARD_COUNT", 1)),
+                        help="Number of processes splitting `stg_games` by a hash of the appid")
+    parser.add_argument("--poll-all", action="store_true",
+                        help="Poll every game, instead of only those the scheduler expects to have new reviews")
+    parser.add_argument("--archive-responses", action="store_true",
+                        default=os.environ.get("ARCHIVE_RESPONSES", "") == "1",
+                        help="Keep the raw API responses in the zstd archive at RESPONSE_ARCHIVE_PATH")
+    parser.add_argument("--replay", nargs="?", const="all", default=None, metavar="SCRAPE_DATE",
+                        help="Serve the API responses from the archive instead of Steam, only those archived on "
+                             "SCRAPE_DATE if given. Watermarks still apply: replay against fresh state to backfill")
+    args = parser.parse_args()
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error(f"--shard-index must be in [0, {args.shard_count})")
+    scope = f"reviews_shard{args.shard_index}of{args.shard_count}"
+    archive = ResponseArchive.from_env(scope) if args.archive_responses and args.replay is None else None
+    replay = None
+    if args.replay is not None:
+        replay = ArchiveReplay.from_env(("appreviews",), None if args.replay == "all" else args.replay)
+    # Shards hit the same host from the same IP: split the quota between them
+    asyncio.run(run(args.concurrency, args.requests_per_second / args.shard_count,
+                    args.shard_index, args.shard_count, args.poll_all, archive, replay))
+
+    # Sharded runs get the view from `steam_reviews.compact`, once every shard is done
+    if args.shard_count == 1:
+        with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
+            create_view_if_not_exists(duckdb_conn, "raw_reviews", RAW_REVIEWS_GLOB, hive_partitioning=True,
+                                      replace=True)
 
 
 if __name__ == "__main__":
     main()
-    # Create raw_reviews view if it doesn't exist
-    with duckdb.connect('../data/steam.duckdb', read_only=False) as duckdb_conn:
-        create_view_if_not_exists(duckdb_conn, "raw_reviews", "s3://raw/reviews/steam_reviews_*.parquet")
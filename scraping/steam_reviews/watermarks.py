@@ -0,0 +1,73 @@
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+
+class WatermarkLog:
+    """
+    Local write-ahead log of review watermarks, in the scrape journal SQLite file (WAL mode).
+    Entries are appended as `pending` when their reviews are buffered, become `committed` with the Parquet file
+    holding those reviews, and are deleted once synced to the db. On startup, committed entries are replayed to the db
+    and pending ones are dropped: their apps are fetched again, so a crash never leaves a gap.
+    """
+
+    def __init__(self, path: str, scope: str = "reviews"):
+        self.logger = logging.getLogger(__name__ + ".WatermarkLog")
+        self.path = path
+        self.scope = scope  # e.g. the shard, so parallel workers never touch each other's entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS review_watermarks (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                appid TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                committed_file TEXT
+            )
+        """)
+
+    @classmethod
+    def from_env(cls, scope: str = "reviews"):
+        return cls(path=os.getenv("SCRAPE_JOURNAL_PATH", "../data/scrape_journal.sqlite"), scope=scope)
+
+    def __str__(self):
+        return f"WatermarkLog(path={self.path}, scope={self.scope})"
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def append(self, appid: str, timestamp: datetime) -> None:
+        with self._conn:
+            self._conn.execute("INSERT INTO review_watermarks (scope, appid, timestamp) VALUES (?, ?, ?)",
+                               (self.scope, appid, timestamp.isoformat()))
+
+    def commit(self, committed_file: str) -> None:
+        """Mark every pending entry as durable, once `committed_file` holds their reviews"""
+        with self._conn:
+            self._conn.execute("UPDATE review_watermarks SET committed_file = ? "
+                               "WHERE scope = ? AND committed_file IS NULL", (committed_file, self.scope))
+
+    def unsynced(self) -> tuple[dict[str, datetime], int]:
+        """Latest committed watermark of every app not synced to the db yet, and the last entry it covers"""
+        rows = self._conn.execute("SELECT seq, appid, timestamp FROM review_watermarks "
+                                  "WHERE scope = ? AND committed_file IS NOT NULL ORDER BY seq",
+                                  (self.scope,)).fetchall()
+        return {appid: datetime.fromisoformat(timestamp) for _, appid, timestamp in rows}, rows[-1][0] if rows else 0
+
+    def mark_synced(self, up_to_seq: int) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM review_watermarks WHERE scope = ? AND committed_file IS NOT NULL "
+                               "AND seq <= ?", (self.scope, up_to_seq))
+
+    def recover(self) -> dict[str, datetime]:
+        """Drop the entries of an interrupted run whose reviews never reached a committed file"""
+        with self._conn:
+            dropped = self._conn.execute("DELETE FROM review_watermarks WHERE scope = ? AND committed_file IS NULL",
+                                         (self.scope,)).rowcount
+        if dropped:
+            self.logger.warning(f"Dropped {dropped} uncommitted watermarks, their apps will be fetched again")
+        return self.unsynced()[0]
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+
+from utils.concurrency import map_concurrently
+
+
+async def square(n: int) -> int:
+    await asyncio.sleep(0.001 * (n % 3))
+    if n % 5 == 0:
+        raise ValueError(f"no square for {n}")
+    return n * n
+
+
+def test_failing_items_are_logged_and_skipped(caplog):
+    async def collect():
+        return [result async for result in map_concurrently(square, range(1, 21), concurrency=3)]
+
+    with caplog.at_level(logging.ERROR):
+        results = asyncio.run(collect())
+    assert sorted(results) == [(n, n * n) for n in range(1, 21) if n % 5]
+    assert sorted(record.getMessage() for record in caplog.records) == sorted(
+        f"Error processing {n}: ValueError('no square for {n}')" for n in (5, 10, 15, 20))
+
+
+def test_consumer_stopping_early_stops_the_workers():
+    started = []
+
+    async def record(n: int) -> int:
+        started.append(n)
+        return n
+
+    async def first_three():
+        results = []
+        async for _, n in map_concurrently(record, range(1_000), concurrency=2):
+            results.append(n)
+            if len(results) == 3:
+                break
+        return results
+
+    assert len(asyncio.run(asyncio.wait_for(first_three(), timeout=5))) == 3
+    # Workers wait for room once `concurrency * 2` results are unconsumed
+    assert len(started) < 20
@@ -0,0 +1,70 @@
+import json
+from datetime import date
+
+import polars as pl
+
+from steam_games.parsing import APP_PAYLOADS_SCHEMA, APPS_FEATURES_SCHEMA, parse_app_payloads, payload_hash
+
+
+def appdetails(appid: int, **fields) -> str:
+    data = {
+        "type": "game",
+        "name": f"Game {appid}",
+        "required_age": 0,
+        "is_free": False,
+        "detailed_description": "About the game",
+        "about_the_game": "About the game",
+        "short_description": "A game",
+        "supported_languages": "English<strong>*</strong>, French<br><strong>*</strong>languages with full audio",
+        "pc_requirements": {"minimum": "<strong>Minimum:</strong> 4 GB RAM"},
+        "platforms": {"windows": True, "mac": False, "linux": False},
+        "categories": [{"id": 2, "description": "Single-player"}],
+        "genres": [{"id": "1", "description": "Action"}],
+        "release_date": {"coming_soon": False, "date": "14 Oct, 2024"},
+        "price_overview": {"currency": "USD", "initial": 1999, "final": 999},
+        **fields,
+    }
+    return json.dumps({"success": True, "data": data})
+
+
+def payloads(*rows: tuple[int, str]) -> pl.DataFrame:
+    summary = json.dumps({"num_reviews": 20, "review_score": 8, "review_score_desc": "Very Positive"})
+    return pl.DataFrame([{"appid": appid, "appdetails": details, "reviews_summary": summary,
+                          "payload_hash": payload_hash(details, summary), "scrape_date": date(2024, 10, 14)}
+                         for appid, details in rows], schema=APP_PAYLOADS_SCHEMA)
+
+
+def test_required_age_as_number_or_string():
+    parsed = parse_app_payloads(payloads(
+        (10, appdetails(10, required_age=17)),
+        (20, appdetails(20, required_age=0)),
+        (30, appdetails(30, required_age="18+")),
+        (40, appdetails(40, required_age="")),
+    ))
+    assert parsed.schema == pl.Schema(APPS_FEATURES_SCHEMA)
+    assert dict(zip(parsed["appid"], parsed["required_age"])) == {10: 17, 20: 0, 30: 18, 40: None}
+
+
+def test_parsed_fields():
+    game = parse_app_payloads(payloads((10, appdetails(10, pc_requirements={"minimum": "", "recommended": "8 GB"}))))
+    assert game.row(0, named=True) | {"payload_hash": None} == {
+        "appid": 10, "name": "Game 10", "type": "game", "required_age": 0, "is_free": False,
+        "minimum_pc_requirements": None, "recommended_pc_requirements": "8 GB", "controller_support": None,
+        "detailed_description": "About the game", "about_the_game": "About the game", "short_description": "A game",
+        "supported_languages": ["English", "French"], "header_image": None, "developers": [], "publishers": [],
+        "price": 19.99, "categories": ["Single-player"], "genres": ["Action"], "windows_support": True,
+        "mac_support": False, "linux_support": False, "release_date": "14 Oct, 2024", "coming_soon": False,
+        "recommendations": None, "dlc": [], "review_score": 8, "review_score_desc": "Very Positive",
+        "payload_hash": None, "scrape_date": date(2024, 10, 14),
+    }
+
+
+def test_unexpected_payloads_only_drop_their_app():
+    parsed = parse_app_payloads(payloads(
+        (10, appdetails(10)),
+        (20, appdetails(20, pc_requirements=[])),  # no requirements at all: skipped
+        (30, appdetails(30, dlc="not a list")),
+        (40, json.dumps({"success": False})),
+        (50, appdetails(50, required_age=18)),
+    ))
+    assert parsed["appid"].to_list() == [10, 50]
@@ -0,0 +1,47 @@
+import json
+import os
+
+import pytest
+
+from utils.response_archive import ArchiveReplay, ResponseArchive, ResponseNotArchived
+
+
+def archive_file(path: str, endpoint: str) -> str:
+    (date,) = os.listdir(os.path.join(path, endpoint))
+    return os.path.join(path, endpoint, date, "test.jsonl.zst")
+
+
+def test_replay_serves_the_latest_response_of_each_request(tmp_path):
+    with ResponseArchive(str(tmp_path), scope="test", flush_every=3) as archive:
+        for appid in range(1, 11):
+            for page in range(3):
+                archive.append("appreviews", str(appid), f"recent:{page}", json.dumps({"appid": appid, "page": page}))
+        archive.append("appreviews", "4", "recent:1", json.dumps({"appid": 4, "page": 1, "again": True}))
+        archive.append("appdetails", "99", "", json.dumps({"success": True}))
+
+    replay = ArchiveReplay(str(tmp_path), endpoints=("appreviews",), cached_frames=2)
+    assert len(replay) == 30
+    assert replay.appids("appreviews") == [str(appid) for appid in range(1, 11)]
+    assert replay.appids("appdetails") == []
+    for appid in range(1, 11):
+        for page in range(3):
+            expected = {"appid": appid, "page": page} | ({"again": True} if (appid, page) == (4, 1) else {})
+            assert replay.get("appreviews", appid, f"recent:{page}") == expected
+    # Bodies are read back from the file, a few frames at a time
+    assert replay._frame.cache_info().currsize <= 2
+    with pytest.raises(ResponseNotArchived):
+        replay.get("appdetails", "99", "")
+    assert (replay.hits, replay.misses) == (30, 1)
+
+
+def test_replay_stops_at_a_truncated_frame(tmp_path):
+    with ResponseArchive(str(tmp_path), scope="test", flush_every=2) as archive:
+        for appid in range(1, 6):
+            archive.append("appdetails", str(appid), "", json.dumps({"appid": appid}))
+    path = archive_file(str(tmp_path), "appdetails")
+    with open(path, "r+b") as f:  # a crash while appending the last frame
+        f.truncate(os.path.getsize(path) - 3)
+
+    replay = ArchiveReplay(str(tmp_path), endpoints=("appdetails",))
+    assert replay.appids("appdetails") == ["1", "2", "3", "4"]
+    assert replay.get("appdetails", "3", "") == {"appid": 3}
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from datetime import datetime, UTC
+
+import polars as pl
+
+from benchmarks.reviews_throughput import InMemoryDbClient
+from steam_reviews.cursors import ReviewCursorStore
+from steam_reviews.scheduler import ReviewPollScheduler
+from steam_reviews.steam_reviews import REVIEWS_SCHEMA, ReviewProcessor, commit_callback, scrape_reviews
+from steam_reviews.watermarks import WatermarkLog
+from utils.parquet_sink import ParquetSink
+
+CREATED = int(datetime(2025, 1, 1, tzinfo=UTC).timestamp())
+
+
+def review(rec_id: int, timestamp: int) -> dict:
+    return {"recommendationid": str(rec_id), "author": {"steamid": str(rec_id), "playtime_forever": 60},
+            "language": "english", "review": "Fun", "timestamp_created": timestamp, "timestamp_updated": timestamp,
+            "voted_up": True, "votes_up": 0, "votes_funny": 0, "weighted_vote_score": 0.5, "comment_count": 0,
+            "steam_purchase": True, "received_for_free": False, "written_during_early_access": False,
+            "primarily_steam_deck": False}
+
+
+class FakeSteamClient:
+    """Two reviews per app on the first page, then the end of the reviews"""
+    async def get_app_reviews(self, appid: str, filt: str, cursor: str) -> dict:
+        if cursor != "*":
+            return {"reviews": [], "cursor": cursor}
+        first = int(appid) * 10
+        return {"reviews": [review(first + 1, CREATED + 1), review(first, CREATED)], "cursor": f"{appid}-1"}
+
+
+def test_watermarks_committed_by_a_mid_run_roll(tmp_path, caplog):
+    db = InMemoryDbClient()
+    journal = str(tmp_path / "scrape_journal.sqlite")
+    games = pl.DataFrame({"game_id": [1, 2, 3], "game_name": ["One", "Two", "Three"]})
+
+    async def scrape():
+        processor = ReviewProcessor(db, FakeSteamClient(), batch_size=4, cursor_store=ReviewCursorStore(journal),
+                                    watermark_log=WatermarkLog(journal))
+        scheduler = ReviewPollScheduler(journal)
+        # A row group per app, written off the event loop: the second one rolls the file
+        sink = ParquetSink(str(tmp_path / "reviews"), "steam_reviews", REVIEWS_SCHEMA,
+                           max_rows_per_file=processor.batch_size, on_commit=commit_callback(processor, scheduler))
+        await scrape_reviews(processor, games, concurrency=1, sink=sink, row_group_size=2, scheduler=scheduler)
+        assert len(sink.committed_files) == 1
+        # Before close(): the rolled file's watermarks already reached the db, the third app's are pending
+        assert set(db.timestamps) == {"1", "2"}
+        assert processor.watermark_log.unsynced() == ({}, 0)
+        sink.close()
+        assert set(db.timestamps) == {"1", "2", "3"}
+        scheduler.close()
+        processor.cursor_store.close()
+        processor.watermark_log.close()
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(scrape())
+    assert not caplog.records
+    assert pl.read_parquet(tmp_path / "reviews" / "*.parquet")["rec_id"].sort().to_list() == [10, 11, 20, 21, 30, 31]
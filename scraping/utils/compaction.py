@@ -0,0 +1,61 @@
+import logging
+import posixpath
+
+import polars as pl
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from utils.parquet_sink import (ParquetSink, PartitionedParquetSink, list_parquet_files, list_partitions,
+                                make_filesystem, merge_parquet_files)
+
+
+def migrate_flat_files(filesystem: fs.FileSystem, base_path: str, name_prefix: str, schema: dict[str, pl.DataType],
+                       row_group_size: int = 10_000) -> list[str]:
+    """
+    Move the files written before partitioning, directly under `base_path`, into the partitions of their rows.
+    Columns added since read as null. As with merges, inputs are deleted last: a crash leaves duplicates, never gaps.
+    """
+    migrated = []
+    for path in list_parquet_files(filesystem, base_path, name_prefix=name_prefix):
+        sink = PartitionedParquetSink(base_path, posixpath.basename(path).removesuffix(".parquet"), schema,
+                                      max_rows_per_file=10_000_000, filesystem=filesystem)
+        with filesystem.open_input_file(path) as f:
+            for batch in pq.ParquetFile(f).iter_batches(batch_size=row_group_size):
+                df = pl.from_arrow(batch)
+                sink.write(df.with_columns(pl.lit(None, dtype=dtype).alias(column)
+                                           for column, dtype in schema.items() if column not in df.columns))
+        sink.close()
+        filesystem.delete_file(path)
+        migrated.append(path)
+        logging.info(f"Moved {path} into {len(sink.committed_files)} partition files")
+    return migrated
+
+
+def compact_partition(filesystem: fs.FileSystem, partition: str, file_prefix: str, schema: dict[str, pl.DataType],
+                      target_rows: int = 1_000_000, target_bytes: int = 128 * 1024 * 1024) -> int:
+    """Merge the files of `partition` under half `target_bytes` into files of about the target size"""
+    small_files = sorted(info.path for info in filesystem.get_file_info(fs.FileSelector(partition))
+                         if info.type == fs.FileType.File and info.base_name.endswith(".parquet")
+                         and info.size < target_bytes // 2)
+    if len(small_files) < 2:
+        return 0
+    sink = ParquetSink(partition, f"{file_prefix}_compacted", schema, max_rows_per_file=target_rows,
+                       max_bytes_per_file=target_bytes, filesystem=filesystem)
+    merge_parquet_files(filesystem, small_files, sink)
+    logging.info(f"Compacted {len(small_files)} files of {partition} into {len(sink.committed_files)}")
+    return len(small_files)
+
+
+def compact_dataset(uri: str, file_prefix: str, schema: dict[str, pl.DataType], scrape_date: str | None = None,
+                    target_rows: int = 1_000_000, target_bytes: int = 128 * 1024 * 1024) -> None:
+    """
+    Bring a partitioned dataset back to a few target-sized files per partition: flat files left from before
+    partitioning are moved in first, then the partitions of `scrape_date` (all of them if None) are compacted.
+    """
+    filesystem, base_path = make_filesystem(uri)
+    if migrate_flat_files(filesystem, base_path, f"{file_prefix}_", schema):
+        scrape_date = None  # the moved rows landed in partitions of any date
+    partitions = list_partitions(filesystem, base_path, scrape_date)
+    merged = sum(compact_partition(filesystem, partition, file_prefix, schema, target_rows, target_bytes)
+                 for partition in partitions)
+    logging.info(f"Compacted {merged} files over {len(partitions)} partitions of {uri}")
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import threading
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+async def map_concurrently(fn: Callable[[T], Awaitable[R]], items: Iterable[T], concurrency: int,
+                           description: str = "processing") -> AsyncIterator[tuple[T, R]]:
+    """
+    Yield (item, fn(item)) for every item, as they complete, with at most `concurrency` items in flight.
+    Results waiting for the consumer are bounded, so a slow consumer holds the workers back.
+    An item whose `fn` raises is logged and left out, and its worker moves on to the next item.
+    """
+    items_iter = iter(items)
+    # Unbounded, so that a worker reporting its end never blocks: backpressure comes from `room`
+    results: asyncio.Queue = asyncio.Queue()
+    room = asyncio.Semaphore(concurrency * 2)
+    done = object()
+
+    async def worker():
+        try:
+            for item in items_iter:  # shared iterator: each item is handed to exactly one worker
+                try:
+                    result = await fn(item)
+                except Exception as e:
+                    logger.error(f"Error {description} {item}: {e!r}")
+                    continue
+                await room.acquire()
+                results.put_nowait((item, result))
+        finally:
+            results.put_nowait(done)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        pending = len(workers)
+        while pending:
+            result = await results.get()
+            if result is done:
+                pending -= 1
+                continue
+            room.release()
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        for outcome in await asyncio.gather(*workers, return_exceptions=True):
+            if isinstance(outcome, BaseException) and not isinstance(outcome, asyncio.CancelledError):
+                logger.error(f"Worker stopped while {description}: {outcome!r}")
+
+
+def run_on_loop(fn: Callable[[T], R]) -> Callable[[T], R]:
+    """
+    `fn` always run on the thread of the running event loop, e.g. for a sink callback fired by a write handed to
+    `asyncio.to_thread`: SQLite connections only work on the thread that opened them. From another thread, the call
+    blocks until the loop has run `fn`, and raises what `fn` raises.
+    """
+    loop = asyncio.get_running_loop()
+    loop_thread = threading.get_ident()
+
+    async def call_async(arg: T) -> R:
+        return fn(arg)
+
+    def call(arg: T) -> R:
+        if threading.get_ident() == loop_thread:
+            return fn(arg)
+        return asyncio.run_coroutine_threadsafe(call_async(arg), loop).result()
+    return call
@@ -1,4 +1,5 @@
 import os
+from collections.abc import Collection
 from datetime import datetime, UTC
 from typing import Protocol, runtime_checkable
 
@@ -8,7 +9,7 @@ from google.cloud import firestore
 
 @runtime_checkable
 class DbClient(Protocol):  # Interface for database clients
-    def load_latest_timestamps(self) -> dict[str, datetime]: ...
+    def load_latest_timestamps(self, appids: Collection[str] | None = None) -> dict[str, datetime]: ...
     def update_latest_timestamps(self, updates: dict[str, datetime]) -> None: ...
 
 
@@ -38,31 +39,56 @@ class PostgresDbClient(DbClient):
         return f"PostgresDbClient(table={self._table})"
 
     def update_latest_timestamps(self, updates: dict[str, datetime]) -> None:
+        """Stage updates with COPY and merge them in a single upsert, one round trip per statement"""
         if not updates:
             return
-        sql = f"""
-                    INSERT INTO {self._table} (game_id, last_processed_timestamp)
-                    VALUES (%s, %s)
-                    ON CONFLICT (game_id)
-                    DO UPDATE SET last_processed_timestamp = EXCLUDED.last_processed_timestamp
-                """
-        rows = [(k, v) for k, v in updates.items()]
-        with self._conn.cursor() as cur:
-            cur.executemany(sql, rows)
+        staging = f"{self._table}_staging"
+        try:
+            self._stage_and_merge(staging, updates)
+        except psycopg.Error:
+            self._conn.rollback()  # leave the connection usable for the next flush
+            raise
         self._conn.commit()
 
-    def load_latest_timestamps(self) -> dict[str, datetime]:
-        sql = f"SELECT game_id, last_processed_timestamp FROM {self._table}"
-        out: dict[str, datetime] = {}
+    def _stage_and_merge(self, staging: str, updates: dict[str, datetime]) -> None:
         with self._conn.cursor() as cur:
-            cur.execute(sql)
-            for game_id, ts in cur.fetchall():
-                if ts is not None:
-                    out[str(game_id)] = ts.replace(tzinfo=UTC)
+            cur.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {staging} (
+                    game_id INTEGER,
+                    last_processed_timestamp TIMESTAMP
+                ) ON COMMIT DELETE ROWS
+            """)
+            with cur.copy(f"COPY {staging} (game_id, last_processed_timestamp) FROM STDIN") as copy:
+                for appid, ts in updates.items():
+                    # Stored as naive UTC, see load_latest_timestamps
+                    copy.write_row((int(appid), ts.astimezone(UTC).replace(tzinfo=None)))
+            cur.execute(f"""
+                INSERT INTO {self._table} (game_id, last_processed_timestamp)
+                SELECT game_id, last_processed_timestamp FROM {staging}
+                ON CONFLICT (game_id)
+                DO UPDATE SET last_processed_timestamp = EXCLUDED.last_processed_timestamp
+            """)
+
+    def load_latest_timestamps(self, appids: Collection[str] | None = None) -> dict[str, datetime]:
+        sql = f"SELECT game_id, last_processed_timestamp FROM {self._table} WHERE last_processed_timestamp IS NOT NULL"
+        params = None
+        if appids is not None:  # only this slice of games, e.g. a shard
+            sql += " AND game_id = ANY(%s)"
+            params = ([int(appid) for appid in appids],)
+        out: dict[str, datetime] = {}
+        # Server-side cursor: rows are streamed in chunks of `itersize` instead of buffered all at once
+        with self._conn.cursor(name=f"load_{self._table}") as cur:
+            cur.itersize = 10_000
+            cur.execute(sql, params)
+            for game_id, ts in cur:
+                out[str(game_id)] = ts.replace(tzinfo=UTC)
+        self._conn.commit()  # named cursors live in a transaction, don't leave it idle
         return out
 
 
 class FirestoreDbClient(DbClient):
+    MAX_BATCH_WRITES = 500  # Firestore rejects batches with more writes
+
     def __init__(self, client: firestore.Client, collection: str = "games"):
         os.environ["FIRESTORE_EMULATOR_HOST"] = os.environ.get("FIRESTORE_EMULATOR_HOST", "localhost:8080")
         self._client = client
@@ -78,15 +104,21 @@ class FirestoreDbClient(DbClient):
         return f"FirestoreDbClient(collection={self._collection})"
 
     def update_latest_timestamps(self, updates: dict[str, datetime]) -> None:
-        batch = self._client.batch()  # changes
-        for appid, timestamp in updates.items():
-            doc_ref = self._collection.document(appid)
-            batch.set(doc_ref, {"latest_timestamp": timestamp}, merge=True)
-        batch.commit()
-
-    def load_latest_timestamps(self) -> dict[str, datetime]:
+        items = list(updates.items())
+        for start in range(0, len(items), self.MAX_BATCH_WRITES):
+            batch = self._client.batch()  # changes
+            for appid, timestamp in items[start:start + self.MAX_BATCH_WRITES]:
+                doc_ref = self._collection.document(appid)
+                batch.set(doc_ref, {"latest_timestamp": timestamp}, merge=True)
+            batch.commit()
+
+    def load_latest_timestamps(self, appids: Collection[str] | None = None) -> dict[str, datetime]:
         out: dict[str, datetime] = {}
-        for doc in self._collection.stream():
+        if appids is None:
+            docs = self._collection.stream()
+        else:  # only this slice of games, e.g. a shard
+            docs = self._client.get_all([self._collection.document(appid) for appid in appids])
+        for doc in docs:
             data = doc.to_dict() or {}
             ts = data.get("latest_timestamp")
             if ts:
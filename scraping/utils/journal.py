@@ -0,0 +1,107 @@
+import logging
+import os
+import sqlite3
+from collections.abc import Iterable
+from datetime import datetime, UTC
+from enum import StrEnum
+
+
+class Status(StrEnum):
+    FETCHED = "fetched"  # parsed and buffered, not durable yet
+    WRITTEN = "written"  # committed to a Parquet file
+    SKIPPED = "skipped"  # fetched, but nothing to write
+    FAILED = "failed"  # retries exhausted
+
+
+DONE_STATUSES = (Status.WRITTEN, Status.SKIPPED)
+
+
+class ScrapeJournal:
+    """
+    Durable progress journal for a scraping job, kept in a local SQLite file (WAL mode).
+    A run stays open until `finish_run()`, so a crashed run is resumed by the next invocation:
+    written and skipped ids are not requested again, failed and fetched-but-unwritten ids are.
+    """
+
+    def __init__(self, path: str, job: str):
+        self.logger = logging.getLogger(__name__ + ".ScrapeJournal")
+        self.path = path
+        self.job = job
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # durable across process crashes, cheap commits
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS progress (
+                run_id INTEGER NOT NULL REFERENCES runs(run_id),
+                appid TEXT NOT NULL,
+                status TEXT NOT NULL,
+                failures INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, appid)
+            );
+        """)
+        self.run_id: int | None = None
+
+    @classmethod
+    def from_env(cls, job: str):
+        return cls(path=os.getenv("SCRAPE_JOURNAL_PATH", "../data/scrape_journal.sqlite"), job=job)
+
+    def __str__(self):
+        return f"ScrapeJournal(path={self.path}, job={self.job}, run_id={self.run_id})"
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def start_run(self) -> int:
+        """Resume the latest unfinished run of the job, or open a new one"""
+        row = self._conn.execute("SELECT run_id FROM runs WHERE job = ? AND finished_at IS NULL "
+                                 "ORDER BY run_id DESC LIMIT 1", (self.job,)).fetchone()
+        if row:
+            self.run_id = row[0]
+            self.logger.info(f"Resuming unfinished run {self.run_id} of {self.job}")
+        else:
+            with self._conn:
+                cur = self._conn.execute("INSERT INTO runs (job, started_at) VALUES (?, ?)",
+                                         (self.job, datetime.now(UTC).isoformat()))
+            self.run_id = cur.lastrowid
+            self.logger.info(f"Started run {self.run_id} of {self.job}")
+        return self.run_id
+
+    def finish_run(self) -> None:
+        with self._conn:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                               (datetime.now(UTC).isoformat(), self.run_id))
+
+    def mark(self, appid: str, status: Status, error: str | None = None) -> None:
+        self.mark_many([appid], status, error)
+
+    def mark_many(self, appids: Iterable[str], status: Status, error: str | None = None) -> None:
+        now = datetime.now(UTC).isoformat()
+        with self._conn:
+            self._conn.executemany("""
+                INSERT INTO progress (run_id, appid, status, failures, error, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id, appid) DO UPDATE SET status = excluded.status, error = excluded.error,
+                    updated_at = excluded.updated_at, failures = progress.failures + excluded.failures
+            """, [(self.run_id, str(appid), str(status), int(status == Status.FAILED), error, now)
+                  for appid in appids])
+
+    def statuses(self) -> dict[str, str]:
+        rows = self._conn.execute("SELECT appid, status FROM progress WHERE run_id = ?", (self.run_id,))
+        return dict(rows.fetchall())
+
+    def done(self) -> set[str]:
+        """Ids that need no further work in the current run"""
+        return {appid for appid, status in self.statuses().items() if status in DONE_STATUSES}
+
+    def summary(self) -> dict[str, int]:
+        rows = self._conn.execute("SELECT status, COUNT(*) FROM progress WHERE run_id = ? GROUP BY status",
+                                  (self.run_id,))
+        return dict(rows.fetchall())
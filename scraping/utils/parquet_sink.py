@@ -0,0 +1,213 @@
+import logging
+import os
+from collections.abc import Callable
+from urllib.parse import urlsplit
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+# Partitions of the raw lake: `{base}/scrape_date=YYYY-MM-DD/appid_bucket=N/`, read with `hive_partitioning`
+APPID_BUCKETS = 8
+# Suffix of files still being written, which the `*.parquet` globs of the views never match
+IN_PROGRESS_SUFFIX = ".inprogress"
+
+
+def make_filesystem(uri: str) -> tuple[fs.FileSystem, str]:
+    """Resolve `s3://bucket/prefix` to the MinIO filesystem, anything else to the local filesystem"""
+    if uri.startswith("s3://"):
+        endpoint = urlsplit(os.environ.get("MINIO_ENDPOINT_URL", "http://localhost:9000"))
+        s3 = fs.S3FileSystem(access_key=os.environ.get("AWS_ACCESS_KEY_ID", "minioadmin"),
+                             secret_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "minioadmin"),
+                             region="us-east-1",
+                             endpoint_override=endpoint.netloc,
+                             scheme=endpoint.scheme or "http")
+        return s3, uri.removeprefix("s3://").rstrip("/")
+    return fs.LocalFileSystem(), os.path.abspath(uri)
+
+
+class ParquetSink:
+    """
+    Streams row groups into an open Parquet writer, rolling to a new file by row count or size.
+    Memory is bounded by one row group. On S3, the file is uploaded in parts as row groups are written.
+    A file is written under a temporary name and moved to its final path once finalized, so readers never see a
+    file without its footer, even after a crash. `on_commit(path)` runs then, once its rows are durable.
+    """
+
+    def __init__(self, base_uri: str, file_prefix: str, schema: dict[str, pl.DataType],
+                 max_rows_per_file: int = 100_000, max_bytes_per_file: int = 256 * 1024 * 1024,
+                 filesystem: fs.FileSystem | None = None, on_commit: Callable[[str], None] | None = None):
+        self.logger = logging.getLogger(__name__ + ".ParquetSink")
+        if filesystem is None:
+            self._fs, self._base_path = make_filesystem(base_uri)
+        else:
+            self._fs, self._base_path = filesystem, base_uri
+        self.file_prefix = file_prefix
+        self.arrow_schema = pl.DataFrame(schema=schema).to_arrow().schema
+        self.max_rows_per_file = max_rows_per_file
+        self.max_bytes_per_file = max_bytes_per_file
+        self.on_commit = on_commit
+        self.committed_files: list[str] = []
+
+        self._file_num = 0
+        self._path: str | None = None
+        self._stream: pa.NativeFile | None = None
+        self._writer: pq.ParquetWriter | None = None
+        self._rows_in_file = 0
+
+    def __enter__(self) -> "ParquetSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _open(self) -> None:
+        if isinstance(self._fs, fs.LocalFileSystem):
+            self._fs.create_dir(self._base_path, recursive=True)
+        # Never overwrite files from an earlier run with the same prefix (e.g. a rerun on the same day)
+        while True:
+            self._path = f"{self._base_path}/{self.file_prefix}_{self._file_num}.parquet"
+            self._file_num += 1
+            if self._fs.get_file_info(self._path).type == fs.FileType.NotFound:
+                break
+        self._stream = self._fs.open_output_stream(self._path + IN_PROGRESS_SUFFIX)
+        self._writer = pq.ParquetWriter(self._stream, self.arrow_schema)
+        self._rows_in_file = 0
+
+    def write(self, df: pl.DataFrame) -> None:
+        """Append `df` to the current file as one row group, rolling the file when it is full"""
+        if df.is_empty():
+            return
+        if self._writer is None:
+            self._open()
+        table = df.to_arrow().select(self.arrow_schema.names).cast(self.arrow_schema)
+        self._writer.write_table(table, row_group_size=len(table))
+        self._rows_in_file += len(table)
+        if self._rows_in_file >= self.max_rows_per_file or self._stream.tell() >= self.max_bytes_per_file:
+            self.roll()
+
+    def roll(self) -> None:
+        """Finalize the current file. The next write opens a new one"""
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._stream.close()
+        path, rows = self._path, self._rows_in_file
+        self._fs.move(path + IN_PROGRESS_SUFFIX, path)  # a rename locally, a copy then a delete on S3
+        self._writer, self._stream, self._path = None, None, None
+        self.committed_files.append(path)
+        self.logger.info(f"Committed {rows} rows to {path}")
+        if self.on_commit is not None:
+            self.on_commit(path)
+
+    def close(self) -> None:
+        self.roll()
+
+
+def appid_bucket(appid: pl.Expr) -> pl.Expr:
+    # Steam appids mostly step by 10: drop the last digit or half the buckets stay empty
+    return (appid // 10 % APPID_BUCKETS).alias("appid_bucket")
+
+
+def partition_path(base_path: str, scrape_date, bucket: int) -> str:
+    return f"{base_path}/scrape_date={scrape_date}/appid_bucket={bucket}"
+
+
+class PartitionedParquetSink:
+    """
+    Streams rows into a `scrape_date=/appid_bucket=` partitioned dataset, with one ParquetSink per partition.
+    Every partition rolls together once `max_rows_per_file` rows were written, so `on_commit(paths)` still marks
+    the point where all rows written so far are durable, the paths of the files committed being comma separated.
+    """
+
+    def __init__(self, base_uri: str, file_prefix: str, schema: dict[str, pl.DataType],
+                 max_rows_per_file: int = 100_000, max_bytes_per_file: int = 256 * 1024 * 1024,
+                 filesystem: fs.FileSystem | None = None, on_commit: Callable[[str], None] | None = None):
+        if filesystem is None:
+            self._fs, self._base_path = make_filesystem(base_uri)
+        else:
+            self._fs, self._base_path = filesystem, base_uri
+        self.file_prefix = file_prefix
+        self.schema = schema
+        self.max_rows_per_file = max_rows_per_file
+        self.max_bytes_per_file = max_bytes_per_file
+        self.on_commit = on_commit
+        self._sinks: dict[tuple, ParquetSink] = {}
+        self._rows_since_commit = 0
+        self._committed = 0
+
+    def __enter__(self) -> "PartitionedParquetSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def committed_files(self) -> list[str]:
+        return [path for sink in self._sinks.values() for path in sink.committed_files]
+
+    def write(self, df: pl.DataFrame) -> None:
+        """Split `df` by partition and append each part to its partition's file"""
+        if df.is_empty():
+            return
+        parts = df.with_columns(appid_bucket(pl.col("appid"))).partition_by("scrape_date", "appid_bucket",
+                                                                             as_dict=True)
+        for (scrape_date, bucket), part in parts.items():
+            sink = self._sinks.get((scrape_date, bucket))
+            if sink is None:
+                # A partition only rolls on its own past the byte limit: committing early is harmless
+                sink = ParquetSink(partition_path(self._base_path, scrape_date, bucket), self.file_prefix, self.schema,
+                                   max_rows_per_file=self.max_rows_per_file, max_bytes_per_file=self.max_bytes_per_file,
+                                   filesystem=self._fs)
+                self._sinks[(scrape_date, bucket)] = sink
+            sink.write(part)  # `appid_bucket` is not in the schema: it is only stored in the path
+        self._rows_since_commit += len(df)
+        if self._rows_since_commit >= self.max_rows_per_file:
+            self.roll()
+
+    def roll(self) -> None:
+        """Finalize the open file of every partition"""
+        for sink in self._sinks.values():
+            sink.roll()
+        committed = self.committed_files
+        paths, self._committed = committed[self._committed:], len(committed)
+        self._rows_since_commit = 0
+        if paths and self.on_commit is not None:
+            self.on_commit(",".join(paths))
+
+    def close(self) -> None:
+        self.roll()
+
+
+def list_partitions(filesystem: fs.FileSystem, base_path: str, scrape_date: str | None = None) -> list[str]:
+    """Paths of the `appid_bucket=` partitions, of every date or only `scrape_date`"""
+    date_dirs = [f"{base_path}/scrape_date={scrape_date}"] if scrape_date else [
+        info.path for info in filesystem.get_file_info(fs.FileSelector(base_path, allow_not_found=True))
+        if info.type == fs.FileType.Directory and info.base_name.startswith("scrape_date=")]
+    return sorted(info.path for date_dir in date_dirs
+                  for info in filesystem.get_file_info(fs.FileSelector(date_dir, allow_not_found=True))
+                  if info.type == fs.FileType.Directory and info.base_name.startswith("appid_bucket="))
+
+
+def list_parquet_files(filesystem: fs.FileSystem, base_path: str, name_prefix: str = "") -> list[str]:
+    selector = fs.FileSelector(base_path, allow_not_found=True)
+    return sorted(info.path for info in filesystem.get_file_info(selector)
+                  if info.type == fs.FileType.File and info.base_name.startswith(name_prefix)
+                  and info.base_name.endswith(".parquet"))
+
+
+def merge_parquet_files(filesystem: fs.FileSystem, paths: list[str], sink: ParquetSink,
+                        row_group_size: int = 10_000) -> None:
+    """
+    Stream `paths` into `sink` row group by row group, then delete them.
+    Inputs are only deleted once every merged file is committed, so a crash leaves duplicates, never gaps.
+    """
+    for path in paths:
+        with filesystem.open_input_file(path) as f:
+            for batch in pq.ParquetFile(f).iter_batches(batch_size=row_group_size):
+                sink.write(pl.from_arrow(batch))
+    sink.close()
+    for path in paths:
+        if path not in sink.committed_files:
+            filesystem.delete_file(path)
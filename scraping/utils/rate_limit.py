@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimiterStats:
+    host: str
+    configured_rate: float
+    current_rate: float
+    requests: int
+    throttled: int
+    elapsed: float
+
+    @property
+    def achieved_rate(self) -> float:
+        return self.requests / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.host}: {self.requests} requests in {self.elapsed:.1f}s "
+                f"({self.achieved_rate:.2f} req/s achieved vs {self.configured_rate:.2f} req/s quota, "
+                f"{self.throttled} throttled responses)")
+
+
+class TokenBucket:
+    """
+    Async token bucket shared by every task hitting the same host.
+    Backs off multiplicatively on throttling (429/5xx) and recovers additively on success.
+    """
+
+    def __init__(self, host: str, rate: float, capacity: int | None = None, min_rate: float = 0.1,
+                 max_backoff: float = 120.0):
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}")
+        self.logger = logging.getLogger(__name__ + ".TokenBucket")
+        self.host = host
+        self.configured_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.min_rate = min(min_rate, rate)
+        self.max_backoff = max_backoff
+
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self._lock = asyncio.Lock()
+
+        self._started_at: float | None = None
+        self._requests = 0
+        self._throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        """Wait until a request is allowed by the bucket"""
+        async with self._lock:  # FIFO fairness between waiting tasks
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        self._requests += 1
+
+    def on_throttle(self, retry_after: float | None = None) -> float:
+        """Halve the rate and pause the host. Returns the applied pause in seconds"""
+        self._throttled += 1
+        self._consecutive_throttles += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        delay = retry_after if retry_after is not None else min(self.max_backoff, 2 ** self._consecutive_throttles)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self._tokens = 0.0
+        self.logger.warning(f"Throttled by {self.host}. Pausing {delay:.1f}s, rate lowered to {self.rate:.2f} req/s")
+        return delay
+
+    def on_success(self) -> None:
+        """Additively recover the rate towards the configured quota"""
+        self._consecutive_throttles = 0
+        if self.rate < self.configured_rate:
+            self.rate = min(self.configured_rate, self.rate + self.configured_rate / 20)
+
+    def stats(self) -> RateLimiterStats:
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        return RateLimiterStats(host=self.host,
+                                configured_rate=self.configured_rate,
+                                current_rate=self.rate,
+                                requests=self._requests,
+                                throttled=self._throttled,
+                                elapsed=elapsed)
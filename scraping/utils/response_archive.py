@@ -0,0 +1,175 @@
+import functools
+import json
+import logging
+import os
+from datetime import datetime, UTC
+
+import zstandard
+
+READ_SIZE = 1 << 20  # bytes read at a time when indexing an archive file
+
+
+def _archive_path() -> str:
+    return os.getenv("RESPONSE_ARCHIVE_PATH", "../data/response_archive")
+
+
+class ResponseNotArchived(KeyError):
+    """Replay asked for a response the archive does not have"""
+
+
+class ResponseArchive:
+    """
+    Append-only archive of raw Steam API responses, as zstd-compressed JSON lines.
+    One file per endpoint, day and scope (e.g. the shard) at `{path}/{endpoint}/{date}/{scope}.jsonl.zst`.
+    Buffered records are written as one zstd frame, so a crash loses at most the last `flush_every` responses.
+    """
+
+    def __init__(self, path: str, scope: str = "default", level: int = 3, flush_every: int = 256):
+        self.logger = logging.getLogger(__name__ + ".ResponseArchive")
+        self.path = path
+        self.scope = scope
+        self.flush_every = flush_every
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._buffers: dict[tuple[str, str], list[str]] = {}  # (endpoint, date) -> lines
+        self.responses = 0
+        self.bytes_written = 0
+
+    @classmethod
+    def from_env(cls, scope: str = "default"):
+        return cls(path=_archive_path(), scope=scope)
+
+    def __str__(self):
+        return f"ResponseArchive(path={self.path}, scope={self.scope})"
+
+    def __enter__(self) -> "ResponseArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, endpoint: str, appid: str, key: str, body: str) -> None:
+        """Archive the raw `body` of a response, `key` telling apart the requests of one app (e.g. the cursor)"""
+        fetched_at = datetime.now(UTC)
+        line = json.dumps({"appid": str(appid), "key": key, "fetched_at": fetched_at.isoformat(), "body": body})
+        buffer = self._buffers.setdefault((endpoint, str(fetched_at.date())), [])
+        buffer.append(line)
+        self.responses += 1
+        if len(buffer) >= self.flush_every:
+            self._write_frame(endpoint, str(fetched_at.date()))
+
+    def _write_frame(self, endpoint: str, date: str) -> None:
+        lines = self._buffers.pop((endpoint, date), [])
+        if not lines:
+            return
+        directory = os.path.join(self.path, endpoint, date)
+        os.makedirs(directory, exist_ok=True)
+        frame = self._compressor.compress(("\n".join(lines) + "\n").encode())
+        # Concatenated zstd frames form a valid zstd file, so appending never rewrites what is there
+        with open(os.path.join(directory, f"{self.scope}.jsonl.zst"), "ab") as f:
+            f.write(frame)
+        self.bytes_written += len(frame)
+
+    def flush(self) -> None:
+        for endpoint, date in list(self._buffers):
+            self._write_frame(endpoint, date)
+
+    def close(self) -> None:
+        self.flush()
+        self.logger.info(f"Archived {self.responses} responses, {self.bytes_written / 1e6:.2f} MB compressed")
+
+
+class ArchiveReplay:
+    """
+    Serves archived responses in place of the Steam API. With several responses for the same request,
+    the most recent one wins. `scrape_date` restricts the replay to the responses archived that day.
+    Only an index of the archive is kept in memory: a response is decompressed with its frame when asked for,
+    the last `cached_frames` frames staying decompressed for the requests that follow.
+    """
+
+    def __init__(self, path: str, endpoints: tuple[str, ...], scrape_date: str | None = None,
+                 cached_frames: int = 8):
+        self.logger = logging.getLogger(__name__ + ".ArchiveReplay")
+        self.path = path
+        self.scrape_date = scrape_date
+        self._files: list[str] = []
+        # (endpoint, appid, key) -> (file, offset, size) of the frame holding the response
+        self._index: dict[tuple[str, str, str], tuple[int, int, int]] = {}
+        self._appids: dict[str, set[str]] = {}
+        self._frame = functools.lru_cache(maxsize=cached_frames)(self._read_frame)
+        self.hits = 0
+        self.misses = 0
+        for endpoint in endpoints:
+            self._load(endpoint)
+        self.logger.info(f"Indexed {len(self._index)} archived responses from {path}")
+
+    @classmethod
+    def from_env(cls, endpoints: tuple[str, ...], scrape_date: str | None = None):
+        return cls(path=_archive_path(), endpoints=endpoints, scrape_date=scrape_date)
+
+    def __len__(self):
+        return len(self._index)
+
+    def _load(self, endpoint: str) -> None:
+        endpoint_path = os.path.join(self.path, endpoint)
+        if not os.path.isdir(endpoint_path):
+            return
+        dates = [self.scrape_date] if self.scrape_date else sorted(os.listdir(endpoint_path))
+        for date in dates:
+            date_path = os.path.join(endpoint_path, date)
+            if not os.path.isdir(date_path):
+                continue
+            for name in sorted(os.listdir(date_path)):
+                if name.endswith(".jsonl.zst"):
+                    self._load_file(endpoint, os.path.join(date_path, name))
+
+    def _load_file(self, endpoint: str, file_path: str) -> None:
+        """Index the responses of every frame, one frame in memory at a time"""
+        file = len(self._files)
+        self._files.append(file_path)
+        appids = self._appids.setdefault(endpoint, set())
+        with open(file_path, "rb") as f:
+            offset, data = 0, b""
+            while True:
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+                chunks, size = [], 0
+                try:
+                    while not decompressor.eof:
+                        data = data or f.read(READ_SIZE)
+                        if not data:
+                            break
+                        chunks.append(decompressor.decompress(data))
+                        size += len(data) - len(decompressor.unused_data)
+                        data = decompressor.unused_data
+                    if not decompressor.eof:
+                        if size:  # a frame cut short by a crash: everything before it is still served
+                            self.logger.warning(f"Stopped reading {file_path} at a truncated frame")
+                        return
+                    records = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+                    for record in records:
+                        self._index[(endpoint, record["appid"], record["key"])] = (file, offset, size)
+                        appids.add(record["appid"])
+                except (zstandard.ZstdError, json.JSONDecodeError) as e:
+                    self.logger.warning(f"Stopped reading {file_path} at a corrupt frame: {e}")
+                    return
+                offset += size
+
+    def _read_frame(self, file: int, offset: int, size: int) -> dict[tuple[str, str], str]:
+        with open(self._files[file], "rb") as f:
+            f.seek(offset)
+            frame = zstandard.ZstdDecompressor().decompressobj().decompress(f.read(size))
+        bodies = {}
+        for line in frame.decode("utf-8").splitlines():
+            record = json.loads(line)
+            bodies[(record["appid"], record["key"])] = record["body"]
+        return bodies
+
+    def get(self, endpoint: str, appid: str, key: str) -> dict:
+        location = self._index.get((endpoint, str(appid), key))
+        if location is None:
+            self.misses += 1
+            raise ResponseNotArchived(f"No archived {endpoint} response for app {appid} ({key})")
+        self.hits += 1
+        return json.loads(self._frame(*location)[(str(appid), key)])
+
+    def appids(self, endpoint: str) -> list[str]:
+        return sorted(self._appids.get(endpoint, ()), key=int)
@@ -1,29 +1,278 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import httpx
 import polars as pl
 import requests
+from requests.adapters import HTTPAdapter
+
+from utils.rate_limit import TokenBucket
+from utils.response_archive import ArchiveReplay, ResponseArchive
+
+STEAM_STORE_URL = os.getenv("STEAM_STORE_URL", "https://store.steampowered.com")
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+DEFAULT_HEADERS = {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+# Same query as the first page of reviews, without the reviews themselves
+REVIEW_SUMMARY_PARAMS = {"json": "1", "filter": "recent", "language": "all", "num_per_page": "0"}
+REVIEW_SUMMARY_ARCHIVE_KEY = "summary"
+
+
+@dataclass(frozen=True, slots=True)
+class HttpConfig:
+    connect_timeout: float = 10.0
+    read_timeout: float = 30.0
+    pool_size: int = 16  # max keep-alive connections per host
+
+    @classmethod
+    def from_env(cls) -> "HttpConfig":
+        return cls(connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+                   read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+                   pool_size=int(os.getenv("HTTP_POOL_SIZE", "16")))
+
+
+@dataclass(slots=True)
+class HttpStats:
+    requests: int = 0
+    connections_opened: int = 0
+    bytes_received: int = 0  # on the wire, before decompression
+    bytes_decoded: int = 0
+
+    @property
+    def connections_reused(self) -> int:
+        return max(0, self.requests - self.connections_opened)
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.bytes_decoded / self.bytes_received if self.bytes_received else 0.0
+
+    def __str__(self):
+        return (f"{self.requests} requests over {self.connections_opened} connections "
+                f"({self.connections_reused} reused), {self.bytes_received / 1e6:.2f} MB received "
+                f"({self.bytes_decoded / 1e6:.2f} MB decoded, x{self.compression_ratio:.1f} compression)")
+
+
+class SteamSession:
+    """Pooled keep-alive session shared by every blocking Steam API call"""
+
+    def __init__(self, config: HttpConfig | None = None):
+        self.config = config or HttpConfig.from_env()
+        self._stats = HttpStats()
+        self._adapter = HTTPAdapter(pool_connections=self.config.pool_size, pool_maxsize=self.config.pool_size)
+        self._session = requests.Session()
+        self._session.headers.update(DEFAULT_HEADERS)
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+
+    def get(self, url: str, params: dict | None = None) -> requests.Response:
+        response = self._session.get(url, params=params,
+                                     timeout=(self.config.connect_timeout, self.config.read_timeout))
+        self._stats.requests += 1
+        self._stats.bytes_received += response.raw.tell()  # compressed bytes read from the socket
+        self._stats.bytes_decoded += len(response.content)
+        return response
+
+    def stats(self) -> HttpStats:
+        pools = self._adapter.poolmanager.pools
+        self._stats.connections_opened = sum(pools[key].num_connections for key in pools.keys())
+        return self._stats
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_session: SteamSession | None = None
+_archive: ResponseArchive | None = None
+_replay: ArchiveReplay | None = None
+
+
+def get_session() -> SteamSession:
+    global _session
+    if _session is None:
+        _session = SteamSession()
+    return _session
+
+
+def http_stats() -> HttpStats:
+    return get_session().stats()
+
+
+def use_response_archive(archive: ResponseArchive | None = None, replay: ArchiveReplay | None = None) -> None:
+    """Archive the raw responses of `get_app_data` and `get_app_reviews`, or serve them from a replayed archive"""
+    global _archive, _replay
+    _archive, _replay = archive, replay
+
+
+def reviews_archive_key(filt: str, cursor: str) -> str:
+    return f"{filt}/{cursor}"
 
 
 def get_app_data(appid: str):
-    response = requests.get("https://store.steampowered.com/api/appdetails", params={"appids": appid, "l": "english"})
+    if _replay is not None:
+        return _replay.get("appdetails", appid, "")
+    response = get_session().get(f"{STEAM_STORE_URL}/api/appdetails", params={"appids": appid, "l": "english"})
     response.raise_for_status()
+    if _archive is not None:
+        _archive.append("appdetails", appid, "", response.text)
     return response.json()
 
 
 def get_app_reviews(appid: str, filt: str, cursor: str = "*"):
-    response = requests.get(f"https://store.steampowered.com/appreviews/{appid}",
-                            params={"json": "1",
-                                    "filter": filt,
-                                    "language": "all",
-                                    "cursor": cursor,
-                                    "num_per_page": "100"})
+    if _replay is not None:
+        return _replay.get("appreviews", appid, reviews_archive_key(filt, cursor))
+    response = get_session().get(f"{STEAM_STORE_URL}/appreviews/{appid}",
+                                 params={"json": "1",
+                                         "filter": filt,
+                                         "language": "all",
+                                         "cursor": cursor,
+                                         "num_per_page": "100"})
     response.raise_for_status()
+    if _archive is not None:
+        _archive.append("appreviews", appid, reviews_archive_key(filt, cursor), response.text)
+    return response.json()
+
+
+def get_review_summary(appid: str) -> dict:
+    """Only the `query_summary` of an app's reviews (`num_per_page=0`): scores and counts without review texts"""
+    if _replay is not None:
+        return _replay.get("appreviews", appid, REVIEW_SUMMARY_ARCHIVE_KEY)
+    response = get_session().get(f"{STEAM_STORE_URL}/appreviews/{appid}", params=REVIEW_SUMMARY_PARAMS)
+    response.raise_for_status()
+    if _archive is not None:
+        _archive.append("appreviews", appid, REVIEW_SUMMARY_ARCHIVE_KEY, response.text)
     return response.json()
 
 
 def download_all_steam_games():
     url = "https://api.steampowered.com/ISteamApps/GetAppList/v0002?skip_unvetted_apps=false"
-    response = requests.get(url)
+    response = get_session().get(url)
     data = response.json()["applist"]["apps"]
     df = pl.DataFrame(data)
     df = df.unique(subset=["appid", "name"])
     df = df.replace_column(1, df["name"].str.strip_chars())
     return df
+
+
+class AsyncSteamClient:
+    """Concurrent Steam store client. Every request goes through the token bucket of its host"""
+
+    def __init__(self, requests_per_second: float = 4.0, config: HttpConfig | None = None, max_retries: int = 5,
+                 base_url: str = STEAM_STORE_URL, archive: ResponseArchive | None = None):
+        self.logger = logging.getLogger(__name__ + ".AsyncSteamClient")
+        self.config = config or HttpConfig.from_env()
+        self.base_url = base_url
+        self.archive = archive
+        self.max_retries = max_retries
+        self._requests_per_second = requests_per_second
+        self._limiters: dict[str, TokenBucket] = {}
+        self._stats = HttpStats()
+        self._connections: set[int] = set()
+        self._client = httpx.AsyncClient(headers=DEFAULT_HEADERS,
+                                         limits=httpx.Limits(max_connections=self.config.pool_size,
+                                                             max_keepalive_connections=self.config.pool_size),
+                                         timeout=httpx.Timeout(self.config.read_timeout,
+                                                               connect=self.config.connect_timeout))
+
+    async def __aenter__(self) -> "AsyncSteamClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def limiter(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = TokenBucket(host=host, rate=self._requests_per_second)
+        return self._limiters[host]
+
+    def limiters(self) -> list[TokenBucket]:
+        return list(self._limiters.values())
+
+    def stats(self) -> HttpStats:
+        self._stats.connections_opened = len(self._connections)
+        return self._stats
+
+    def _record(self, response: httpx.Response) -> None:
+        self._stats.requests += 1
+        self._stats.bytes_received += response.num_bytes_downloaded
+        self._stats.bytes_decoded += len(response.content)
+        stream = response.extensions.get("network_stream")
+        if stream is not None:
+            self._connections.add(id(stream))
+
+    async def get_json(self, url: str, params: dict) -> dict:
+        return (await self.get(url, params)).json()
+
+    async def get(self, url: str, params: dict) -> httpx.Response:
+        """GET with rate limiting and adaptive backoff on throttling and transient errors"""
+        limiter = self.limiter(url)
+        for attempt in range(self.max_retries):
+            await limiter.acquire()
+            try:
+                response = await self._client.get(url, params=params)
+                self._record(response)
+            except httpx.TransportError as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                self.logger.warning(f"Transport error on {url}: {e}. Retrying...")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries - 1:
+                retry_after = response.headers.get("Retry-After")
+                # Pauses the whole host, so the next acquire() waits for the backoff
+                limiter.on_throttle(float(retry_after) if retry_after and retry_after.isdigit() else None)
+                continue
+            response.raise_for_status()
+            limiter.on_success()
+            return response
+        raise RuntimeError(f"Exhausted {self.max_retries} retries for {url}")
+
+    async def get_app_reviews(self, appid: str, filt: str, cursor: str = "*") -> dict:
+        response = await self.get(f"{self.base_url}/appreviews/{appid}",
+                                  params={"json": "1",
+                                          "filter": filt,
+                                          "language": "all",
+                                          "cursor": cursor,
+                                          "num_per_page": "100"})
+        if self.archive is not None:
+            self.archive.append("appreviews", appid, reviews_archive_key(filt, cursor), response.text)
+        return response.json()
+
+    async def get_review_summary(self, appid: str) -> dict:
+        response = await self.get(f"{self.base_url}/appreviews/{appid}", params=REVIEW_SUMMARY_PARAMS)
+        if self.archive is not None:
+            self.archive.append("appreviews", appid, REVIEW_SUMMARY_ARCHIVE_KEY, response.text)
+        return response.json()
+
+
+class ReplaySteamClient:
+    """Drop-in for `AsyncSteamClient` serving archived responses: no network, no rate limiting"""
+
+    def __init__(self, replay: ArchiveReplay):
+        self.replay = replay
+
+    async def __aenter__(self) -> "ReplaySteamClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        pass
+
+    def limiters(self) -> list[TokenBucket]:
+        return []
+
+    def stats(self) -> HttpStats:
+        return HttpStats(requests=self.replay.hits)
+
+    async def get_app_reviews(self, appid: str, filt: str, cursor: str = "*") -> dict:
+        return self.replay.get("appreviews", appid, reviews_archive_key(filt, cursor))
+
+    async def get_review_summary(self, appid: str) -> dict:
+        return self.replay.get("appreviews", appid, REVIEW_SUMMARY_ARCHIVE_KEY)
@@ -1,21 +1,149 @@
+import html
+import os
 import re
-from bs4 import BeautifulSoup
+from collections import Counter
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Removed along with everything inside them
+TAGS_TO_DELETE = frozenset({"source", "img", "video", "picture", "a", "sup", "hr", "br", "style"})
+# Closed right after being opened, unless written as <tag/> (same as BeautifulSoup's html.parser builder)
+VOID_TAGS = frozenset({"area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image",
+                       "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source",
+                       "spacer", "track", "wbr"})
+# Text directly under these is code or annotation, not content
+STRING_CONTAINER_TAGS = frozenset({"rt", "rp", "style", "script", "template"})
+
+_DECIMAL_REFERENCE_WITH_FOLLOWING_DATA = re.compile("^([0-9]+)(.*)")
+_HEX_REFERENCE_WITH_FOLLOWING_DATA = re.compile("^([0-9a-f]+)(.*)")
+
+
+@lru_cache(maxsize=1024)
+def _dereference_numeric(name: str) -> str:
+    base, digits, pattern = 10, name, _DECIMAL_REFERENCE_WITH_FOLLOWING_DATA
+    if name[:1] in ("x", "X"):
+        base, digits, pattern = 16, name[1:], _HEX_REFERENCE_WITH_FOLLOWING_DATA
+    try:
+        number, extra = int(digits, base), ""
+    except ValueError:
+        match = pattern.search(digits)
+        if match is None:
+            return digits
+        number, extra = int(match[1], base), match[2]
+    # html.unescape drops noncharacters and control characters, which are kept as is
+    return (html.unescape(f"&#{number};") or chr(number)) + extra
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Single pass over the html.parser token stream, keeping the text nodes `clean_and_extract_text` keeps.
+    Mirrors how BeautifulSoup builds its tree from the same tokens: every tag, comment and declaration ends a text node,
+    an end tag closes the most recent open tag with its name, and unmatched end tags are ignored.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.texts: list[str] = []
+        self._data: list[str] = []
+        self._stack: list[str] = []
+        self._open = Counter()
+        self._open_deleted = 0
+        self._containers: list[int] = []  # stack depth of each open string container tag
+        self._already_closed: list[str] = []
+
+    def _end_data(self, keep: bool = True) -> None:
+        if not self._data:
+            return
+        if keep and not self._open_deleted:
+            self.texts.append("".join(self._data))
+        self._data = []
+
+    def _push(self, tag: str) -> None:
+        self._stack.append(tag)
+        self._open[tag] += 1
+        if tag in TAGS_TO_DELETE:
+            self._open_deleted += 1
+        if tag in STRING_CONTAINER_TAGS:
+            self._containers.append(len(self._stack))
+
+    def _pop_to(self, tag: str) -> None:
+        while self._open[tag]:
+            popped = self._stack.pop()
+            self._open[popped] -= 1
+            if popped in TAGS_TO_DELETE:
+                self._open_deleted -= 1
+            if self._containers and self._containers[-1] > len(self._stack):
+                self._containers.pop()
+            if popped == tag:
+                break
+
+    def handle_starttag(self, tag, attrs, handle_empty_element: bool = True):
+        self._end_data(keep=not self._containers)
+        self._push(tag)
+        if tag in VOID_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            self._already_closed.append(tag)  # a later </tag> is redundant
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_endtag(self, tag, check_already_closed: bool = True):
+        if check_already_closed and tag in self._already_closed:
+            self._already_closed.remove(tag)  # not even a text boundary
+            return
+        self._end_data(keep=not self._containers)
+        self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_charref(self, name):
+        self._data.append(_dereference_numeric(name))
+
+    def handle_entityref(self, name):
+        self._data.append(html5.get(name + ";", "&" + name))
+
+    def handle_comment(self, data):
+        self._end_data(keep=not self._containers)
+
+    def handle_decl(self, decl):
+        self._end_data(keep=not self._containers)
+
+    def handle_pi(self, data):
+        self._end_data(keep=not self._containers)
+
+    def unknown_decl(self, data):
+        self._end_data(keep=not self._containers)
+        if data.upper().startswith("CDATA["):  # CDATA is content, even inside string containers
+            self._data.append(data[len("CDATA["):])
+            self._end_data()
+
+    def close(self):
+        super().close()
+        self._end_data(keep=not self._containers)
 
 
 def clean_and_extract_text(html_content: str | None) -> str:
     if not isinstance(html_content, str):
         return ""
-    soup = BeautifulSoup(html_content, "html.parser")
-    tags_to_delete = ["source", "img", "video", "picture", "a", "sup", "hr", "br", "style"]
-    tags_to_unwrap = ["p", "li", "strong", "span", "h2", "ul", "i", "h1", "u", "div", "th", "td", "tr", "table", "ol",
-                      "blockquote", "b", "h6"]
-    for tag_name in tags_to_delete:
-        for tag in soup.find_all(tag_name):
-            tag.decompose()
-
-    for tag_name in tags_to_unwrap:
-        for tag in soup.find_all(tag_name):
-            tag.unwrap()
-    text = soup.get_text(separator=' ', strip=False)
-    normalized_text = re.sub(r"\s+", " ", text).strip()
-    return normalized_text
+    if "<" not in html_content and "&" not in html_content:  # no markup at all
+        return " ".join(html_content.split())
+    extractor = _TextExtractor()
+    extractor.feed(html_content)
+    extractor.close()
+    return " ".join(" ".join(extractor.texts).split())
+
+
+def clean_many(html_contents: Iterable[str | None], processes: int | None = None,
+               chunksize: int = 64) -> list[str]:
+    """Clean a batch of descriptions in a process pool. Small batches are cleaned inline"""
+    html_contents = list(html_contents)
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(html_contents) < 2 * chunksize:
+        return [clean_and_extract_text(html_content) for html_content in html_contents]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(clean_and_extract_text, html_contents, chunksize=chunksize))
@@ -1,16 +1,24 @@
 import logging
 
 
-def create_view_if_not_exists(db_conn, view: str, s3_path: str):
-    if (view,) not in db_conn.sql("SHOW TABLES").fetchall():
+def create_view_if_not_exists(db_conn, view: str, s3_path: str, union_by_name: bool = False,
+                              hive_partitioning: bool = False, replace: bool = False):
+    """
+    `union_by_name` for files written before a column was added, whose missing columns read as null.
+    `hive_partitioning` adds the `key=value` directories of `s3_path` as columns, and lets filters on them skip files.
+    `replace` redefines an existing view, e.g. one still reading the layout from before partitioning.
+    """
+    if replace or (view,) not in db_conn.sql("SHOW TABLES").fetchall():
         db_conn.sql("""SET s3_region='us-east-1';
                     SET s3_url_style='path';
                     SET s3_use_ssl=false;
                     SET s3_endpoint='localhost:9000';
                     SET s3_access_key_id='';
                     SET s3_secret_access_key='';""")
+        options = ", union_by_name=true" if union_by_name else ""
+        options += ", hive_partitioning=true" if hive_partitioning else ""
         db_conn.sql(
-            f"CREATE VIEW {view} AS SELECT * FROM read_parquet('{s3_path}')")
+            f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_parquet('{s3_path}'{options})")
         logging.info(f"Created {view} view")
     else:
         logging.info(f"{view} view already exists. Skipping creation.")
@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import logging
+import re
+import struct
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable
+
+import psycopg
+from openai import AsyncOpenAI
+from psycopg_pool import AsyncConnectionPool
+
+# Embeds a batch of texts in one provider call, in order
+EmbedFn = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+def normalize_query(text: str) -> str:
+    """Case, Unicode forms and spacing do not change what a query asks for"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+def openai_embeddings(client: AsyncOpenAI, model: str) -> EmbedFn:
+    async def embed(texts: list[str]) -> list[list[float]]:
+        response = await client.embeddings.create(input=texts, model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return embed
+
+
+def fake_embeddings(dimensions: int = 1536, latency: float = 0.0) -> EmbedFn:
+    """Offline stand-in: a unit vector hashed from each text, after `latency` seconds per call"""
+    def vector(text: str) -> list[float]:
+        values = [v - 32767.5 for v in struct.unpack(f"<{dimensions}H",
+                                                      hashlib.shake_256(text.encode()).digest(2 * dimensions))]
+        norm = sum(v * v for v in values) ** 0.5
+        return [v / norm for v in values]
+
+    async def embed(texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(latency)
+        return [vector(text) for text in texts]
+    return embed
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    persistent_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    provider_calls: int = 0
+    provider_texts: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return (self.hits + self.persistent_hits) / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+class LRUCache:
+    """At most `max_entries` values, least recently used out first, each kept `ttl_seconds` at most"""
+    def __init__(self, max_entries: int, ttl_seconds: float, stats: CacheStats, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = stats
+        self.clock = clock
+        self._entries: OrderedDict[tuple, tuple[float, list[float]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> list[float] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: tuple, value: list[float], ttl_seconds: float | None = None) -> None:
+        """`ttl_seconds` shortens the TTL, e.g. for a value that was already cached elsewhere"""
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+class BatchEmbedder:
+    """
+    Coalesces concurrent requests: texts asked for within `max_wait` seconds of the first pending one go to the
+    provider in one call, up to `max_batch` per call. A text already pending is not sent twice.
+    """
+    def __init__(self, embed_fn: EmbedFn, stats: CacheStats, max_batch: int = 64, max_wait: float = 0.005):
+        self.embed_fn = embed_fn
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: dict[str, asyncio.Future] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._calls: set[asyncio.Task] = set()
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            if text not in self._pending:
+                self._pending[text] = loop.create_future()
+            futures.append(self._pending[text])
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        # Shielded: a cancelled request must not cancel the texts other requests wait for
+        return list(await asyncio.gather(*(asyncio.shield(future) for future in futures)))
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = list(self._pending.items()), {}
+        for start in range(0, len(pending), self.max_batch):
+            task = asyncio.create_task(self._call(pending[start:start + self.max_batch]))
+            self._calls.add(task)
+            task.add_done_callback(self._calls.discard)
+
+    async def _call(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        self.stats.provider_calls += 1
+        self.stats.provider_texts += len(batch)
+        try:
+            vectors = await self.embed_fn([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+class QueryEmbedder:
+    """
+    Query embeddings by normalized text and model, from an in-process LRU, then from the `query_embedding_cache`
+    table when a `pool` is given, then from the provider through a `BatchEmbedder`. New embeddings fill both tiers.
+    Both tiers expire embeddings after `ttl_seconds`. The table is pruned at most every `prune_interval` seconds,
+    of its expired rows and of the oldest beyond `max_persistent_entries`.
+    """
+    def __init__(self, embed_fn: EmbedFn, model: str, max_entries: int = 10_000, ttl_seconds: float = 24 * 3600,
+                 pool: AsyncConnectionPool | None = None, max_batch: int = 64, max_wait: float = 0.005,
+                 max_persistent_entries: int = 1_000_000, prune_interval: float = 300.0):
+        self.model = model
+        self.pool = pool
+        self.ttl_seconds = ttl_seconds
+        self.max_persistent_entries = max_persistent_entries
+        self.prune_interval = prune_interval
+        self._pruned_at: float | None = None
+        self.stats = CacheStats()
+        self.memory = LRUCache(max_entries, ttl_seconds, self.stats)
+        self.batcher = BatchEmbedder(embed_fn, self.stats, max_batch, max_wait)
+        self._writes: set[asyncio.Task] = set()
+
+    async def embed(self, queries: list[str]) -> list[list[float]]:
+        keys = [normalize_query(query) for query in queries]
+        found = {}
+        for key in dict.fromkeys(keys):
+            if (vector := self.memory.get((self.model, key))) is not None:
+                found[key] = vector
+                self.stats.hits += 1
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.pool is not None:
+            stored = await self._load(missing)
+            self.stats.persistent_hits += len(stored)
+            for key, (vector, age) in stored.items():
+                self.memory.put((self.model, key), vector, ttl_seconds=self.ttl_seconds - age)
+                found[key] = vector
+            missing = [key for key in missing if key not in stored]
+        if missing:
+            self.stats.misses += len(missing)
+            vectors = await self.batcher.embed(missing)
+            for key, vector in zip(missing, vectors):
+                self.memory.put((self.model, key), vector)
+            found.update(zip(missing, vectors))
+            if self.pool is not None:  # written after the response, which does not need it
+                task = asyncio.create_task(self._store(dict(zip(missing, vectors))))
+                self._writes.add(task)
+                task.add_done_callback(self._writes.discard)
+        return [found[key] for key in keys]
+
+    async def embed_one(self, query: str) -> list[float]:
+        return (await self.embed([query]))[0]
+
+    async def wait_for_writes(self) -> None:
+        """Until the embeddings already computed are in Postgres"""
+        await asyncio.gather(*self._writes)
+
+    async def _load(self, keys: list[str]) -> dict[str, tuple[list[float], float]]:
+        """Embeddings stored less than `ttl_seconds` ago, with their age in seconds"""
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT query_text, embedding, EXTRACT(EPOCH FROM now() - created_at) FROM query_embedding_cache "
+                "WHERE model = %s AND query_text = ANY(%s) AND created_at > now() - make_interval(secs => %s)",
+                [self.model, keys, self.ttl_seconds], prepare=True)
+            return {query_text: (embedding, float(age)) for query_text, embedding, age in await cur.fetchall()}
+
+    async def _store(self, vectors: dict[str, list[float]]) -> None:
+        try:
+            async with self.pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    # An expired row is replaced, so that its embedding is served again
+                    await cur.executemany(
+                        "INSERT INTO query_embedding_cache (model, query_text, embedding) VALUES (%s, %s, %s) "
+                        "ON CONFLICT (model, query_text) DO UPDATE "
+                        "SET embedding = EXCLUDED.embedding, created_at = EXCLUDED.created_at",
+                        [(self.model, key, vector) for key, vector in vectors.items()])
+                if self._pruned_at is None or time.monotonic() - self._pruned_at >= self.prune_interval:
+                    self._pruned_at = time.monotonic()
+                    await self._prune(conn)
+        except psycopg.Error as e:  # the next process misses them, this one still has them in memory
+            logging.warning(f"Could not store {len(vectors)} query embeddings: {e}")
+
+    async def _prune(self, conn: psycopg.AsyncConnection) -> None:
+        """Delete the expired rows, then the oldest beyond `max_persistent_entries`, of every model"""
+        expired = await conn.execute(
+            "DELETE FROM query_embedding_cache WHERE created_at <= now() - make_interval(secs => %s)",
+            [self.ttl_seconds])
+        oldest = await conn.execute(
+            "DELETE FROM query_embedding_cache WHERE (model, query_text) IN ("
+            "SELECT model, query_text FROM query_embedding_cache ORDER BY created_at DESC OFFSET %s)",
+            [self.max_persistent_entries])
+        if expired.rowcount or oldest.rowcount:
+            logging.info(f"Pruned {expired.rowcount} expired and {oldest.rowcount} old query embeddings")
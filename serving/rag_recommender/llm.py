@@ -0,0 +1,109 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Protocol
+
+from openai import AsyncOpenAI
+
+
+@dataclass(frozen=True, slots=True)
+class ToolCall:
+    name: str
+    arguments: str  # JSON object
+
+
+@dataclass(frozen=True, slots=True)
+class Reply:
+    content: str | None
+    tool_calls: list[ToolCall]
+
+
+class LLMBackend(Protocol):
+    async def complete(self, messages: list[dict], tools: list[dict]) -> Reply:
+        """The whole assistant message"""
+        ...
+
+    def stream(self, messages: list[dict], tools: list[dict]) -> AsyncIterator[str | ToolCall]:
+        """The assistant message as text pieces while it is generated, then its complete tool calls"""
+        ...
+
+
+class OpenAILLM:
+    def __init__(self, model: str = "gpt-4o-mini", client: AsyncOpenAI | None = None):
+        self.model = model
+        self.client = client or AsyncOpenAI()
+
+    async def complete(self, messages: list[dict], tools: list[dict]) -> Reply:
+        response = await self.client.chat.completions.create(
+            model=self.model, messages=messages, tools=tools, tool_choice="auto")
+        msg = response.choices[0].message
+        return Reply(msg.content, [ToolCall(call.function.name, call.function.arguments)
+                                   for call in msg.tool_calls or []])
+
+    async def stream(self, messages: list[dict], tools: list[dict]) -> AsyncIterator[str | ToolCall]:
+        response = await self.client.chat.completions.create(
+            model=self.model, messages=messages, tools=tools, tool_choice="auto", stream=True)
+        # Tool calls arrive in fragments: the name first, then pieces of the arguments, by call index
+        calls: dict[int, list[str]] = {}
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield delta.content
+            for call in delta.tool_calls or []:
+                name_and_arguments = calls.setdefault(call.index, ["", ""])
+                if call.function and call.function.name:
+                    name_and_arguments[0] += call.function.name
+                if call.function and call.function.arguments:
+                    name_and_arguments[1] += call.function.arguments
+        for name, arguments in calls.values():
+            yield ToolCall(name, arguments)
+
+
+class FakeLLM:
+    """
+    Offline stand-in for benchmarks and local runs. Fills the first tool with the `keywords` values found in the
+    last user message, e.g. {"genres": ["RPG", "Indie"]}, and marks it READY; without any, asks for more. With a
+    `query_field`, the whole message goes in that field too.
+    Replies take `latency` seconds, spread over the streamed words. `blocking` sleeps without yielding the event
+    loop, as a synchronous client does.
+    """
+    def __init__(self, keywords: dict[str, list[str]], latency: float = 0.5, blocking: bool = False,
+                 query_field: str | None = None):
+        self.keywords = keywords
+        self.query_field = query_field
+        self.latency = latency
+        self.blocking = blocking
+
+    def _reply(self, messages: list[dict], tools: list[dict]) -> tuple[list[str], list[ToolCall]]:
+        user_message = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+        arguments = {field: found for field, values in self.keywords.items()
+                     if (found := [value for value in values if value.lower() in user_message.lower()])}
+        if not arguments:
+            return "Which genres or features are you looking for?".split(" "), []
+        words = f"Looking for {', '.join(v for values in arguments.values() for v in values)} games.".split(" ")
+        if self.query_field:
+            arguments[self.query_field] = user_message
+        arguments["status"] = "READY"
+        return words, [ToolCall(tools[0]["function"]["name"], json.dumps(arguments))]
+
+    async def _wait(self, seconds: float):
+        if self.blocking:
+            time.sleep(seconds)
+        else:
+            await asyncio.sleep(seconds)
+
+    async def complete(self, messages: list[dict], tools: list[dict]) -> Reply:
+        words, tool_calls = self._reply(messages, tools)
+        await self._wait(self.latency)
+        return Reply(" ".join(words), tool_calls)
+
+    async def stream(self, messages: list[dict], tools: list[dict]) -> AsyncIterator[str | ToolCall]:
+        words, tool_calls = self._reply(messages, tools)
+        for i, word in enumerate(words):
+            await self._wait(self.latency / len(words))
+            yield word if i == 0 else f" {word}"
+        for tool_call in tool_calls:
+            yield tool_call
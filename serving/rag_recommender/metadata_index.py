@@ -0,0 +1,84 @@
+"""
+Game metadata of a `vector_index` snapshot, for filtering its rows before ranking them: one bitset over the rows per
+genre, category and review score description, packed 8 rows per byte, and the release dates and review scores as
+arrays. Filters mean what they mean in `retrieval.metadata_search`: any of the genres, any of the categories, and all
+the other filters.
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+METADATA_FILE = "metadata.npz"
+
+
+@dataclass(frozen=True, slots=True)
+class GameMetadata:
+    """Columns of dim_games, one entry per game in the order of the embeddings"""
+    genres: list[list[str] | None]
+    categories: list[list[str] | None]
+    release_dates: list[datetime | None]  # game_prerelease_date
+    review_scores: list[int | None]
+    review_score_descriptions: list[str | None]
+
+
+def bitsets(values: list[list[str] | None], order: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The distinct values and, for each, the packed bitset of the rows (in `order`) that have it"""
+    names = sorted({value for row in values for value in row or []})
+    position = {name: i for i, name in enumerate(names)}
+    bits = np.zeros((len(names), len(order)), dtype=bool)
+    for row, i in enumerate(order):
+        for value in values[i] or []:
+            bits[position[value], row] = True
+    return np.array(names, dtype=str), np.packbits(bits, axis=1)
+
+
+def save_metadata(path: str, metadata: GameMetadata, order: np.ndarray) -> None:
+    genre_names, genre_bits = bitsets(metadata.genres, order)
+    category_names, category_bits = bitsets(metadata.categories, order)
+    description_names, description_bits = bitsets(
+        [[description] if description else None for description in metadata.review_score_descriptions], order)
+    np.savez(os.path.join(path, METADATA_FILE), genre_names=genre_names, genre_bits=genre_bits,
+             category_names=category_names, category_bits=category_bits,
+             description_names=description_names, description_bits=description_bits,
+             release_dates=np.array([metadata.release_dates[i] or "NaT" for i in order], dtype="datetime64[s]"),
+             review_scores=np.array([metadata.review_scores[i] for i in order], dtype=np.float64))
+
+
+class MetadataIndex:
+    """Bitsets of one snapshot, small enough to be read whole"""
+    def __init__(self, path: str):
+        with np.load(os.path.join(path, METADATA_FILE)) as arrays:
+            self.genres = dict(zip(arrays["genre_names"].tolist(), arrays["genre_bits"]))
+            self.categories = dict(zip(arrays["category_names"].tolist(), arrays["category_bits"]))
+            self.descriptions = dict(zip(arrays["description_names"].tolist(), arrays["description_bits"]))
+            self.release_dates = arrays["release_dates"]
+            self.review_scores = arrays["review_scores"]
+        self.rows = len(self.review_scores)
+        self.no_rows = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+
+    def any_of(self, bitsets: dict[str, np.ndarray], names: list[str]) -> np.ndarray:
+        return np.bitwise_or.reduce([bitsets.get(name, self.no_rows) for name in names])
+
+    def matching_rows(self, genres: list[str] | None = None, categories: list[str] | None = None,
+                      release_date_after: str | None = None, release_date_before: str | None = None,
+                      review_score_min: int | None = None, review_score_description: str | None = None,
+                      ) -> np.ndarray | None:
+        """Ascending rows that pass the filters, None without filters. Rows missing a filtered value never pass"""
+        masks = []
+        if genres:
+            masks.append(self.any_of(self.genres, genres))
+        if categories:
+            masks.append(self.any_of(self.categories, categories))
+        if review_score_description:
+            masks.append(self.any_of(self.descriptions, [review_score_description]))
+        if release_date_after:  # NaT and NaN compare false, as NULL does in SQL
+            masks.append(np.packbits(self.release_dates >= np.datetime64(release_date_after)))
+        if release_date_before:
+            masks.append(np.packbits(self.release_dates <= np.datetime64(release_date_before)))
+        if review_score_min:
+            masks.append(np.packbits(self.review_scores >= review_score_min))
+        if not masks:
+            return None
+        return np.flatnonzero(np.unpackbits(np.bitwise_and.reduce(masks), count=self.rows))
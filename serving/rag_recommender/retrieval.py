@@ -1,18 +1,50 @@
-def semantic_search(query: str, openai_client, limit: int = 10):
-    """Returns SQL query for semantic search."""
-    query_embedding = openai_client.embeddings.create(input=query, model="text-embedding-3-small").data[
-        0].embedding
-    sql_query = f""""
+import asyncio
+
+from psycopg_pool import AsyncConnectionPool
+
+from embeddings import QueryEmbedder
+from vector_index import VectorIndex
+
+
+async def ranked_games(index: VectorIndex, query_embedding: list[float], limit: int, nprobe: int | None = None,
+                       rows=None):
+    """
+    Returns SQL query for the names of the games nearest to the embedding in `index`, among `rows` if given: exactly,
+    or over `nprobe` IVF lists when all rows are searched.
+    """
+    if nprobe and rows is None:  # numpy releases the GIL
+        game_ids, sims = await asyncio.to_thread(index.search_ivf, query_embedding, limit, nprobe)
+    else:
+        game_ids, sims = (found[0] for found in await asyncio.to_thread(index.search, query_embedding, limit, rows))
+    sql_query = """
+            SELECT d.game_id, d.game_name, s.sim
+            FROM unnest(%s::BIGINT[], %s::FLOAT8[]) AS s(game_id, sim) JOIN dim_games d ON d.game_id = s.game_id
+            ORDER BY s.sim DESC
+        """
+    return sql_query, [game_ids.tolist(), sims.tolist()]
+
+
+async def semantic_search(query: str, embedder: QueryEmbedder, limit: int = 10, index: VectorIndex | None = None,
+                          nprobe: int | None = None):
+    """
+    Returns SQL query for semantic search. With an `index`, the nearest games are found in memory; otherwise pgvector
+    orders by the distance operator itself, which its ANN index can serve.
+    """
+    query_embedding = await embedder.embed_one(query)
+    if index is not None:
+        return await ranked_games(index, query_embedding, limit, nprobe)
+    sql_query = """
                 WITH sim_game_ids AS (
-                    SELECT game_id, embedding, 1 - (embedding <=> %s::VECTOR) AS sim FROM game_profile_embeddings
-                    ORDER BY sim DESC LIMIT {limit}
+                    SELECT game_id, 1 - (embedding <=> %s::VECTOR) AS sim FROM game_profile_embeddings
+                    ORDER BY embedding <=> %s::VECTOR LIMIT %s
                     )
                 SELECT d.game_id, d.game_name, s.sim FROM sim_game_ids s JOIN dim_games d ON d.game_id = s.game_id
+                ORDER BY s.sim DESC
             """
-    return sql_query, query_embedding
+    return sql_query, [query_embedding, query_embedding, limit]
 
 
-def metadata_search(
+def metadata_conditions(
         genres: list[str] | None = None,
         categories: list[str] | None = None,
         developers: list[str] | None = None,
@@ -21,46 +53,112 @@ def metadata_search(
         release_date_before: str | None = None,
         review_score_min: int | None = None,
         review_score_description: str | None = None,
-        limit: int = 100,
 ):
-    """Returns query for metadata search."""
-    sql_query = "SELECT game_id, game_name FROM dim_games WHERE 1=1"
+    """Returns `AND` conditions on dim_games for the filters that are set, and their params."""
+    conditions = ""
     params = []
     if genres:
-        sql_query += " AND game_genres && %s"
-    params.append(genres)
+        conditions += " AND game_genres && %s"
+        params.append(genres)
     if categories:
-        sql_query += " AND game_categories && %s"
-    params.append(categories)
+        conditions += " AND game_categories && %s"
+        params.append(categories)
     if developers:
-        sql_query += " AND game_developers::text ILIKE && %s"
-    params.append(developers)
+        conditions += " AND game_developers::text ILIKE ANY (%s)"
+        params.append([f"%{developer}%" for developer in developers])
     if publishers:
-        sql_query += " AND game_publishers::text ILIKE %s"
-    params.append(publishers)
+        conditions += " AND game_publishers::text ILIKE ANY (%s)"
+        params.append([f"%{publisher}%" for publisher in publishers])
     if release_date_after:
-        sql_query += " AND game_prerelease_date >= %s"
+        conditions += " AND game_prerelease_date >= %s::timestamp"
+        params.append(release_date_after)
     if release_date_before:
-        sql_query += " AND game_prerelease_date <= %s"
+        conditions += " AND game_prerelease_date <= %s::timestamp"
+        params.append(release_date_before)
     if review_score_min:
-        sql_query += " AND game_review_score >= %s"
+        conditions += " AND game_review_score >= %s"
+        params.append(review_score_min)
     if review_score_description:
-        sql_query += " AND game_review_score_description = %s"
+        conditions += " AND game_review_score_description = %s"
+        params.append(review_score_description)
+    return conditions, params
+
+
+def metadata_search(
+        genres: list[str] | None = None,
+        categories: list[str] | None = None,
+        developers: list[str] | None = None,
+        publishers: list[str] | None = None,
+        release_date_after: str | None = None,
+        release_date_before: str | None = None,
+        review_score_min: int | None = None,
+        review_score_description: str | None = None,
+        limit: int = 100,
+):
+    """Returns query for metadata search."""
+    conditions, params = metadata_conditions(genres, categories, developers, publishers, release_date_after,
+                                             release_date_before, review_score_min, review_score_description)
+    sql_query = "SELECT game_id, game_name FROM dim_games WHERE 1=1" + conditions
     sql_query += (" AND game_review_score IS NOT NULL"
                   " AND game_review_score_description IS NOT NULL"
                   " ORDER BY game_review_score DESC")
-    sql_query += f" LIMIT %s"
+    sql_query += " LIMIT %s"
     params.append(limit)
     return sql_query, params
 
 
-def execute_query(query: str, params: list, pg_dsn: str):
-    """Executes query and returns results."""
-    import psycopg2
-    conn = psycopg2.connect(dsn=pg_dsn)
-    cur = conn.cursor()
-    cur.execute(query, params)
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
-    return results
+async def hybrid_search(
+        query: str,
+        embedder: QueryEmbedder,
+        genres: list[str] | None = None,
+        categories: list[str] | None = None,
+        developers: list[str] | None = None,
+        publishers: list[str] | None = None,
+        release_date_after: str | None = None,
+        release_date_before: str | None = None,
+        review_score_min: int | None = None,
+        review_score_description: str | None = None,
+        limit: int = 10,
+        index: VectorIndex | None = None,
+        nprobe: int | None = None,
+):
+    """
+    Returns SQL query for the games that pass the metadata filters, the most similar to `query` first.
+    Without filters, this is `semantic_search`. With an `index` holding metadata, its bitsets select the games that
+    pass and only those are ranked, in memory. Otherwise, and for developers and publishers which are matched by
+    substring, Postgres filters and ranks in the same query. Either way all the games that pass are ranked, exactly.
+    """
+    conditions, params = metadata_conditions(genres, categories, developers, publishers, release_date_after,
+                                             release_date_before, review_score_min, review_score_description)
+    if not conditions:  # nothing filtered out: the ANN indexes can serve the nearest games
+        return await semantic_search(query, embedder, limit, index, nprobe)
+    query_embedding = await embedder.embed_one(query)
+    if index is not None and index.metadata is not None and not developers and not publishers:
+        rows = index.metadata.matching_rows(genres, categories, release_date_after, release_date_before,
+                                            review_score_min, review_score_description)
+        return await ranked_games(index, query_embedding, limit, nprobe, rows)
+    sql_query = f"""
+                SELECT d.game_id, d.game_name, 1 - (e.embedding <=> %s::VECTOR) AS sim
+                FROM game_profile_embeddings e JOIN dim_games d ON d.game_id = e.game_id
+                WHERE e.embedding IS NOT NULL{conditions}
+                ORDER BY sim DESC LIMIT %s
+            """
+    # By `sim`, not the distance operator: through the ANN index, pgvector would filter its approximate top rows
+    # after the fact and return fewer than `limit` games for selective filters
+    return sql_query, [query_embedding, *params, limit]
+
+
+def create_pool(pg_dsn: str, min_size: int = 2, max_size: int = 10) -> AsyncConnectionPool:
+    """Connection pool for the lifetime of the app, opened by entering it: `async with create_pool(dsn) as pool`"""
+    return AsyncConnectionPool(pg_dsn, min_size=min_size, max_size=max_size, open=False)
+
+
+async def execute_query(pool: AsyncConnectionPool, query: str, params: list):
+    """
+    Executes query on a pooled connection and returns results.
+    Each connection prepares a query on its first run and reuses the plan after: the searches build one text per
+    combination of filters, few enough to stay prepared.
+    """
+    async with pool.connection() as conn:
+        cur = await conn.execute(query, params, prepare=True)
+        return await cur.fetchall()
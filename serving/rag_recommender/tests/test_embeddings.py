@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from embeddings import BatchEmbedder, CacheStats, LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_expires_entries_after_their_ttl():
+    clock, stats = FakeClock(), CacheStats()
+    cache = LRUCache(max_entries=10, ttl_seconds=60, stats=stats, clock=clock)
+    cache.put(("m", "a"), [1.0])
+    cache.put(("m", "b"), [2.0], ttl_seconds=10)
+    cache.put(("m", "c"), [3.0], ttl_seconds=600)  # cannot outlive the cache's own TTL
+
+    clock.now = 30
+    assert cache.get(("m", "a")) == [1.0]
+    assert cache.get(("m", "b")) is None
+    clock.now = 60
+    assert cache.get(("m", "a")) is None
+    assert cache.get(("m", "c")) is None
+    assert len(cache) == 0
+    assert stats.expirations == 3
+
+
+def test_lru_cache_evicts_the_least_recently_used():
+    stats = CacheStats()
+    cache = LRUCache(max_entries=2, ttl_seconds=60, stats=stats, clock=FakeClock())
+    cache.put(("m", "a"), [1.0])
+    cache.put(("m", "b"), [2.0])
+    assert cache.get(("m", "a")) == [1.0]
+    cache.put(("m", "c"), [3.0])
+
+    assert cache.get(("m", "b")) is None
+    assert cache.get(("m", "a")) == [1.0]
+    assert cache.get(("m", "c")) == [3.0]
+    assert stats.evictions == 1
+
+    disabled = LRUCache(max_entries=0, ttl_seconds=60, stats=stats)
+    disabled.put(("m", "a"), [1.0])
+    assert len(disabled) == 0
+
+
+def recording_embeddings(calls: list[list[str]], fail: bool = False):
+    async def embed(texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        await asyncio.sleep(0)
+        if fail:
+            raise RuntimeError("provider is down")
+        return [[float(len(text))] for text in texts]
+    return embed
+
+
+def test_batch_embedder_coalesces_concurrent_requests():
+    calls = []
+    stats = CacheStats()
+
+    async def run():
+        batcher = BatchEmbedder(recording_embeddings(calls), stats, max_batch=64, max_wait=0.01)
+        return await asyncio.gather(batcher.embed(["a", "bb"]), batcher.embed(["bb", "ccc"]), batcher.embed(["a"]))
+
+    assert asyncio.run(run()) == [[[1.0], [2.0]], [[2.0], [3.0]], [[1.0]]]
+    # One call, and each text in it once
+    assert calls == [["a", "bb", "ccc"]]
+    assert (stats.provider_calls, stats.provider_texts) == (1, 3)
+
+
+def test_batch_embedder_splits_batches_at_max_batch():
+    calls = []
+
+    async def run():
+        batcher = BatchEmbedder(recording_embeddings(calls), CacheStats(), max_batch=2, max_wait=10)
+        # Flushed as soon as two texts are pending, not after max_wait
+        return await asyncio.wait_for(batcher.embed(["a", "bb", "ccc"]), timeout=1)
+
+    assert asyncio.run(run()) == [[1.0], [2.0], [3.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
+
+
+def test_batch_embedder_fails_every_request_of_a_failed_call():
+    calls = []
+
+    async def run():
+        batcher = BatchEmbedder(recording_embeddings(calls, fail=True), CacheStats(), max_wait=0.01)
+        results = await asyncio.gather(batcher.embed(["a"]), batcher.embed(["a", "b"]), return_exceptions=True)
+        # Nothing is left pending: the same text is asked for again on the next request
+        batcher.embed_fn = recording_embeddings(calls)
+        return results, await batcher.embed(["a"])
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == [[1.0]]
+    assert calls == [["a", "b"], ["a"]]
+
+
+def test_batch_embedder_cancelled_request_does_not_cancel_the_others():
+    calls = []
+
+    async def run():
+        batcher = BatchEmbedder(recording_embeddings(calls), CacheStats(), max_wait=0.01)
+        cancelled = asyncio.create_task(batcher.embed(["a"]))
+        other = asyncio.create_task(batcher.embed(["a"]))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await other
+
+    assert asyncio.run(run()) == [[1.0]]
+    assert calls == [["a"]]
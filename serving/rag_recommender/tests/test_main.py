@@ -0,0 +1,34 @@
+import asyncio
+import json
+
+from llm import ToolCall
+from main import (Category, Genre, ReviewScoreDescription, SearchQuery, answer_tool_calls, conversation_state,
+                  update_state)
+
+
+def test_update_state_merges_the_tool_arguments():
+    update_state("merged", {"genres": ["Action"], "review_score_min": 7})
+    state = update_state("merged", {"categories": ["Steam Cloud"], "description": "space trading"})
+    assert state.genres == [Genre.ACTION] and state.categories == [Category.STEAM_CLOUD]
+    assert (state.review_score_min, state.description) == (7, "space trading")
+    assert conversation_state["merged"] == state
+
+
+def test_update_state_drops_invalid_values():
+    update_state("invalid", {"review_score_min": 7, "review_score_description": "Very Positive"})
+    state = update_state("invalid", {"genres": ["Action", "Shooter", "RPG"], "categories": "Steam Cloud",
+                                     "review_score_min": "high", "review_score_description": "Great"})
+    # Made-up list items go, the rest of the list stays; other invalid values leave the field as it was
+    assert state.genres == [Genre.ACTION, Genre.RPG]
+    assert state.categories is None
+    assert state.review_score_min == 7
+    assert state.review_score_description == ReviewScoreDescription.VERY_POSITIVE
+    assert conversation_state["invalid"] == state
+
+
+def test_invalid_tool_arguments_still_get_an_answer():
+    tool_call = ToolCall(name="collect_search_query",
+                         arguments=json.dumps({"genres": ["Shooter"], "status": "GATHERING"}))
+    answer = asyncio.run(answer_tool_calls(None, "answered", [tool_call]))
+    assert answer["message"] == "Got it, tell me more about your preferences."
+    assert answer["search_query"] == SearchQuery(genres=[]).model_dump()
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import numpy as np
+
+from metadata_index import GameMetadata, MetadataIndex, save_metadata
+
+METADATA = GameMetadata(
+    genres=[["Action"], ["Action", "Indie"], None, ["RPG"], []],
+    categories=[["Single-player"], None, ["Multi-player"], ["Single-player", "Multi-player"], None],
+    release_dates=[datetime(2020, 1, 1), None, datetime(2015, 6, 1), datetime(2023, 3, 1), None],
+    review_scores=[8, 5, None, 9, None],
+    review_score_descriptions=["Very Positive", "Mixed", None, "Very Positive", None],
+)
+
+
+def metadata_index(tmp_path, order=None) -> MetadataIndex:
+    save_metadata(str(tmp_path), METADATA, np.arange(5) if order is None else order)
+    return MetadataIndex(str(tmp_path))
+
+
+def test_matching_rows_without_filters_is_none(tmp_path):
+    assert metadata_index(tmp_path).matching_rows() is None
+    assert metadata_index(tmp_path).matching_rows(genres=[], review_score_min=0) is None
+
+
+def test_matching_rows_any_of_the_genres_and_categories(tmp_path):
+    index = metadata_index(tmp_path)
+    assert index.matching_rows(genres=["Indie", "RPG"]).tolist() == [1, 3]
+    assert index.matching_rows(genres=["Action"], categories=["Single-player"]).tolist() == [0]
+    assert index.matching_rows(categories=["Multi-player"]).tolist() == [2, 3]
+    assert index.matching_rows(genres=["Strategy"]).tolist() == []
+
+
+def test_matching_rows_never_pass_missing_values(tmp_path):
+    index = metadata_index(tmp_path)
+    # As NULL in SQL: no release date or review score is neither after nor before, nor above any minimum
+    assert index.matching_rows(release_date_after="2016-01-01").tolist() == [0, 3]
+    assert index.matching_rows(release_date_before="2021-01-01").tolist() == [0, 2]
+    assert index.matching_rows(review_score_min=6).tolist() == [0, 3]
+    assert index.matching_rows(review_score_description="Very Positive").tolist() == [0, 3]
+    assert index.matching_rows(review_score_description="Overwhelmingly Positive").tolist() == []
+    assert index.matching_rows(genres=["Action"], release_date_after="2019-01-01", review_score_min=5).tolist() == [0]
+
+
+def test_matching_rows_are_rows_of_the_snapshot_order(tmp_path):
+    index = metadata_index(tmp_path, order=np.array([3, 1, 4, 0, 2]))
+    assert index.matching_rows(genres=["Action"]).tolist() == [1, 3]
+    assert index.matching_rows(review_score_min=6).tolist() == [0, 3]
@@ -0,0 +1,46 @@
+import asyncio
+
+import numpy as np
+
+from embeddings import QueryEmbedder, fake_embeddings
+from metadata_index import GameMetadata
+from retrieval import hybrid_search
+from vector_index import VectorIndex, build_snapshot
+
+
+def embedder() -> QueryEmbedder:
+    return QueryEmbedder(fake_embeddings(dimensions=16), model="fake")
+
+
+def test_hybrid_search_without_filters_orders_by_distance():
+    sql, params = asyncio.run(hybrid_search("space trading", embedder(), genres=[], limit=5))
+    # As semantic_search: the ivfflat index serves ORDER BY the distance operator, not by an expression of it
+    assert "ORDER BY embedding <=> %s::VECTOR LIMIT %s" in sql
+    assert params[0] == params[1] and params[2] == 5
+
+
+def test_hybrid_search_with_filters_ranks_every_game_that_passes():
+    sql, params = asyncio.run(hybrid_search("space trading", embedder(), genres=["Action"], review_score_min=7,
+                                            limit=5))
+    assert "game_genres && %s" in sql and "game_review_score >= %s" in sql
+    assert "ORDER BY sim DESC LIMIT %s" in sql
+    assert params[1:] == [["Action"], 7, 5]
+
+
+def test_hybrid_search_with_an_index_ranks_in_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    game_ids = np.arange(1, 201)
+    metadata = GameMetadata(genres=[["Action"] if i % 2 else ["Indie"] for i in game_ids],
+                            categories=[None] * 200, release_dates=[None] * 200, review_scores=[None] * 200,
+                            review_score_descriptions=[None] * 200)
+    index = VectorIndex(build_snapshot(str(tmp_path), game_ids, rng.standard_normal((200, 16)), n_lists=4,
+                                       metadata=metadata))
+
+    sql, (found, sims) = asyncio.run(hybrid_search("space trading", embedder(), genres=["Action"], limit=5,
+                                                   index=index, nprobe=1))
+    assert "unnest" in sql
+    assert len(found) == 5 and all(game_id % 2 for game_id in found)
+    assert sims == sorted(sims, reverse=True)
+
+    _, (found, _) = asyncio.run(hybrid_search("space trading", embedder(), limit=5, index=index, nprobe=4))
+    assert len(found) == 5
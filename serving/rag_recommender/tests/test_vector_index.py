@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+
+import vector_index
+from vector_index import IndexReloader, VectorIndex, build_snapshot, latest_snapshot, normalize, remove_old_snapshots
+
+
+@pytest.fixture
+def embeddings() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(42)
+    return np.arange(1000, 1500, dtype=np.int64), rng.standard_normal((500, 16)).astype(np.float32)
+
+
+def exact_top_k(embeddings: np.ndarray, game_ids: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = normalize(embeddings) @ normalize(query)
+    return game_ids[np.argsort(-scores, kind="stable")[:k]]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_search_is_exact_across_chunks(tmp_path, monkeypatch, embeddings, dtype):
+    game_ids, vectors = embeddings
+    monkeypatch.setattr(vector_index, "CHUNK_ROWS", 64)  # several chunks to merge
+    index = VectorIndex(build_snapshot(str(tmp_path), game_ids, vectors, dtype=dtype, n_lists=8))
+    queries = np.random.default_rng(7).standard_normal((3, 16))
+
+    found, scores = index.search(queries, k=10)
+    assert found.shape == scores.shape == (3, 10)
+    for query, query_found, query_scores in zip(queries, found, scores):
+        np.testing.assert_array_equal(query_found, exact_top_k(vectors, game_ids, query, 10))
+        assert np.all(np.diff(query_scores) <= 0)
+    np.testing.assert_allclose(scores[0], normalize(vectors[found[0] - 1000]) @ normalize(queries[0]), atol=1e-3)
+
+
+def test_search_ivf_probing_every_list_is_exact(tmp_path, embeddings):
+    game_ids, vectors = embeddings
+    index = VectorIndex(build_snapshot(str(tmp_path), game_ids, vectors, n_lists=8))
+    assert index.offsets[0] == 0 and index.offsets[-1] == len(index)
+    query = np.random.default_rng(7).standard_normal(16)
+
+    found, scores = index.search_ivf(query, k=10, nprobe=8)
+    np.testing.assert_array_equal(found, exact_top_k(vectors, game_ids, query, 10))
+    np.testing.assert_array_equal(found, index.search(query, k=10)[0][0])
+
+    # Fewer lists, fewer rows scored: still the best of those, among the exact scores
+    found, scores = index.search_ivf(query, k=10, nprobe=2)
+    assert len(found) == 10 and np.all(np.diff(scores) <= 0)
+    np.testing.assert_allclose(scores, normalize(vectors[found - 1000]) @ normalize(query), atol=1e-6)
+
+
+def test_build_snapshot_never_has_more_lists_than_embeddings(tmp_path):
+    vectors = np.eye(3, 16, dtype=np.float32)
+    index = VectorIndex(build_snapshot(str(tmp_path), np.array([1, 2, 3]), vectors, n_lists=100))
+    assert len(index.centroids) == 3
+    found, _ = index.search_ivf(vectors[1], k=10, nprobe=100)
+    assert found.tolist()[0] == 2 and sorted(found.tolist()) == [1, 2, 3]
+
+
+def test_snapshots_are_swapped_and_removed(tmp_path, embeddings):
+    game_ids, vectors = embeddings
+    directory = str(tmp_path)
+    first = build_snapshot(directory, game_ids, vectors, n_lists=4)
+    reloader = IndexReloader(directory)
+    assert reloader.index.path == first
+    assert not reloader.reload()
+
+    second = build_snapshot(directory, game_ids[:100], vectors[:100], n_lists=4)
+    assert latest_snapshot(directory) == second
+    assert reloader.reload() and len(reloader.index) == 100
+
+    remove_old_snapshots(directory, keep=1)
+    assert os.listdir(directory) == [os.path.basename(second)]
+
+
+@pytest.mark.parametrize("share", [0.02, 0.1, 0.6], ids=["sparse", "gathered", "dense"])
+def test_search_among_rows_is_exact(tmp_path, monkeypatch, embeddings, share):
+    game_ids, vectors = embeddings
+    monkeypatch.setattr(vector_index, "CHUNK_ROWS", 64)
+    index = VectorIndex(build_snapshot(str(tmp_path), game_ids, vectors, n_lists=8))
+    rows = np.sort(np.random.default_rng(1).choice(len(index), int(share * len(index)), replace=False))
+    query = np.random.default_rng(7).standard_normal(16)
+
+    found, scores = index.search(query, k=20, rows=rows)
+    allowed = np.isin(game_ids, index.game_ids[rows])
+    expected = exact_top_k(vectors[allowed], game_ids[allowed], query, 20)
+    np.testing.assert_array_equal(found[0], expected)
+    assert np.all(np.isfinite(scores))
+
+
+def test_search_among_no_rows_finds_nothing(tmp_path, embeddings):
+    game_ids, vectors = embeddings
+    index = VectorIndex(build_snapshot(str(tmp_path), game_ids, vectors, n_lists=8))
+    found, scores = index.search(vectors[0], k=10, rows=np.array([], dtype=np.int64))
+    assert found.shape == scores.shape == (1, 0)